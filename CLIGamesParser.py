@@ -1,25 +1,186 @@
-from typing import Iterable, Iterator, List
+import concurrent.futures
+import datetime
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Union
 
+from bgg.api.CacheManifest import ManifestEntry
+from bgg.api.RequestBase import MAX_IDS_PER_REQUEST
 from bgg.api.RequestFamily import RequestFamily
 from bgg.api.RequestList import RequestList
 from bgg.api.RequestPlays import RequestPlays
 from bgg.api.RequestSearch import RequestSearch
-from bgg.utils import firstx
+from bgg.api.RequestThing import RequestThing
+from bgg.model import thing
+from bgg.utils import chunked, firstx, nonthrows
 
 LIST_PREFIX = "list-"
 FAMILY_PREFIX = "family-"
 FLAG_ALL_CACHED = "--all-cached"
 
+# --all-cached could be followed by options, separated by colons, which are
+# applied using just the cache manifest, e.g. --all-cached:by-plays:min-plays=100
+ALL_CACHED_SEPARATOR = ":"
+ALL_CACHED_ORDERS: Dict[str, Callable[[ManifestEntry], float]] = {
+    # Most played first
+    "by-plays": lambda entry: -(entry.total or 0),
+    # Least recently fetched first
+    "by-staleness": lambda entry: (entry.fetched.timestamp() if entry.fetched else 0),
+    # Biggest first
+    "by-size": lambda entry: -entry.bytes,
+}
+ALL_CACHED_FILTERS: Dict[str, Callable[[ManifestEntry, str], bool]] = {
+    "complete": lambda entry, _: entry.complete,
+    "incomplete": lambda entry, _: not entry.complete,
+    "min-plays": lambda entry, plays: (entry.total or 0) >= int(plays),
+    # Not fetched in at least this many days
+    "stale-days": lambda entry, days: entry.fetched is None
+    or entry.fetched < datetime.datetime.now() - datetime.timedelta(days=int(days)),
+}
+
+# How many ids could be resolved ahead of the consumer. Metadata is warmed in
+# batches of MAX_IDS_PER_REQUEST so this should be bigger than that.
+DEFAULT_PREFETCH_WINDOW = 2 * MAX_IDS_PER_REQUEST
+PREFETCH_WORKERS = 2
+
 
 class CLIGamesParser(Iterable[int]):
     def __init__(self, user_inputs: List[str]) -> None:
         self.__user_inputs = user_inputs
+        self.__prefetch_window = 0
+        self.__thing_flags: Sequence[str] = []
+        # Resolved ids which weren't warmed yet, and the warming of the rest
+        self.__lock = threading.Lock()
+        self.__pending: List[int] = []
+        self.__warming: Dict[int, "Future[List[thing.Item]]"] = {}
+        self.__executor: Optional[ThreadPoolExecutor] = None
+
+    def prefetch(
+        self,
+        window: int = DEFAULT_PREFETCH_WINDOW,
+        thing_flags: Sequence[str] = ("stats",),
+    ) -> "CLIGamesParser":
+        """
+        Resolve upcoming ids in the background, and warm up their metadata
+        (with the given flags) and, for the boardgames among them, the first
+        missing page of their plays, so that they are ready by the time the
+        consumer gets to them.
+        """
+        self.__prefetch_window = window
+        self.__thing_flags = thing_flags
+        return self
 
     def __iter__(self) -> Iterator[int]:
+        if not self.__prefetch_window:
+            return self.__resolve()
+        return (id for batch in self.__prefetched(1, False) for id in batch)
+
+    def batched(self, size: int) -> Iterator[List[int]]:
+        """
+        The ids in batches of up to size, for querying their metadata in one
+        request. When prefetching, a batch is whatever was resolved by the
+        time the consumer asks for it (so the first game isn't held up by
+        resolving the ones after it), and its metadata is warm by then.
+        """
+        if not self.__prefetch_window:
+            return chunked(self.__resolve(), size)
+        return self.__prefetched(size, True)
+
+    def summaries(
+        self, thing_flags: Sequence[str] = ("stats",)
+    ) -> Iterator[thing.ThingSummary]:
+        """The games' summaries (queried with the given flags), batch by batch"""
+        for batch in self.batched(MAX_IDS_PER_REQUEST):
+            yield from RequestThing(*batch).with_flags(*thing_flags).query_summaries()
+
+    def __prefetched(self, size: int, wait_warm: bool) -> Iterator[List[int]]:
+        # The queue bounds the look-ahead, the producer blocks when it's full
+        ids: "queue.Queue[Union[int, BaseException, None]]" = queue.Queue(
+            self.__prefetch_window
+        )
+        producer = threading.Thread(
+            target=self.__produce, args=(ids,), name="CLIGamesParser", daemon=True
+        )
+        producer.start()
+
+        while True:
+            batch: List[int] = []
+            is_done = False
+            while len(batch) < size:
+                try:
+                    # Only the first id of a batch is waited for
+                    id = ids.get(block=not batch)
+                except queue.Empty:
+                    break
+                if id is None:
+                    is_done = True
+                    break
+                if isinstance(id, BaseException):
+                    raise id
+                batch.append(id)
+
+            if batch:
+                warming = self.__takeWarming(batch)
+                if wait_warm:
+                    concurrent.futures.wait(warming)
+                yield batch
+            if is_done:
+                return
+
+    def __produce(self, ids: "queue.Queue[Union[int, BaseException, None]]") -> None:
+        with ThreadPoolExecutor(max_workers=PREFETCH_WORKERS) as executor:
+            self.__executor = executor
+            try:
+                for id in self.__resolve():
+                    with self.__lock:
+                        self.__pending.append(id)
+                        if len(self.__pending) >= MAX_IDS_PER_REQUEST:
+                            self.__warm()
+                    ids.put(id)
+                with self.__lock:
+                    self.__warm()
+                ids.put(None)
+            except BaseException as e:
+                ids.put(e)
+
+    def __takeWarming(self, batch: List[int]) -> List["Future[List[thing.Item]]"]:
+        with self.__lock:
+            if any(id in self.__pending for id in batch):
+                # The consumer got to them before a full batch was resolved
+                self.__warm()
+            return [self.__warming.pop(id) for id in batch if id in self.__warming]
+
+    def __warm(self) -> None:
+        """Warms the pending ids, the lock should be held"""
+        if not self.__pending:
+            return
+
+        executor = nonthrows(self.__executor)
+        batch = self.__pending
+        self.__pending = []
+        things = executor.submit(
+            RequestThing(*batch).with_flags(*self.__thing_flags).query_all
+        )
+        for id in batch:
+            self.__warming[id] = things
+            executor.submit(CLIGamesParser.__warmPlays, id, things)
+
+    @staticmethod
+    def __warmPlays(id: int, things: "Future[List[thing.Item]]") -> None:
+        # Only the plays of games are ever read, warming anything else's would
+        # just waste requests
+        if any(
+            item.id() == id and item.type() == "boardgame" for item in things.result()
+        ):
+            RequestPlays(thingid=id).warm()
+
+    def __resolve(self) -> Iterator[int]:
         for user_input in self.__user_inputs:
-            if user_input == FLAG_ALL_CACHED:
-                for id in RequestPlays.cached_queries():
-                    yield int(id)
+            if user_input.split(ALL_CACHED_SEPARATOR)[0] == FLAG_ALL_CACHED:
+                yield from CLIGamesParser.__get_all_cached(
+                    user_input.split(ALL_CACHED_SEPARATOR)[1:]
+                )
 
                 print(f"Finished Reading entries from cache")
 
@@ -51,6 +212,40 @@ class CLIGamesParser(Iterable[int]):
             else:
                 yield self.__get_game_id_from_name(user_input)
 
+    @staticmethod
+    def __get_all_cached(options: List[str]) -> Iterator[int]:
+        # Only games are cached by their id, users' plays are cached too
+        ids = [id for id in RequestPlays.cached_queries() if id.isdigit()]
+        if not options:
+            yield from (int(id) for id in ids)
+            return
+
+        manifest = RequestPlays.cache_manifest().entries()
+        missing = [id for id in ids if id not in manifest]
+        if missing:
+            print(
+                f"{len(missing)} cached games are missing from the manifest and "
+                f"would be skipped, rebuild it with: cache_tool.py manifest"
+            )
+        entries = [(id, manifest[id]) for id in ids if id in manifest]
+
+        for option in options:
+            name, _, value = option.partition("=")
+            if name in ALL_CACHED_ORDERS:
+                order = ALL_CACHED_ORDERS[name]
+                entries.sort(key=lambda id_entry: order(id_entry[1]))
+            elif name in ALL_CACHED_FILTERS:
+                keep = ALL_CACHED_FILTERS[name]
+                entries = [(id, entry) for id, entry in entries if keep(entry, value)]
+            else:
+                raise Exception(
+                    f"Unknown {FLAG_ALL_CACHED} option '{option}', expected one of "
+                    f"{list(ALL_CACHED_ORDERS) + list(ALL_CACHED_FILTERS)}"
+                )
+
+        for id, _ in entries:
+            yield int(id)
+
     @staticmethod
     def __get_game_id_from_name(user_input: str) -> int:
         results = RequestSearch().ofType("boardgame").query(user_input)
@@ -1,11 +1,11 @@
 #!/usr/local/bin/python3
 
 import datetime
-import sys
 import unicodedata
 from collections import defaultdict
 from typing import Dict, Iterable, Iterator, List, Set, Tuple
 
+from bgg.api.RequestBase import RequestBase
 from bgg.api.RequestFamily import RequestFamily
 from bgg.api.RequestPlays import RequestPlays
 from bgg.api.RequestThing import RequestThing
@@ -79,7 +79,9 @@ def main(argv: List[str] = []) -> int:
             users_output.write(
                 f"{SEPARATOR.join(['Name', 'Category', 'Image', '1999-12-31'] + bcr.Presenter.column_names(window(aggr_by)))}\n"
             )
-            for plays, users in process_games(aggr_by, CLIGamesParser(argv[4:])):
+            for plays, users in process_games(
+                aggr_by, CLIGamesParser(argv[4:]).prefetch()
+            ):
                 plays_output.write(plays)
                 users_output.write(users)
             for plays, users in process_families(aggr_by):
@@ -112,9 +114,9 @@ def normalize_str(s: str) -> str:
     return unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode("ascii")
 
 
-def process_games(aggr_by: int, games: Iterable[int]) -> Iterator[Tuple[str, str]]:
-    for index, game_id in enumerate(games):
-        game = RequestThing(game_id).with_flags("stats").query_first()
+def process_games(aggr_by: int, games: CLIGamesParser) -> Iterator[Tuple[str, str]]:
+    for index, game in enumerate(games.summaries()):
+        game_id = game.id()
 
         collected_families = [
             family_id
@@ -147,7 +149,7 @@ def process_games(aggr_by: int, games: Iterable[int]) -> Iterator[Tuple[str, str
         plays_logic = bcr.UniquePlaysLogic(aggr_by)
         users_logic = bcr.UniqueUsersLogic(aggr_by)
         total_logic = bcr.TotalUsersLogic(aggr_by)
-        for play in RequestPlays(thingid=game_id).queryAll():
+        for play in RequestPlays(thingid=game_id).concurrently().compiled():
             plays_logic.visit(play)
             users_logic.visit(play)
             total_logic.visit(play)
@@ -156,7 +158,7 @@ def process_games(aggr_by: int, games: Iterable[int]) -> Iterator[Tuple[str, str
             print(
                 f"Fetching plays for expansion {exp_index:02d}: {expansion[1]} ({expansion[0]}) of {game.primary_name()}"
             )
-            for play in RequestPlays(thingid=expansion[0]).queryAll():
+            for play in RequestPlays(thingid=expansion[0]).concurrently().compiled():
                 plays_logic.visit(play)
                 users_logic.visit(play)
 
@@ -173,30 +175,38 @@ def process_families(aggr_by: int) -> Iterator[Tuple[str, str]]:
         if not family_games:
             raise Exception(f"Family {family_id} has no entries in it!")
 
-        process_family(aggr_by, family_id, family_games, bcr.TotalUsersLogic(aggr_by))
-        yield (
-            process_family(
-                aggr_by, family_id, family_games, bcr.UniquePlaysLogic(aggr_by)
-            ),
-            process_family(
-                aggr_by, family_id, family_games, bcr.UniqueUsersLogic(aggr_by)
-            ),
+        # The total users logic accumulates globally so we only need it to see
+        # the plays, its per-family row is not interesting
+        _, plays, users = process_family(
+            aggr_by,
+            family_id,
+            family_games,
+            bcr.TotalUsersLogic(aggr_by),
+            bcr.UniquePlaysLogic(aggr_by),
+            bcr.UniqueUsersLogic(aggr_by),
         )
+        yield (plays, users)
 
     print(f"Finished processing all families")
 
 
 def process_family(
-    aggr_by: int, id: int, family_games: Iterable[int], bar_chart_race: bcr.MonthlyLogic
-) -> str:
+    aggr_by: int,
+    id: int,
+    family_games: Iterable[int],
+    *bar_chart_races: bcr.MonthlyLogic,
+) -> List[str]:
+    """Returns a row for each of the logics, in the same order"""
     family = RequestFamily(id).query_first()
 
     earliest_year = None
     popular_category = None
     popular_thumbnail = None
     popular_users_rated = 0
-    for index, game_id in enumerate(family_games):
-        game = RequestThing(game_id).with_flags("stats").query_first()
+    for index, game in enumerate(
+        RequestThing(*family_games).with_flags("stats").query_summaries()
+    ):
+        game_id = game.id()
 
         print(
             f"Adding {index:03d} {game.primary_name()} ({game.id()}) to family {family.primary_name()}"
@@ -221,8 +231,9 @@ def process_family(
         ):
             earliest_year = game.year_published()
 
-        for play in RequestPlays(thingid=game_id).queryAll():
-            bar_chart_race.visit(play)
+        for play in RequestPlays(thingid=game_id).concurrently().compiled():
+            for bar_chart_race in bar_chart_races:
+                bar_chart_race.visit(play)
 
     metadata = [
         # I don't use the word family here because it would clash with the
@@ -237,8 +248,11 @@ def process_family(
         f"Finished processing family {family.primary_name()}, it has {index+1} games in it"
     )
 
-    return f"{SEPARATOR.join(metadata)}{SEPARATOR}{bcr.Presenter(bar_chart_race, window(aggr_by), earliest_year or 1999, SEPARATOR)}\n"
+    return [
+        f"{SEPARATOR.join(metadata)}{SEPARATOR}{bcr.Presenter(bar_chart_race, window(aggr_by), earliest_year or 1999, SEPARATOR)}\n"
+        for bar_chart_race in bar_chart_races
+    ]
 
 
 if __name__ == "__main__":
-    sys.exit(main(sys.argv))
+    RequestBase.run_script(main)
@@ -0,0 +1,146 @@
+#!/usr/local/bin/python3
+
+import sys
+import time
+from typing import Callable, List, Sequence, Tuple
+
+from bgg.api.ParserBackend import BACKENDS
+from bgg.api.RequestBase import RequestBase
+from bgg.api.RequestPlays import RequestPlays
+from bgg.model import play
+from bgg.model.PlayColumns import PlayColumns
+from CLIGamesParser import CLIGamesParser
+from observers import LocationsCount as lc
+from observers import MultiLog as ml
+from observers import PlayerCountAggregator as pca
+from observers import QuantityNormalizer as qn
+from observers import SessionCounter as sc
+
+USAGE = f"""Usage:
+    {sys.argv[0]} <games...>
+        Compares what each play costs the observers when they visit the plays
+        as parsed (play.Play), decoded once into records (play.PlayRecord) or
+        read back from the compiled columns (PlayColumns). The games are given
+        the same way as to the analyses, and their plays are read from the
+        cache (fetching whatever is missing). Then compares what decoding the
+        stored plays into records costs with each of the parser backends.
+"""
+
+SEPARATOR = "\t"
+BENCH_REPEATS = 3
+# Wide enough for any game, so that no play is bucketed as out of range
+BENCH_PLAYER_COUNT = (1, 100)
+
+
+def main(argv: List[str] = []) -> int:
+    if len(argv) < 2:
+        print(USAGE)
+        return 1
+
+    game_ids = list(CLIGamesParser(argv[1:]))
+    plays: List[play.Play] = []
+    for game_id in game_ids:
+        plays.extend(RequestPlays(thingid=game_id).queryAll())
+    if not plays:
+        print("No plays to benchmark")
+        return 1
+
+    columns = PlayColumns().extend(plays)
+    records = [p.record() for p in plays]
+
+    print(
+        SEPARATOR.join(
+            [
+                "Type",
+                "Plays",
+                "Decode (ns/play)",
+                "Fields (ns/play)",
+                "Visit (ns/play)",
+                "Total (ns/play)",
+            ]
+        )
+    )
+    variants: List[
+        Tuple[str, Callable[[], Sequence[play.PlayLike]], Sequence[play.PlayLike]]
+    ] = [
+        ("Play", lambda: plays, plays),
+        ("PlayRecord", lambda: [p.record() for p in plays], records),
+        ("PlayRow", lambda: list(columns), list(columns)),
+    ]
+    for name, decode, decoded in variants:
+        decode_time = min(time_it(decode) for _ in range(BENCH_REPEATS))
+        fields_time = min(
+            time_it(lambda: read_fields(decoded)) for _ in range(BENCH_REPEATS)
+        )
+        visit_time = min(time_it(lambda: visit(decoded)) for _ in range(BENCH_REPEATS))
+        print(
+            SEPARATOR.join(
+                [
+                    name,
+                    f"{len(plays)}",
+                    f"{decode_time / len(plays) * 1e9:.0f}",
+                    f"{fields_time / len(plays) * 1e9:.0f}",
+                    f"{visit_time / len(plays) * 1e9:.0f}",
+                    f"{(decode_time + visit_time) / len(plays) * 1e9:.0f}",
+                ]
+            )
+        )
+
+    print()
+    print(SEPARATOR.join(["Parser", "Plays", "Decode (ns/play)"]))
+    for backend in BACKENDS:
+        RequestBase.configure_parser_backend(backend, RequestPlays.__name__)
+        decode_time = min(
+            time_it(lambda: decode_records(game_ids)) for _ in range(BENCH_REPEATS)
+        )
+        print(
+            SEPARATOR.join(
+                [backend, f"{len(plays)}", f"{decode_time / len(plays) * 1e9:.0f}"]
+            )
+        )
+
+    return 0
+
+
+def decode_records(game_ids: List[int]) -> None:
+    """Reading the stored plays back includes decompressing them too"""
+    for game_id in game_ids:
+        for _ in RequestPlays(thingid=game_id).queryAllRecords():
+            pass
+
+
+def read_fields(plays: Sequence[play.PlayLike]) -> None:
+    """Every field once, without anything done with them"""
+    for p in plays:
+        p.id()
+        p.user_id()
+        p.date()
+        p.quantity()
+        p.player_count()
+        p.is_incomplete()
+        p.is_nowinstats()
+        p.location()
+
+
+def visit(plays: Sequence[play.PlayLike]) -> None:
+    """All the observers the analyses run on every play"""
+    visitors: List[Callable[[play.PlayLike], None]] = [
+        pca.Logic(BENCH_PLAYER_COUNT).visit,
+        lc.Logic().visit,
+        qn.Logic().visit,
+        ml.Logic().visit,
+        sc.Logic().visit,
+    ]
+    for p in plays:
+        for visitor in visitors:
+            visitor(p)
+
+
+def time_it(fn: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    RequestBase.run_script(main)
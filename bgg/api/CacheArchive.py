@@ -0,0 +1,326 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from .CacheLock import CacheLock
+
+ARCHIVE_FILE = "entries.pack"
+INDEX_FILE = "entries.idx"
+# Held by whoever is appending to or compacting the archive
+ARCHIVE_LOCK_FILE = "entries.pack.lock"
+
+# Every record in the archive is self describing: name length, data length,
+# codec name length, modification time, followed by the name, the codec name
+# and the data. The index is only there so that opening an archive doesn't
+# require scanning it.
+RECORD_HEADER = struct.Struct("<HIBd")
+ENCODING = "utf-8"
+
+# Every open archive keeps its file mapped, so only the most recently used ones
+# are kept open
+MAX_OPEN_ARCHIVES = 64
+
+# Removed entries are marked with a record which has this as its codec
+TOMBSTONE = "-"
+
+
+class ArchivedEntry:
+    def __init__(self, offset: int, length: int, codec: str, modified: float) -> None:
+        self.offset = offset
+        self.length = length
+        self.codec = codec
+        self.modified = modified
+
+
+class CacheArchive:
+    """
+    All of a cache directory's entries packed into a single append-only file,
+    read through mmap slices. Rewriting an entry appends a new version of it,
+    the space taken by the old one is only reclaimed by compacting.
+    """
+
+    __archives: "OrderedDict[str, CacheArchive]" = OrderedDict()
+    __archives_lock = threading.Lock()
+
+    @staticmethod
+    def open(dir: str) -> "CacheArchive":
+        """Archives are shared by everyone reading and writing the directory"""
+        with CacheArchive.__archives_lock:
+            archives = CacheArchive.__archives
+            if dir in archives:
+                archives.move_to_end(dir)
+                return archives[dir]
+
+            archive = CacheArchive(dir)
+            archives[dir] = archive
+            if len(archives) > MAX_OPEN_ARCHIVES:
+                _, evicted = archives.popitem(last=False)
+                evicted.close()
+            return archive
+
+    @staticmethod
+    def exists(dir: str) -> bool:
+        return os.path.exists(os.path.join(dir, ARCHIVE_FILE))
+
+    def __init__(self, dir: str) -> None:
+        self.__dir = dir
+        self.__lock = threading.Lock()
+        self.__entries: Optional[Dict[str, ArchivedEntry]] = None
+        self.__size = 0
+        # Inode and size of the archive file when the entries were loaded, the
+        # archive could be appended to or compacted by other processes too
+        self.__file: Optional[Tuple[int, int]] = None
+        self.__mmap: Optional[mmap.mmap] = None
+
+    def read(self, name: str) -> Optional[Tuple[str, bytes]]:
+        """The codec the entry was written with and its data"""
+        with self.__lock:
+            entry = self.__getEntries().get(name)
+            if not entry:
+                return None
+            return (entry.codec, self.__getData(entry))
+
+    def write(self, name: str, codec: str, data: bytes) -> None:
+        with self.__lock, self.__getFileLock():
+            self.__append(name, codec, data, time.time())
+
+    def remove(self, name: str) -> None:
+        with self.__lock:
+            if name not in self.__getEntries():
+                return
+            with self.__getFileLock():
+                self.__append(name, TOMBSTONE, b"", time.time())
+
+    def names(self) -> List[str]:
+        with self.__lock:
+            return list(self.__getEntries())
+
+    def modified(self, name: str) -> Optional[float]:
+        with self.__lock:
+            entry = self.__getEntries().get(name)
+            return entry.modified if entry else None
+
+    def close(self) -> None:
+        """Unmaps the file, it would be mapped again if needed"""
+        with self.__lock:
+            self.__close()
+
+    def size(self) -> int:
+        """Bytes taken by the data of the latest version of each entry"""
+        return sum(self.sizes().values())
+
+    def sizes(self) -> Dict[str, int]:
+        with self.__lock:
+            return {name: entry.length for name, entry in self.__getEntries().items()}
+
+    def garbage(self) -> int:
+        """Bytes taken by entries which were rewritten or removed since"""
+        with self.__lock:
+            live = sum(
+                RECORD_HEADER.size
+                + len(name.encode(ENCODING))
+                + len(entry.codec.encode(ENCODING))
+                + entry.length
+                for name, entry in self.__getEntries().items()
+            )
+            return self.__size - live
+
+    def compact(self, loose: Dict[str, Tuple[str, bytes, float]]) -> None:
+        """
+        Rewrites the archive with only the latest version of each entry.
+        Loose entries (name -> codec, data, modification time) are packed in
+        too, replacing the archived version if they are newer.
+        """
+        with self.__lock, self.__getFileLock():
+            entries = {
+                name: (
+                    entry.codec,
+                    self.__getData(entry),
+                    entry.modified,
+                )
+                for name, entry in self.__getEntries().items()
+            }
+            for name, (codec, data, modified) in loose.items():
+                if name not in entries or entries[name][2] < modified:
+                    entries[name] = (codec, data, modified)
+
+            self.__close()
+            temp_archive = os.path.join(self.__dir, f"{ARCHIVE_FILE}.tmp")
+            temp_index = os.path.join(self.__dir, f"{INDEX_FILE}.tmp")
+            os.makedirs(self.__dir, exist_ok=True)
+            with open(temp_archive, "wb") as archive, open(temp_index, "wt") as index:
+                offset = 0
+                for name in sorted(entries):
+                    codec, data, modified = entries[name]
+                    offset, index_line = CacheArchive.__writeRecord(
+                        archive, offset, name, codec, data, modified
+                    )
+                    index.write(index_line)
+            # The index is replaced last, an archive which is bigger than its
+            # index says is caught up by scanning it
+            os.replace(temp_archive, os.path.join(self.__dir, ARCHIVE_FILE))
+            os.replace(temp_index, os.path.join(self.__dir, INDEX_FILE))
+            self.__entries = None
+
+    def __append(self, name: str, codec: str, data: bytes, modified: float) -> None:
+        # Picks up whatever other processes appended before the lock was taken
+        entries = self.__getEntries()
+        os.makedirs(self.__dir, exist_ok=True)
+        with open(os.path.join(self.__dir, ARCHIVE_FILE), "ab") as archive:
+            if archive.tell() != self.__size:
+                # Drop whatever a crash left after the last complete record
+                self.__close()
+                archive.truncate(self.__size)
+            offset, index_line = CacheArchive.__writeRecord(
+                archive, self.__size, name, codec, data, modified
+            )
+        # Only indexed once the record is complete
+        with open(os.path.join(self.__dir, INDEX_FILE), "at") as index:
+            index.write(index_line)
+        self.__apply(entries, name, codec, offset - len(data), len(data), modified)
+        self.__size = offset
+        self.__file = self.__statArchive()
+
+    @staticmethod
+    def __writeRecord(
+        archive: BinaryIO,
+        offset: int,
+        name: str,
+        codec: str,
+        data: bytes,
+        modified: float,
+    ) -> Tuple[int, str]:
+        """Returns the offset right after the record, and its index line"""
+        raw_name = name.encode(ENCODING)
+        raw_codec = codec.encode(ENCODING)
+        archive.write(
+            RECORD_HEADER.pack(len(raw_name), len(data), len(raw_codec), modified)
+            + raw_name
+            + raw_codec
+            + data
+        )
+        data_offset = offset + RECORD_HEADER.size + len(raw_name) + len(raw_codec)
+        return (
+            data_offset + len(data),
+            f"{name}\t{codec}\t{data_offset}\t{len(data)}\t{modified}\n",
+        )
+
+    @staticmethod
+    def __apply(
+        entries: Dict[str, ArchivedEntry],
+        name: str,
+        codec: str,
+        offset: int,
+        length: int,
+        modified: float,
+    ) -> None:
+        if codec == TOMBSTONE:
+            entries.pop(name, None)
+        else:
+            entries[name] = ArchivedEntry(offset, length, codec, modified)
+
+    def __getEntries(self) -> Dict[str, ArchivedEntry]:
+        # A single stat per access, so that changes made by other processes are
+        # picked up
+        file = self.__statArchive()
+        if self.__entries is not None:
+            if file == self.__file:
+                return self.__entries
+            if (
+                file
+                and self.__file
+                and file[0] == self.__file[0]
+                and file[1] > self.__file[1]
+            ):
+                # Appended to since, only the new records need to be read
+                self.__scan(self.__entries, self.__size, file[1])
+                self.__file = file
+                return self.__entries
+
+        # Compacted (or created, or removed) since, start over
+        self.__close()
+
+        entries: Dict[str, ArchivedEntry] = {}
+        indexed_size = 0
+        try:
+            with open(os.path.join(self.__dir, INDEX_FILE), "rt") as index:
+                for line in index:
+                    fields = line.rstrip("\n").split("\t")
+                    if len(fields) != 5:
+                        # A partially written line, the scan would fix it
+                        break
+                    name, codec, offset, length, modified = fields
+                    CacheArchive.__apply(
+                        entries, name, codec, int(offset), int(length), float(modified)
+                    )
+                    indexed_size = max(indexed_size, int(offset) + int(length))
+        except FileNotFoundError:
+            pass
+
+        size = file[1] if file else 0
+        self.__size = indexed_size
+        if indexed_size < size:
+            # Some records never made it to the index
+            self.__scan(entries, indexed_size, size)
+        elif indexed_size > size:
+            # The archive was replaced under an older index, don't trust it
+            entries = {}
+            self.__scan(entries, 0, size)
+
+        self.__entries = entries
+        self.__file = file
+        return entries
+
+    def __scan(self, entries: Dict[str, ArchivedEntry], offset: int, size: int) -> None:
+        """Reads the records between offset and size, up to the last whole one"""
+        self.__size = offset
+        if not size:
+            # Empty files can't be mapped, and there's nothing to scan anyway
+            return
+        mapped = self.__getMapped(size)
+        while offset + RECORD_HEADER.size <= size:
+            name_length, length, codec_length, modified = RECORD_HEADER.unpack_from(
+                mapped, offset
+            )
+            name_offset = offset + RECORD_HEADER.size
+            data_offset = name_offset + name_length + codec_length
+            if data_offset + length > size:
+                # Truncated by a crash mid-write, it will be overwritten
+                break
+            codec_offset = name_offset + name_length
+            name = bytes(mapped[name_offset:codec_offset]).decode(ENCODING)
+            codec = bytes(mapped[codec_offset:data_offset]).decode(ENCODING)
+            CacheArchive.__apply(entries, name, codec, data_offset, length, modified)
+            offset = data_offset + length
+        self.__size = offset
+
+    def __getFileLock(self) -> CacheLock:
+        return CacheLock(os.path.join(self.__dir, ARCHIVE_LOCK_FILE))
+
+    def __statArchive(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(os.path.join(self.__dir, ARCHIVE_FILE))
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_size)
+
+    def __getData(self, entry: ArchivedEntry) -> bytes:
+        start = entry.offset
+        end = start + entry.length
+        return self.__getMapped(end)[start:end]
+
+    def __getMapped(self, size: int) -> mmap.mmap:
+        if self.__mmap is None or len(self.__mmap) < size:
+            self.__close()
+            with open(os.path.join(self.__dir, ARCHIVE_FILE), "rb") as archive:
+                self.__mmap = mmap.mmap(archive.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.__mmap
+
+    def __close(self) -> None:
+        if self.__mmap is not None:
+            self.__mmap.close()
+            self.__mmap = None
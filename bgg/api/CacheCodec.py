@@ -0,0 +1,63 @@
+import bz2
+import lzma
+import zlib
+from typing import Callable, Dict, Optional
+
+ENCODING = "utf-8"
+
+
+class CacheCodec:
+    """How cached responses are compressed on disk, each codec has its own suffix"""
+
+    def __init__(
+        self,
+        name: str,
+        suffix: str,
+        compress: Callable[[bytes], bytes],
+        decompress: Callable[[bytes], bytes],
+    ) -> None:
+        self.__name = name
+        self.__suffix = suffix
+        self.__compress = compress
+        self.__decompress = decompress
+
+    def name(self) -> str:
+        return self.__name
+
+    def suffix(self) -> str:
+        return self.__suffix
+
+    def encode(self, contents: str) -> bytes:
+        return self.__compress(contents.encode(ENCODING))
+
+    def decode(self, data: bytes) -> str:
+        return self.__decompress(data).decode(ENCODING)
+
+
+CODECS: Dict[str, CacheCodec] = {
+    codec.name(): codec
+    for codec in [
+        # Small, but by far the slowest to decompress
+        CacheCodec("bz2", ".xml.bz2", bz2.compress, bz2.decompress),
+        CacheCodec("lzma", ".xml.xz", lzma.compress, lzma.decompress),
+        CacheCodec("zlib", ".xml.zz", zlib.compress, zlib.decompress),
+        CacheCodec("none", ".xml", lambda data: data, lambda data: data),
+    ]
+}
+
+# What the cache was always written with, before codecs were configurable
+DEFAULT_CODEC = "bz2"
+
+
+def codec_by_name(name: str) -> CacheCodec:
+    if name not in CODECS:
+        raise Exception(f"Unknown cache codec '{name}', expected one of {list(CODECS)}")
+    return CODECS[name]
+
+
+def codec_for_file(file_name: str) -> Optional[CacheCodec]:
+    """The codec a cache file was written with, going by its suffix"""
+    return next(
+        (codec for codec in CODECS.values() if file_name.endswith(codec.suffix())),
+        None,
+    )
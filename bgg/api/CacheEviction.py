@@ -0,0 +1,137 @@
+import math
+import os
+import shutil
+import time
+from typing import Callable, Dict, List, Tuple
+
+from .CacheArchive import CacheArchive
+from .CacheCodec import CODECS, codec_for_file
+from .CacheUsage import UnitUsage
+
+# Once over budget, units are evicted until the cache is down to this much of
+# it, so that the next few runs don't have to evict again right away
+LOW_WATERMARK = 0.9
+
+
+class CacheUnit:
+    """Something evicted as a whole, see CacheUsage"""
+
+    def __init__(
+        self, request_type: str, name: str, size: int, modified: float
+    ) -> None:
+        self.request_type = request_type
+        # Cache dir or entry name, within the request type's directory
+        self.name = name
+        self.size = size
+        self.modified = modified
+
+    def path(self) -> str:
+        """How the unit is named in the usage"""
+        return f"{self.request_type}/{self.name}"
+
+
+def cache_units(root: str) -> List[CacheUnit]:
+    units: List[CacheUnit] = []
+    if not os.path.isdir(root):
+        return units
+
+    for request_type in sorted(os.listdir(root)):
+        type_dir = os.path.join(root, request_type)
+        if os.path.isdir(type_dir):
+            units.extend(request_type_units(request_type, type_dir))
+    return units
+
+
+def request_type_units(request_type: str, type_dir: str) -> List[CacheUnit]:
+    """Its cache directories, and its entries whether loose or archived"""
+    units: List[CacheUnit] = []
+    entries: Dict[str, CacheUnit] = {}
+    for entry in os.scandir(type_dir):
+        if entry.is_dir():
+            units.append(
+                CacheUnit(request_type, entry.name, *directory_usage(entry.path))
+            )
+            continue
+
+        codec = codec_for_file(entry.name)
+        if not codec:
+            continue
+        name = entry.name[: -len(codec.suffix())]
+        stat = entry.stat()
+        if name in entries:
+            # The same entry in more than one codec
+            entries[name].size += stat.st_size
+        else:
+            entries[name] = CacheUnit(request_type, name, stat.st_size, stat.st_mtime)
+
+    if CacheArchive.exists(type_dir):
+        archive = CacheArchive.open(type_dir)
+        for name, size in archive.sizes().items():
+            if name in entries:
+                entries[name].size += size
+            else:
+                entries[name] = CacheUnit(
+                    request_type, name, size, archive.modified(name) or 0
+                )
+    return units + list(entries.values())
+
+
+def directory_usage(dir: str) -> Tuple[int, float]:
+    """Total size of the files under the directory, and the newest of them"""
+    size = 0
+    modified = 0.0
+    for path, _, files in os.walk(dir):
+        for file in files:
+            stat = os.stat(os.path.join(path, file))
+            size += stat.st_size
+            modified = max(modified, stat.st_mtime)
+    return (size, modified)
+
+
+def pick_evicted(
+    units: List[CacheUnit],
+    usage: Dict[str, UnitUsage],
+    max_bytes: int,
+    aging: Callable[[CacheUnit], float],
+) -> List[CacheUnit]:
+    """
+    Least recently used first, but each unit ages at the rate its request type
+    gives it (see RequestBase._cache_aging), and units used more often age
+    slower
+    """
+    size = sum(unit.size for unit in units)
+    if size <= max_bytes:
+        return []
+
+    now = time.time()
+
+    def age(unit: CacheUnit) -> float:
+        unit_usage = usage.get(unit.path())
+        accessed = unit_usage.accessed if unit_usage else unit.modified
+        hits = unit_usage.hits if unit_usage else 0
+        return max(now - accessed, 0) * aging(unit) / math.log2(2 + hits)
+
+    evicted: List[CacheUnit] = []
+    for unit in sorted(units, key=age, reverse=True):
+        if size <= max_bytes * LOW_WATERMARK:
+            break
+        evicted.append(unit)
+        size -= unit.size
+    return evicted
+
+
+def remove_unit(root: str, unit: CacheUnit) -> None:
+    type_dir = os.path.join(root, unit.request_type)
+    path = os.path.join(type_dir, unit.name)
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+        return
+
+    for codec in CODECS.values():
+        try:
+            os.remove(f"{path}{codec.suffix()}")
+        except FileNotFoundError:
+            pass
+    if CacheArchive.exists(type_dir):
+        # The space is only reclaimed once the archive is compacted
+        CacheArchive.open(type_dir).remove(unit.name)
@@ -0,0 +1,206 @@
+import abc
+import json
+import os
+import threading
+from typing import Any, Dict, Generic, Iterable, List, Optional, Tuple, Type, TypeVar
+
+from .CacheLock import CacheLock, write_atomically
+
+TEntry = TypeVar("TEntry")
+TIndex = TypeVar("TIndex", bound="CacheIndex")
+
+# Every update appends the whole entry as a line, so the file is rewritten
+# with just the latest line of every entry once it gets this much bigger than
+# the number of entries
+COMPACT_FACTOR = 4
+
+
+class CacheIndex(Generic[TEntry]):
+    """
+    Entries kept up to date as the cache under a directory is written. The
+    entries are appended to a single file so that they could all be loaded
+    in one read, and only what other processes appended since is read again.
+    """
+
+    # By their type too, there could be more than one under the same directory
+    __indexes: Dict[Tuple[type, str], Any] = {}
+    __indexes_lock = threading.Lock()
+
+    @classmethod
+    def open(cls: Type[TIndex], dir: str) -> TIndex:
+        with CacheIndex.__indexes_lock:
+            if (cls, dir) not in CacheIndex.__indexes:
+                CacheIndex.__indexes[(cls, dir)] = cls(dir)
+            return CacheIndex.__indexes[(cls, dir)]
+
+    def __init__(self, dir: str) -> None:
+        self.__dir = dir
+        self.__lock = threading.Lock()
+        self.__entries: Dict[str, TEntry] = {}
+        self.__lines = 0
+        # Inode and size of the file when it was last read, other processes
+        # could be appending to it too
+        self.__file: Optional[Tuple[int, int]] = None
+
+    @classmethod
+    @abc.abstractmethod
+    def _file_name(cls) -> str:
+        pass
+
+    @classmethod
+    @abc.abstractmethod
+    def _lock_file_name(cls) -> str:
+        pass
+
+    @classmethod
+    @abc.abstractmethod
+    def _key_field(cls) -> str:
+        """Entries are keyed by this field of their line"""
+
+    @abc.abstractmethod
+    def _entry_from_json(self, raw: Dict[str, Any]) -> TEntry:
+        """The whole line, the entry could keep it as is"""
+
+    @abc.abstractmethod
+    def _entry_to_json(self, entry: TEntry) -> Dict[str, Any]:
+        pass
+
+    def get(self, key: str) -> Optional[TEntry]:
+        with self.__lock:
+            return self.__getEntries().get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, TEntry]:
+        """Only the keys which have entries"""
+        with self.__lock:
+            entries = self.__getEntries()
+            return {key: entries[key] for key in keys if key in entries}
+
+    def entries(self) -> Dict[str, TEntry]:
+        with self.__lock:
+            return dict(self.__getEntries())
+
+    def put(self, key: str, entry: TEntry) -> None:
+        self.update({key: entry})
+
+    def update(self, updates: Dict[str, TEntry]) -> None:
+        if not updates:
+            return
+
+        with self.__lock, self.__getFileLock():
+            entries = self.__getEntries()
+            entries.update(updates)
+            os.makedirs(self.__dir, exist_ok=True)
+            with open(self.__getPath(), "at") as index:
+                index.write(self.__partialLineEnd() + self.__linesOf(updates))
+            self.__lines += len(updates)
+            self.__file = self.__statIndex()
+
+            if self.__lines > COMPACT_FACTOR * len(entries):
+                self.__compact(entries)
+
+    def remove(self, keys: Iterable[str]) -> None:
+        with self.__lock, self.__getFileLock():
+            entries = dict(self.__getEntries())
+            for key in keys:
+                entries.pop(key, None)
+            if len(entries) < len(self.__entries):
+                self.__compact(entries)
+
+    def rebuild(self, entries: Dict[str, TEntry]) -> None:
+        """Replaces all the entries, for when the index is missing some"""
+        with self.__lock, self.__getFileLock():
+            self.__compact(entries)
+
+    def __getEntries(self) -> Dict[str, TEntry]:
+        file = self.__statIndex()
+        if file == self.__file:
+            return self.__entries
+
+        offset = 0
+        if (
+            file
+            and self.__file
+            and file[0] == self.__file[0]
+            and file[1] > self.__file[1]
+        ):
+            # Appended to since, only the new lines need to be read
+            offset = self.__file[1]
+        else:
+            # Compacted (or created, or removed) since, start over
+            self.__entries = {}
+            self.__lines = 0
+
+        if file:
+            key_field = self._key_field()
+            with open(self.__getPath(), "rb") as index:
+                index.seek(offset)
+                data = index.read()
+            lines = data.split(b"\n")
+            # Whatever follows the last newline is still being written, it
+            # would be read next time
+            file = (file[0], offset + len(data) - len(lines.pop()))
+            for raw in CacheIndex.__decodeLines(lines):
+                if not isinstance(raw, dict) or key_field not in raw:
+                    continue
+                key = raw[key_field]
+                self.__entries[key] = self._entry_from_json(raw)
+            self.__lines += len(lines)
+        self.__file = file
+        return self.__entries
+
+    def __compact(self, entries: Dict[str, TEntry]) -> None:
+        write_atomically(self.__getPath(), self.__linesOf(entries).encode())
+        self.__entries = dict(entries)
+        self.__lines = len(entries)
+        self.__file = self.__statIndex()
+
+    @staticmethod
+    def __decodeLines(lines: List[bytes]) -> List[Any]:
+        try:
+            # Decoded all at once, which is much faster than line by line
+            return json.loads(b"[" + b",".join(lines) + b"]")
+        except ValueError:
+            pass
+
+        # Some line is broken (see __partialLineEnd), only it is skipped
+        decoded = []
+        for line in lines:
+            try:
+                decoded.append(json.loads(line))
+            except ValueError:
+                continue
+        return decoded
+
+    def __partialLineEnd(self) -> str:
+        """
+        Writers hold the file lock, so a last line without a newline was cut
+        short by a crash. It's ended before appending, or the next line would
+        be appended to it and be lost with it.
+        """
+        try:
+            with open(self.__getPath(), "rb") as index:
+                index.seek(-1, os.SEEK_END)
+                return "" if index.read(1) == b"\n" else "\n"
+        except OSError:
+            # Missing or empty
+            return ""
+
+    def __linesOf(self, entries: Dict[str, TEntry]) -> str:
+        key_field = self._key_field()
+        return "".join(
+            json.dumps({key_field: key, **self._entry_to_json(entry)}) + "\n"
+            for key, entry in entries.items()
+        )
+
+    def __getFileLock(self) -> CacheLock:
+        return CacheLock(os.path.join(self.__dir, self._lock_file_name()))
+
+    def __statIndex(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.__getPath())
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_size)
+
+    def __getPath(self) -> str:
+        return os.path.join(self.__dir, self._file_name())
@@ -0,0 +1,126 @@
+import os
+import sys
+import threading
+import zlib
+from types import TracebackType
+from typing import Dict, Optional, Tuple, Type
+
+if sys.platform != "win32":
+    import fcntl
+
+# Keys are spread over this many byte ranges of their lock file, keys which
+# end up on the same range just wait for each other
+LOCK_STRIPES = 1024
+
+
+class LockStripe:
+    def __init__(self) -> None:
+        self.lock = threading.RLock()
+        # How many times the thread holding the lock has acquired it
+        self.depth = 0
+
+
+class LockFile:
+    def __init__(self, fd: int) -> None:
+        self.fd = fd
+        # Closing any descriptor of a file drops all the locks the process has
+        # on it, so it's only closed once none of them are held
+        self.holders = 0
+
+
+class CacheLock:
+    """
+    An exclusive lock on a key, held against other threads and other
+    processes alike (using a byte range lock on a shared lock file). The lock
+    is reentrant for the thread holding it.
+    On Windows only the threads of the same process are kept apart.
+    """
+
+    __stripes: Dict[Tuple[str, int], LockStripe] = {}
+    __files: Dict[str, LockFile] = {}
+    __lock = threading.Lock()
+
+    def __init__(self, lock_file: str, key: str = "") -> None:
+        self.__lock_file = lock_file
+        self.__stripe = zlib.crc32(key.encode()) % LOCK_STRIPES
+
+    def __enter__(self) -> "CacheLock":
+        stripe = self.__getStripe()
+        stripe.lock.acquire()
+        if stripe.depth == 0 and sys.platform != "win32":
+            fd = self.__openFile()
+            try:
+                # Blocks until other processes release the range
+                fcntl.lockf(fd, fcntl.LOCK_EX, 1, self.__stripe)
+            except BaseException:
+                self.__closeFile()
+                stripe.lock.release()
+                raise
+        stripe.depth += 1
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        stripe = self.__getStripe()
+        stripe.depth -= 1
+        try:
+            if stripe.depth == 0 and sys.platform != "win32":
+                try:
+                    fcntl.lockf(
+                        CacheLock.__files[self.__lock_file].fd,
+                        fcntl.LOCK_UN,
+                        1,
+                        self.__stripe,
+                    )
+                finally:
+                    self.__closeFile()
+        finally:
+            stripe.lock.release()
+
+    def __getStripe(self) -> LockStripe:
+        key = (self.__lock_file, self.__stripe)
+        with CacheLock.__lock:
+            if key not in CacheLock.__stripes:
+                CacheLock.__stripes[key] = LockStripe()
+            return CacheLock.__stripes[key]
+
+    def __openFile(self) -> int:
+        with CacheLock.__lock:
+            file = CacheLock.__files.get(self.__lock_file)
+            if file is None:
+                os.makedirs(os.path.dirname(self.__lock_file), exist_ok=True)
+                file = LockFile(os.open(self.__lock_file, os.O_RDWR | os.O_CREAT))
+                CacheLock.__files[self.__lock_file] = file
+            file.holders += 1
+            return file.fd
+
+    def __closeFile(self) -> None:
+        with CacheLock.__lock:
+            file = CacheLock.__files[self.__lock_file]
+            file.holders -= 1
+            if file.holders == 0:
+                os.close(file.fd)
+                del CacheLock.__files[self.__lock_file]
+
+
+def write_atomically(path: str, contents: bytes) -> None:
+    """
+    Writes to a temp file which is then renamed over the path, so readers
+    (and crashes) never see a partially written file
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(contents)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
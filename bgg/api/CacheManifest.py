@@ -0,0 +1,77 @@
+import datetime
+from typing import Any, Dict, Optional
+
+from .CacheIndex import CacheIndex
+
+MANIFEST_FILE = "manifest.jsonl"
+MANIFEST_LOCK_FILE = "manifest.lock"
+
+
+class ManifestEntry:
+    """What's known about a single cached query, without reading any of it"""
+
+    def __init__(
+        self,
+        pages: int = 0,
+        total: Optional[int] = None,
+        fetched: Optional[datetime.datetime] = None,
+        bytes: int = 0,
+        complete: bool = False,
+    ) -> None:
+        # Pages (or chunks) cached for the query
+        self.pages = pages
+        # As reported by the API the last time all of the query was fetched
+        self.total = total
+        self.fetched = fetched
+        # On disk, after compression
+        self.bytes = bytes
+        # If the crawl got to the last page
+        self.complete = complete
+
+    @staticmethod
+    def from_json(raw: Dict[str, Any]) -> "ManifestEntry":
+        return ManifestEntry(
+            pages=raw["pages"],
+            total=raw["total"],
+            fetched=(
+                datetime.datetime.fromtimestamp(raw["fetched"])
+                if raw["fetched"] is not None
+                else None
+            ),
+            bytes=raw["bytes"],
+            complete=raw["complete"],
+        )
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "pages": self.pages,
+            "total": self.total,
+            "fetched": self.fetched.timestamp() if self.fetched else None,
+            "bytes": self.bytes,
+            "complete": self.complete,
+        }
+
+
+class CacheManifest(CacheIndex[ManifestEntry]):
+    """
+    An entry for each query cached under a request type's cache directory,
+    keyed by the query's cache dir
+    """
+
+    @classmethod
+    def _file_name(cls) -> str:
+        return MANIFEST_FILE
+
+    @classmethod
+    def _lock_file_name(cls) -> str:
+        return MANIFEST_LOCK_FILE
+
+    @classmethod
+    def _key_field(cls) -> str:
+        return "query"
+
+    def _entry_from_json(self, raw: Dict[str, Any]) -> ManifestEntry:
+        return ManifestEntry.from_json(raw)
+
+    def _entry_to_json(self, entry: ManifestEntry) -> Dict[str, Any]:
+        return entry.to_json()
@@ -0,0 +1,184 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from .CacheLock import CacheLock, write_atomically
+
+USAGE_FILE = "usage.jsonl"
+BUDGET_FILE = "budget.json"
+USAGE_LOCK_FILE = "usage.lock"
+
+# Every run appends a line for each unit it used, they are merged once the
+# file gets this big
+MAX_USAGE_FILE_SIZE = 16 * 1024 * 1024
+
+
+class UnitUsage:
+    def __init__(self, accessed: float, hits: int) -> None:
+        self.accessed = accessed
+        self.hits = hits
+
+    def merge(self, other: "UnitUsage") -> None:
+        self.accessed = max(self.accessed, other.accessed)
+        self.hits += other.hits
+
+
+class CacheUsage:
+    """
+    When, and how often, each unit of the cache was used. Units are what's
+    evicted together: a whole cache directory for requests which have one,
+    otherwise single entries. They are named by their path under the cache
+    root. Usage is kept in memory and only written when the run ends, along
+    with how many bytes the run added to the cache.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.__root = root
+        self.__lock = threading.Lock()
+        self.__units: Dict[str, UnitUsage] = {}
+        self.__written = 0
+
+    def touch(self, unit: str) -> None:
+        with self.__lock:
+            usage = self.__units.get(unit)
+            if usage:
+                usage.accessed = time.time()
+                usage.hits += 1
+            else:
+                self.__units[unit] = UnitUsage(time.time(), 1)
+
+    def written(self, size: int) -> None:
+        with self.__lock:
+            self.__written += size
+
+    def discard(self) -> None:
+        """Forgets what was used since the last flush"""
+        with self.__lock:
+            self.__units = {}
+            self.__written = 0
+
+    def flush(self) -> None:
+        with self.__lock:
+            units = self.__units
+            written = self.__written
+            self.__units = {}
+            self.__written = 0
+        if not units and not written:
+            return
+
+        with self.__getFileLock():
+            if units:
+                os.makedirs(self.__root, exist_ok=True)
+                lines = "".join(
+                    CacheUsage.__toLine(unit, usage) for unit, usage in units.items()
+                )
+                partial_line_end = self.__partialLineEnd()
+                with open(self.__getUsagePath(), "at") as f:
+                    f.write(partial_line_end + lines)
+                if os.path.getsize(self.__getUsagePath()) > MAX_USAGE_FILE_SIZE:
+                    self.__rewrite(self.__read())
+
+            budget = self.__readBudget()
+            if budget:
+                budget["size"] += written
+                self.__writeBudget(budget)
+
+    def load(self) -> Dict[str, UnitUsage]:
+        """Everything recorded so far, by unit"""
+        with self.__getFileLock():
+            return self.__read()
+
+    def forget(self, units: Iterable[str]) -> None:
+        """Drops the usage of units which were evicted"""
+        with self.__getFileLock():
+            usage = self.__read()
+            for unit in units:
+                usage.pop(unit, None)
+            self.__rewrite(usage)
+
+    def budget(self) -> Optional[Tuple[int, int]]:
+        """The max size of the cache, and its size as far as we know"""
+        with self.__getFileLock():
+            budget = self.__readBudget()
+        return (budget["max_bytes"], budget["size"]) if budget else None
+
+    def set_budget(self, max_bytes: Optional[int], size: int = 0) -> None:
+        with self.__getFileLock():
+            if max_bytes is None:
+                try:
+                    os.remove(self.__getBudgetPath())
+                except FileNotFoundError:
+                    pass
+            else:
+                self.__writeBudget({"max_bytes": max_bytes, "size": size})
+
+    def __read(self) -> Dict[str, UnitUsage]:
+        usage: Dict[str, UnitUsage] = {}
+        try:
+            with open(self.__getUsagePath(), "rt") as f:
+                for line in f:
+                    try:
+                        raw = json.loads(line)
+                        name = str(raw["unit"])
+                        unit = UnitUsage(float(raw["accessed"]), int(raw["hits"]))
+                    except (ValueError, KeyError, TypeError):
+                        # Cut short by a crash, see __partialLineEnd
+                        continue
+                    if name in usage:
+                        usage[name].merge(unit)
+                    else:
+                        usage[name] = unit
+        except FileNotFoundError:
+            pass
+        return usage
+
+    def __partialLineEnd(self) -> str:
+        """
+        Writers hold the file lock, so a last line without a newline was cut
+        short by a crash. It's ended before appending, or the next line would
+        be appended to it and be lost with it.
+        """
+        try:
+            with open(self.__getUsagePath(), "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                return "" if f.read(1) == b"\n" else "\n"
+        except OSError:
+            # Missing or empty
+            return ""
+
+    def __rewrite(self, usage: Dict[str, UnitUsage]) -> None:
+        write_atomically(
+            self.__getUsagePath(),
+            "".join(
+                CacheUsage.__toLine(unit, unit_usage)
+                for unit, unit_usage in usage.items()
+            ).encode(),
+        )
+
+    def __readBudget(self) -> Optional[Dict[str, int]]:
+        try:
+            with open(self.__getBudgetPath(), "rt") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def __writeBudget(self, budget: Dict[str, int]) -> None:
+        write_atomically(self.__getBudgetPath(), json.dumps(budget).encode())
+
+    @staticmethod
+    def __toLine(unit: str, usage: UnitUsage) -> str:
+        return (
+            json.dumps({"unit": unit, "accessed": usage.accessed, "hits": usage.hits})
+            + "\n"
+        )
+
+    def __getFileLock(self) -> CacheLock:
+        return CacheLock(os.path.join(self.__root, USAGE_LOCK_FILE))
+
+    def __getUsagePath(self) -> str:
+        return os.path.join(self.__root, USAGE_FILE)
+
+    def __getBudgetPath(self) -> str:
+        return os.path.join(self.__root, BUDGET_FILE)
@@ -0,0 +1,239 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+# Sizes are measured by the size of the raw response each entry was parsed
+# from, measuring the parsed trees themselves would cost more than caching
+# them saves. The trees hold around 5-8 times that, so this default keeps the
+# memory cache at around 100MiB.
+DEFAULT_MAX_SIZE = 16 * 1024 * 1024
+
+T = TypeVar("T")
+
+
+class MemoryCacheStats:
+    """How the memory cache was used, as of when the stats were taken"""
+
+    def __init__(
+        self,
+        hits: int,
+        misses: int,
+        shared: int,
+        entries: int,
+        size: int,
+        max_size: int,
+    ) -> None:
+        self.__hits = hits
+        self.__misses = misses
+        self.__shared = shared
+        self.__entries = entries
+        self.__size = size
+        self.__max_size = max_size
+
+    def hits(self) -> int:
+        return self.__hits
+
+    def misses(self) -> int:
+        return self.__misses
+
+    def shared(self) -> int:
+        """Lookups which waited for a load already in flight"""
+        return self.__shared
+
+    def entries(self) -> int:
+        return self.__entries
+
+    def size(self) -> int:
+        """In bytes of the raw responses the entries were parsed from"""
+        return self.__size
+
+    def max_size(self) -> int:
+        return self.__max_size
+
+    def __str__(self) -> str:
+        return (
+            f"{self.__hits} hits, {self.__misses} misses, {self.__shared} shared, "
+            f"{self.__entries} entries ({self.__size / 1024 / 1024:.1f}MiB of "
+            f"{self.__max_size / 1024 / 1024:.1f}MiB responses)"
+        )
+
+
+class MemoryCache:
+    """
+    A bounded, in-process LRU cache of parsed responses. Concurrent callers
+    asking for the same key while it's being loaded wait for that single load
+    instead of loading it again.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE) -> None:
+        self.__max_size = max_size
+        self.__entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self.__size = 0
+        self.__in_flight: Dict[Hashable, Future] = {}
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+        self.__shared = 0
+
+    def resize(self, max_size: int) -> None:
+        with self.__lock:
+            self.__max_size = max_size
+            self.__evict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self.__lock:
+            if key not in self.__entries:
+                return None
+            self.__hits += 1
+            self.__entries.move_to_end(key)
+            return self.__entries[key][0]
+
+    def put(self, key: Hashable, value: Any, size: int) -> None:
+        with self.__lock:
+            self.__put(key, value, size)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Tuple[T, int]]) -> T:
+        """The loader returns the value and its size"""
+        future, is_owner = self.__claim(key)
+        if not is_owner:
+            return future.result()
+
+        try:
+            value, size = loader()
+        except BaseException as e:
+            self.__abandon(key, future, e)
+            raise
+
+        self.__complete(key, future, value, size)
+        return value
+
+    async def get_or_load_async(
+        self, key: Hashable, loader: Callable[[], Awaitable[Tuple[T, int]]]
+    ) -> T:
+        future, is_owner = self.__claim(key)
+        if not is_owner:
+            # A waiter being cancelled mustn't cancel the load for the others
+            return await asyncio.wrap_future(MemoryCache.__waiter(future))
+
+        try:
+            value, size = await loader()
+        except BaseException as e:
+            self.__abandon(key, future, e)
+            raise
+
+        self.__complete(key, future, value, size)
+        return value
+
+    def get_or_load_deferred(
+        self, key: Hashable, loader: Callable[[], "Future[Tuple[T, int]]"]
+    ) -> "Future[T]":
+        """Same, but the loader only starts the load and returns its future"""
+        future, is_owner = self.__claim(key)
+        if not is_owner:
+            return MemoryCache.__waiter(future)
+
+        try:
+            loading = loader()
+        except BaseException as e:
+            self.__abandon(key, future, e)
+            raise
+
+        def on_loaded(loading: "Future[Tuple[T, int]]") -> None:
+            e = loading.exception() if not loading.cancelled() else CancelledError()
+            if e:
+                self.__abandon(key, future, e)
+            else:
+                value, size = loading.result()
+                self.__complete(key, future, value, size)
+
+        loading.add_done_callback(on_loaded)
+        return MemoryCache.__waiter(future)
+
+    def stats(self) -> MemoryCacheStats:
+        with self.__lock:
+            return MemoryCacheStats(
+                self.__hits,
+                self.__misses,
+                self.__shared,
+                len(self.__entries),
+                self.__size,
+                self.__max_size,
+            )
+
+    def __claim(self, key: Hashable) -> Tuple[Future, bool]:
+        with self.__lock:
+            if key in self.__entries:
+                self.__hits += 1
+                self.__entries.move_to_end(key)
+                future: Future = Future()
+                future.set_result(self.__entries[key][0])
+                return (future, False)
+
+            if key in self.__in_flight:
+                self.__shared += 1
+                return (self.__in_flight[key], False)
+
+            self.__misses += 1
+            future = Future()
+            self.__in_flight[key] = future
+            return (future, True)
+
+    def __complete(self, key: Hashable, future: Future, value: Any, size: int) -> None:
+        with self.__lock:
+            del self.__in_flight[key]
+            self.__put(key, value, size)
+        future.set_result(value)
+
+    def __abandon(self, key: Hashable, future: Future, e: BaseException) -> None:
+        with self.__lock:
+            del self.__in_flight[key]
+        future.set_exception(e)
+
+    @staticmethod
+    def __waiter(future: Future) -> Future:
+        """
+        A future of its own for each caller waiting on a load, the load's
+        future is never handed out so no one could cancel it
+        """
+        waiter: Future = Future()
+
+        def on_done(future: Future) -> None:
+            if not waiter.set_running_or_notify_cancel():
+                # Cancelled by its caller
+                return
+            e = future.exception()
+            if e:
+                waiter.set_exception(e)
+            else:
+                waiter.set_result(future.result())
+
+        future.add_done_callback(on_done)
+        return waiter
+
+    def __put(self, key: Hashable, value: Any, size: int) -> None:
+        if key in self.__entries:
+            self.__size -= self.__entries.pop(key)[1]
+
+        if size > self.__max_size:
+            # Would evict everything else and still not fit
+            return
+
+        self.__entries[key] = (value, size)
+        self.__size += size
+        self.__evict()
+
+    def __evict(self) -> None:
+        while self.__size > self.__max_size and self.__entries:
+            _, (_, size) = self.__entries.popitem(last=False)
+            self.__size -= size
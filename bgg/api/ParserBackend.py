@@ -0,0 +1,327 @@
+import datetime
+import xml.etree.ElementTree as ET
+from typing import Any, Callable, Dict, List, Optional, Set
+from xml.parsers import expat
+
+from ..model import play, thing
+
+# Items are looked at by their depth under the root (which is at depth 1),
+# items could have other items nested in them
+ITEM_DEPTH = 2
+
+RANK_NOT_RANKED = "Not Ranked"
+
+
+class ParserBackend:
+    """
+    How cached responses are decoded into the compact records some queries
+    return (see play.PlayRecord and thing.ThingSummary), each backend has to
+    decode them into exactly the same records. Anything that needs the full
+    models still parses the whole tree, with ElementTree.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        play_records: Callable[[str], List[play.PlayRecord]],
+        thing_summaries: Callable[[str, Set[str]], List[thing.ThingSummary]],
+    ) -> None:
+        self.__name = name
+        self.__play_records = play_records
+        self.__thing_summaries = thing_summaries
+
+    def name(self) -> str:
+        return self.__name
+
+    def tree(self, contents: str) -> ET.Element:
+        return ET.fromstring(contents)
+
+    def play_records(self, contents: str) -> List[play.PlayRecord]:
+        """The plays of a page (or a stored chunk of them)"""
+        return self.__play_records(contents)
+
+    def thing_summaries(
+        self, contents: str, flags: Set[str]
+    ) -> List[thing.ThingSummary]:
+        """The things of a response, which was requested with the flags"""
+        return self.__thing_summaries(contents, flags)
+
+
+def tree_play_records(contents: str) -> List[play.PlayRecord]:
+    return [p.record() for p in play.PageStream(contents)]
+
+
+def tree_thing_summaries(contents: str, flags: Set[str]) -> List[thing.ThingSummary]:
+    root = ET.fromstring(contents)
+    if root.tag != "items":
+        raise Exception(f"Expected root tag 'items' but got '{root.tag}'")
+    return [thing.Item(elem).with_flags(flags).summary() for elem in root]
+
+
+def expat_play_records(contents: str) -> List[play.PlayRecord]:
+    """
+    Only the attributes the records need are looked at, without building any
+    elements. Decodes everything the same way play.Play does.
+    """
+    records: List[play.PlayRecord] = []
+    dates: Dict[str, Optional[datetime.date]] = {}
+    attrs: Optional[Dict[str, str]] = None
+    player_count = 0
+
+    # Only plays are named play and players are only ever listed under them,
+    # so elements are told apart by their tag alone. Which means there's no
+    # need to handle where they end, and each play is only decoded when the
+    # next one (or the end of the page) is reached.
+    def start(tag: str, tag_attrs: Dict[str, str]) -> None:
+        nonlocal attrs, player_count
+        if tag == "play":
+            if attrs is not None:
+                records.append(expat_play_record(attrs, player_count, dates))
+            attrs = tag_attrs
+            player_count = 0
+        elif tag == "player":
+            player_count += 1
+        elif attrs is None and tag != play.Page._rootTagName():
+            raise Exception(
+                f"Expected root tag '{play.Page._rootTagName()}' but got '{tag}'"
+            )
+
+    parse(contents, start)
+    if attrs is not None:
+        records.append(expat_play_record(attrs, player_count, dates))
+    return records
+
+
+def expat_play_record(
+    attrs: Dict[str, str],
+    player_count: int,
+    dates: Dict[str, Optional[datetime.date]],
+) -> play.PlayRecord:
+    try:
+        date = attrs["date"]
+        if date not in dates:
+            dates[date] = parse_date(date)
+        return play.PlayRecord(
+            int(attrs["id"]),
+            int(attrs["userid"]),
+            dates[date],
+            int(attrs["quantity"]),
+            player_count,
+            to_bool(attrs["incomplete"]),
+            to_bool(attrs["nowinstats"]),
+            attrs["location"] or None,
+        )
+    except KeyError as e:
+        raise TypeError(f"Attribute '{e.args[0]}' missing in 'play'")
+
+
+def expat_thing_summaries(contents: str, flags: Set[str]) -> List[thing.ThingSummary]:
+    """
+    Only the direct children of each item which go into its summary (and its
+    ratings) are looked at, without building any elements. Decodes everything
+    the same way thing.Item does.
+    """
+    if "stats" not in flags:
+        raise Exception("stats data not requested! Add 'stats' to query flags")
+    return [expat_thing_summary(item) for item in expat_items(contents)]
+
+
+def expat_items(contents: str) -> List[Dict[str, Any]]:
+    """What the summaries need of each item, see expat_item_start"""
+    items: List[Dict[str, Any]] = []
+    depth = 0
+    tags: List[str] = []
+    item: Dict[str, Any] = {}
+
+    def start(tag: str, attrs: Dict[str, str]) -> None:
+        nonlocal depth, item
+        depth += 1
+        tags.append(tag)
+        if depth == ITEM_DEPTH:
+            item = {"attrs": attrs, "values": {}, "names": [], "links": [], "ranks": {}}
+        elif depth > ITEM_DEPTH:
+            expat_item_start(item, tags, attrs)
+        elif tag != "items":
+            raise Exception(f"Expected root tag 'items' but got '{tag}'")
+
+    def end(tag: str) -> None:
+        nonlocal depth
+        if depth == ITEM_DEPTH + 1 and tag == "thumbnail":
+            item.setdefault("thumbnail", "".join(item["text"]) or None)
+        elif depth == ITEM_DEPTH:
+            items.append(item)
+        tags.pop()
+        depth -= 1
+
+    def data(chunk: str) -> None:
+        if depth == ITEM_DEPTH + 1 and tags[-1] == "thumbnail":
+            item["text"].append(chunk)
+
+    parse(contents, start, end, data)
+    return items
+
+
+def expat_item_start(
+    item: Dict[str, Any], tags: List[str], attrs: Dict[str, str]
+) -> None:
+    """Collects what the summary needs from an element under the item"""
+    tag = tags[-1]
+    depth = len(tags)
+    if depth == ITEM_DEPTH + 1:
+        if tag == "name":
+            item["names"].append(attrs)
+        elif tag == "link":
+            item["links"].append(attrs)
+        elif tag == "thumbnail":
+            item["text"] = []
+        elif "value" in attrs:
+            item["values"].setdefault(tag, attrs["value"])
+    elif depth == ITEM_DEPTH + 3 and tags[-3:-1] == ["statistics", "ratings"]:
+        if "value" in attrs:
+            item["values"].setdefault(f"ratings/{tag}", attrs["value"])
+    elif depth == ITEM_DEPTH + 4 and tags[-3:-1] == ["ratings", "ranks"]:
+        # Keyed by name, like Ratings.ranks
+        item["ranks"][attrs["name"]] = attrs
+
+
+def expat_thing_summary(item: Dict[str, Any]) -> thing.ThingSummary:
+    """Whatever the item is missing is left out, the same as in Item.summary"""
+    attrs = item["attrs"]
+    values = item["values"]
+    type = attrs["type"]
+    is_boardgame = type == "boardgame"
+
+    ranks = {
+        name: int(rank["value"]) if rank["value"] != RANK_NOT_RANKED else None
+        for name, rank in item["ranks"].items()
+    }
+    categories = [
+        rank["friendlyname"].split(" ")[0]
+        for rank in sorted(
+            [
+                rank
+                for rank in item["ranks"].values()
+                if rank["type"] == "family" and rank["value"] != RANK_NOT_RANKED
+            ],
+            key=lambda rank: int(rank["value"]),
+        )
+    ]
+    links: Dict[str, List[List[Any]]] = {}
+    for link in item["links"]:
+        if link["type"] in thing.SUMMARY_LINK_TYPES:
+            links.setdefault(link["type"], []).append([int(link["id"]), link["value"]])
+
+    try:
+        ratings: Optional[List[Any]] = [
+            int(values["ratings/usersrated"]),
+            [
+                float(values[f"ratings/{stat}"])
+                for stat in ["average", "bayesaverage", "stddev", "median"]
+            ],
+            [
+                int(values[f"ratings/{market}"])
+                for market in ["owned", "trading", "wanting", "wishing"]
+            ],
+        ]
+    except (KeyError, ValueError):
+        ratings = None
+
+    try:
+        players: Optional[List[int]] = (
+            [int(values["minplayers"]), int(values["maxplayers"])]
+            if is_boardgame
+            else None
+        )
+    except (KeyError, ValueError):
+        players = None
+
+    try:
+        year = to_optional_int(values["yearpublished"])
+    except (KeyError, ValueError):
+        year = None
+
+    return thing.ThingSummary(
+        int(attrs["id"]),
+        {
+            "type": type,
+            "name": next(
+                (name["value"] for name in item["names"] if name["type"] == "primary"),
+                None,
+            ),
+            "year": year,
+            "thumbnail": item.get("thumbnail"),
+            "players": players,
+            "ranks": ranks,
+            "categories": categories if is_boardgame else [],
+            "ratings": ratings,
+            "links": {
+                type: links[type] for type in thing.SUMMARY_LINK_TYPES if type in links
+            },
+        },
+    )
+
+
+def parse(
+    contents: str,
+    start: Callable[[str, Dict[str, str]], None],
+    end: Optional[Callable[[str], None]] = None,
+    data: Optional[Callable[[str], None]] = None,
+) -> None:
+    """Handlers which aren't needed are better left out, each call costs"""
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    parser.StartElementHandler = start
+    if end:
+        parser.EndElementHandler = end
+    if data:
+        parser.CharacterDataHandler = data
+    try:
+        parser.Parse(contents, True)
+    except expat.ExpatError as e:
+        # The same error ElementTree would raise, which is what callers expect
+        # from a response they couldn't parse
+        error = ET.ParseError(f"{e}")
+        error.code = e.code
+        error.position = (e.lineno, e.offset)
+        raise error from e
+
+
+def parse_date(date: str) -> Optional[datetime.date]:
+    try:
+        return datetime.date.fromisoformat(date)
+    except ValueError:
+        # Value errors mean the string was malformed
+        return None
+
+
+def to_bool(value: str) -> bool:
+    if value == "0":
+        return False
+    elif value == "1":
+        return True
+    else:
+        raise Exception(f"Unexpected boolean value {value}")
+
+
+def to_optional_int(value: str) -> Optional[int]:
+    return None if value == "" or value == "0" else int(value)
+
+
+BACKENDS: Dict[str, ParserBackend] = {
+    backend.name(): backend
+    for backend in [
+        ParserBackend("tree", tree_play_records, tree_thing_summaries),
+        # Skips building the tree, which is most of what parsing costs
+        ParserBackend("expat", expat_play_records, expat_thing_summaries),
+    ]
+}
+
+DEFAULT_PARSER_BACKEND = "expat"
+
+
+def backend_by_name(name: str) -> ParserBackend:
+    if name not in BACKENDS:
+        raise Exception(
+            f"Unknown parser backend '{name}', expected one of {list(BACKENDS)}"
+        )
+    return BACKENDS[name]
@@ -0,0 +1,95 @@
+import datetime
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+# Ranges are inclusive on both ends, ranges open on either end use these
+OPEN_START = datetime.date.min
+OPEN_END = datetime.date.max
+ONE_DAY = datetime.timedelta(days=1)
+
+DateRange = Tuple[datetime.date, datetime.date]
+
+
+class PlaysCoverage:
+    """
+    The date ranges for which all plays are already cached. Plays could only
+    be fetched by date range, newest first, so anything the cache doesn't have
+    could always be described as a list of date ranges which are missing.
+    """
+
+    def __init__(self, ranges: Iterable[DateRange] = ()) -> None:
+        self.__ranges: List[DateRange] = []
+        for start, end in ranges:
+            self.add(start, end)
+
+    @staticmethod
+    def from_json(raw: List[List[Optional[str]]]) -> "PlaysCoverage":
+        return PlaysCoverage(
+            [
+                (
+                    datetime.date.fromisoformat(start) if start else OPEN_START,
+                    datetime.date.fromisoformat(end) if end else OPEN_END,
+                )
+                for start, end in raw
+            ]
+        )
+
+    def to_json(self) -> List[List[Any]]:
+        return [
+            [
+                f"{start}" if start != OPEN_START else None,
+                f"{end}" if end != OPEN_END else None,
+            ]
+            for start, end in self.__ranges
+        ]
+
+    def add(self, start: datetime.date, end: datetime.date) -> None:
+        if start > end:
+            return
+
+        merged: List[DateRange] = []
+        for other_start, other_end in self.__ranges:
+            if PlaysCoverage.__isBefore(other_end, start) or PlaysCoverage.__isBefore(
+                end, other_start
+            ):
+                merged.append((other_start, other_end))
+            else:
+                start = min(start, other_start)
+                end = max(end, other_end)
+        merged.append((start, end))
+        self.__ranges = sorted(merged)
+
+    def missing(
+        self, start: datetime.date = OPEN_START, end: datetime.date = OPEN_END
+    ) -> List[DateRange]:
+        """The ranges within [start, end] which aren't covered, newest first"""
+        gaps: List[DateRange] = []
+        cursor = start
+        for covered_start, covered_end in self.__ranges:
+            if covered_end < cursor:
+                continue
+            if covered_start > end:
+                break
+            if covered_start > cursor:
+                gaps.append((cursor, covered_start - ONE_DAY))
+            if covered_end >= end:
+                return list(reversed(gaps))
+            cursor = covered_end + ONE_DAY
+        gaps.append((cursor, end))
+        return list(reversed(gaps))
+
+    def is_complete(self) -> bool:
+        return not self.missing()
+
+    def __iter__(self) -> Iterator[DateRange]:
+        return iter(self.__ranges)
+
+    def __str__(self) -> str:
+        return ", ".join(
+            f"[{start if start != OPEN_START else ''}..{end if end != OPEN_END else ''}]"
+            for start, end in self.__ranges
+        )
+
+    @staticmethod
+    def __isBefore(end: datetime.date, start: datetime.date) -> bool:
+        """If the range ending at end is disjoint from (and not adjacent to) start"""
+        return end != OPEN_END and end + ONE_DAY < start
@@ -1,41 +1,138 @@
 import datetime
+import json
+import threading
 import time
 from typing import Optional
 
+from .CacheLock import write_atomically
+
 INITIAL_UPPER_BOUND = datetime.timedelta(seconds=10)
 
 SUCCESS_BUMP = 10
 
+# Learned bounds are persisted between runs, but the server's limits might have
+# relaxed in the meantime, so the bounds are halved for every period that
+# passed since they were saved
+DECAY_HALF_LIFE = datetime.timedelta(hours=6)
+
 
 class RateLimiter:
-    def __init__(self) -> None:
+    def __init__(self, state_file: Optional[str] = None) -> None:
         self.__last_attempt_time: Optional[datetime.datetime] = None
         self.__lower_bound: datetime.timedelta = datetime.timedelta(seconds=0)
         self.__upper_bound: datetime.timedelta = datetime.timedelta(seconds=0)
         self.__successive_successes: int = 0
+        # Whatever was learned, requests are never made closer than this
+        self.__min_delay: datetime.timedelta = datetime.timedelta(seconds=0)
+        # The limiter is shared between all requests, including the ones made
+        # concurrently from worker threads, so all state changes are guarded
+        self.__lock = threading.Lock()
+        self.__state_file = state_file
+        # Loaded lazily so that just importing the API doesn't touch the disk
+        self.__is_loaded = False
+
+    def seed(self, requests_per_second: float) -> None:
+        """
+        Start from a delay matching the given budget instead of from what was
+        learned before (or from no delay at all). The limiter would still
+        adjust the delay from there.
+        """
+        if requests_per_second <= 0:
+            raise Exception(f"Bad requests per second budget {requests_per_second}")
+
+        with self.__lock:
+            self.__is_loaded = True
+            self.__lower_bound = datetime.timedelta(seconds=0)
+            self.__upper_bound = datetime.timedelta(seconds=2 / requests_per_second)
+            self.__successive_successes = 0
+            self.__save()
+
+    def cap(self, requests_per_second: float) -> None:
+        """A budget which isn't exceeded even if the server would allow it"""
+        if requests_per_second <= 0:
+            raise Exception(f"Bad requests per second budget {requests_per_second}")
+
+        with self.__lock:
+            self.__min_delay = datetime.timedelta(seconds=1 / requests_per_second)
 
     def limit(self) -> None:
-        delay_time = self.__delay_time()
-        if delay_time and self.__last_attempt_time:
-            elapsed = datetime.datetime.now() - self.__last_attempt_time
-            remaining = delay_time - elapsed
-            if remaining.total_seconds() > 0:
-                time.sleep(remaining.total_seconds())
-        self.__last_attempt_time = datetime.datetime.now()
+        time.sleep(self.reserve())
+
+    def reserve(self) -> float:
+        """
+        Reserves the next available slot for a request and returns how many
+        seconds the caller needs to wait before making it. This allows async
+        callers to wait without blocking.
+        """
+        with self.__lock:
+            self.__load()
+            now = datetime.datetime.now()
+            remaining = datetime.timedelta(seconds=0)
+            # The cap isn't learned, so it doesn't affect the bounds
+            delay_time = max(self.__delay_time(), self.__min_delay)
+            if delay_time and self.__last_attempt_time:
+                # The last attempt time could be in the future if it was
+                # reserved by a concurrent caller which is still waiting
+                remaining = max(
+                    delay_time - (now - self.__last_attempt_time), remaining
+                )
+            self.__last_attempt_time = now + remaining
+            return remaining.total_seconds()
 
     def success(self) -> None:
-        self.__successive_successes += 1
-        if self.__successive_successes >= SUCCESS_BUMP:
-            self.__successive_successes = 0
-            self.__upper_bound = self.__delay_time()
+        with self.__lock:
+            self.__successive_successes += 1
+            if self.__successive_successes >= SUCCESS_BUMP:
+                self.__successive_successes = 0
+                self.__upper_bound = self.__delay_time()
+                self.__save()
 
     def fail(self) -> None:
-        self.__successive_successes = 0
-        self.__last_attempt_time = None
-        if not self.__upper_bound:
-            self.__upper_bound = INITIAL_UPPER_BOUND
-        else:
-            self.__lower_bound = self.__delay_time()
+        with self.__lock:
+            self.__successive_successes = 0
+            self.__last_attempt_time = None
+            if not self.__upper_bound:
+                self.__upper_bound = INITIAL_UPPER_BOUND
+            else:
+                self.__lower_bound = self.__delay_time()
+            self.__save()
 
     def __delay_time(self) -> datetime.timedelta:
         return (self.__lower_bound + self.__upper_bound) / 2
+
+    def __load(self) -> None:
+        if self.__is_loaded:
+            return
+        self.__is_loaded = True
+
+        if not self.__state_file:
+            return
+
+        try:
+            with open(self.__state_file, "rt") as f:
+                state = json.load(f)
+            saved_at = datetime.datetime.fromisoformat(state["saved_at"])
+            lower_bound = datetime.timedelta(seconds=state["lower_bound"])
+            upper_bound = datetime.timedelta(seconds=state["upper_bound"])
+            decay = 0.5 ** (
+                max(datetime.datetime.now() - saved_at, datetime.timedelta(0))
+                / DECAY_HALF_LIFE
+            )
+        except (OSError, ValueError, KeyError, TypeError):
+            # Nothing learned yet (or it's unreadable), start from scratch
+            return
+
+        self.__lower_bound = lower_bound * decay
+        self.__upper_bound = upper_bound * decay
+
+    def __save(self) -> None:
+        if not self.__state_file:
+            return
+
+        state = {
+            "lower_bound": self.__lower_bound.total_seconds(),
+            "upper_bound": self.__upper_bound.total_seconds(),
+            "saved_at": datetime.datetime.now().isoformat(),
+        }
+        # Other processes share the state file, and could be saving it too
+        write_atomically(self.__state_file, json.dumps(state).encode())
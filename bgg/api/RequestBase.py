@@ -1,18 +1,55 @@
 import abc
-import bz2
+import asyncio
+import contextlib
+import copy
 import datetime
+import email.utils
+import hashlib
+import importlib
+import json
 import os
+import sys
+import threading
 import time
+import urllib.parse
 import xml.etree.ElementTree as ET
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
 from enum import IntEnum
-from typing import IO, Dict, Generic, Iterator, Optional, Sequence, TypeVar
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Generic,
+    Hashable,
+    Iterator,
+    List,
+    NoReturn,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+)
 
 import requests
 
 from ..model import Items
 from ..model.ModelBase import ModelBase
-from ..utils import InlineOutput, firstx, nonthrows
+from ..utils import InlineOutput, chunked, firstx, nonthrows
+from .CacheArchive import CacheArchive
+from .CacheCodec import CODECS, DEFAULT_CODEC, CacheCodec, codec_by_name, codec_for_file
+from .CacheEviction import CacheUnit, cache_units, pick_evicted, remove_unit
+from .CacheIndex import TIndex
+from .CacheLock import CacheLock, write_atomically
+from .CacheManifest import CacheManifest
+from .CacheUsage import CacheUsage
+from .MemoryCache import MemoryCache, MemoryCacheStats
+from .ParserBackend import DEFAULT_PARSER_BACKEND, ParserBackend, backend_by_name
 from .RateLimiter import RateLimiter
+from .RequestStats import RequestStats
+from .RetryQueue import MAX_RETRIES, RetryQueue, RetryStats
+from .Transport import TransferStats, Transport
 
 API_BASE_URL = {
     # Docs: https://boardgamegeek.com/wiki/page/BGG_XML_API
@@ -28,26 +65,266 @@ class HttpStatusCode(IntEnum):
     BAD_GATEWAY = 502
 
 
-MAX_RETRIES = 5
-RETRY_BASE_INTERVAL = datetime.timedelta(seconds=1)
+# The API refuses requests for more ids than this in a single call
+MAX_IDS_PER_REQUEST = 20
+
+# Blocking fetches are attempted on these workers, so that their backoffs are
+# parked in the retry queue like everyone else's (see _fetch)
+FETCH_WORKERS = 4
 
 # A real temp dir can be found here: tempfile.gettempdir(), but this gets
 # deleted too to be reliable for what I need of it right now...
 TEMP_ROOT_DIR = ".tmp"
 CACHE_ROOT_DIR = "bggcache"
+RATE_LIMITER_STATE_FILE = "rate_limiter.json"
+# Entries are locked through byte ranges of this file in their directory
+ENTRIES_LOCK_FILE = "entries.lock"
 
 TResponse = TypeVar("TResponse", bound=ModelBase)
 
 
+class ServerIssue(Exception):
+    def __init__(
+        self,
+        tldr: str,
+        extra: Optional[str] = None,
+        retry_after: Optional[float] = None,
+    ) -> None:
+        self.tldr = tldr
+        self.extra = extra
+        # Seconds the server asked us to wait before trying again
+        self.retry_after = retry_after
+
+
 class RequestBase(Generic[TResponse]):
 
-    __rate_limiter = RateLimiter()
+    __rate_limiter = RateLimiter(os.path.join(TEMP_ROOT_DIR, RATE_LIMITER_STATE_FILE))
+    __transport = Transport()
+    __api_base_url: Dict[int, str] = API_BASE_URL
+    __memory_cache = MemoryCache()
+    __retry_queue = RetryQueue(retryable=(ServerIssue, ET.ParseError))
+    __fetch_executor = ThreadPoolExecutor(
+        max_workers=FETCH_WORKERS, thread_name_prefix="RequestBase"
+    )
+    __cache_codecs: Dict[Optional[str], str] = {}
+    __parser_backends: Dict[Optional[str], str] = {}
+    __cache_packed = False
+    __cache_usage = CacheUsage(os.path.join(TEMP_ROOT_DIR, CACHE_ROOT_DIR))
+    __request_stats: Dict[str, RequestStats] = {}
+    __request_stats_lock = threading.Lock()
+
+    @staticmethod
+    def configure_transport(
+        timeout: Optional[Tuple[float, float]] = None,
+        pool_size: Optional[int] = None,
+        api_base_url: Optional[Dict[int, str]] = None,
+    ) -> None:
+        """
+        Timeout is (connect, read) in seconds. The API base urls (by version)
+        could be overridden to point the requests at a stand-in server
+        """
+        RequestBase.__transport.configure(timeout=timeout, pool_size=pool_size)
+        if api_base_url:
+            RequestBase.__api_base_url = {**API_BASE_URL, **api_base_url}
+
+    @staticmethod
+    def transfer_stats() -> Dict[str, TransferStats]:
+        """Network accounting for all requests made so far, by request type"""
+        return RequestBase.__transport.stats()
+
+    @staticmethod
+    def request_stats() -> Dict[str, RequestStats]:
+        """Cache, parsing and throttling accounting so far, by request type"""
+        with RequestBase.__request_stats_lock:
+            return {
+                request_type: stats.snapshot()
+                for request_type, stats in RequestBase.__request_stats.items()
+            }
+
+    @staticmethod
+    def stats_summary() -> str:
+        """All the accounting so far, by request type, for printing"""
+        request_stats = RequestBase.request_stats()
+        transfer_stats = RequestBase.transfer_stats()
+        retry_stats = RequestBase.retry_stats()
+
+        lines = ["Requests summary:"]
+        for request_type in sorted({*request_stats, *transfer_stats, *retry_stats}):
+            lines.append(f"  {request_type}")
+            if request_type in request_stats:
+                lines.append(f"    {request_stats[request_type]}")
+            if request_type in transfer_stats:
+                transfer = transfer_stats[request_type]
+                lines.append(
+                    f"    {transfer}, {transfer.total_latency():.1f}s in total"
+                )
+            if request_type in retry_stats:
+                lines.append(f"    {retry_stats[request_type]}")
+        return "\n".join(lines)
+
+    @staticmethod
+    def configure_rate_limit(requests_per_second: float) -> None:
+        """Seeds the rate limiter with a budget instead of what it learned"""
+        RequestBase.__rate_limiter.seed(requests_per_second)
+
+    @staticmethod
+    def configure_max_rate(requests_per_second: float) -> None:
+        """Requests are never made faster than this, whatever was learned"""
+        RequestBase.__rate_limiter.cap(requests_per_second)
+
+    @staticmethod
+    def configure_memory_cache(max_size: int) -> None:
+        """
+        Max size is in bytes of the raw responses the cached ones were parsed
+        from (which take several times that once parsed), 0 disables the
+        memory cache
+        """
+        RequestBase.__memory_cache.resize(max_size)
+
+    @staticmethod
+    def memory_cache_stats() -> MemoryCacheStats:
+        return RequestBase.__memory_cache.stats()
+
+    @staticmethod
+    def configure_cache_codec(codec: str, request_type: Optional[str] = None) -> None:
+        """
+        Overrides the codec new cache entries are written with, for a single
+        request type (by class name) or for all of them. Entries written with
+        any other codec are still read.
+        """
+        codec_by_name(codec)
+        RequestBase.__cache_codecs[request_type] = codec
+
+    @staticmethod
+    def configure_parser_backend(
+        backend: str, request_type: Optional[str] = None
+    ) -> None:
+        """
+        Overrides the backend responses are decoded with (see ParserBackend),
+        for a single request type (by class name) or for all of them
+        """
+        backend_by_name(backend)
+        RequestBase.__parser_backends[request_type] = backend
+
+    @staticmethod
+    def configure_cache_packing(packed: bool) -> None:
+        """
+        Directories which were packed (see CacheArchive) always get their new
+        entries appended to their archive, this packs new directories too
+        """
+        RequestBase.__cache_packed = packed
+
+    @staticmethod
+    def configure_cache_budget(max_bytes: Optional[int]) -> None:
+        """
+        Caps the size of the cache on disk (None removes the cap). The cap is
+        kept with the cache, so it applies to every run from then on.
+        """
+        root = os.path.join(TEMP_ROOT_DIR, CACHE_ROOT_DIR)
+        RequestBase.__cache_usage.set_budget(
+            max_bytes,
+            sum(unit.size for unit in cache_units(root)) if max_bytes else 0,
+        )
+
+    @staticmethod
+    def enforce_cache_budget(force: bool = False) -> List[CacheUnit]:
+        """
+        Evicts the least recently used parts of the cache if it went over its
+        budget (see CacheEviction). Scripts call it when they exit, it only
+        evicts once what they wrote puts the cache over, forcing it measures
+        the cache first. Returns what was evicted.
+        """
+        usage = RequestBase.__cache_usage
+        usage.flush()
+        budget = usage.budget()
+        if not budget:
+            return []
+
+        max_bytes, size = budget
+        if not force and size <= max_bytes:
+            return []
+
+        root = os.path.join(TEMP_ROOT_DIR, CACHE_ROOT_DIR)
+        units = cache_units(root)
+        evicted = pick_evicted(units, usage.load(), max_bytes, RequestBase.__cacheAging)
+        # Deciding on the aging might have read from the cache, that isn't use
+        usage.discard()
+
+        for unit in evicted:
+            remove_unit(root, unit)
+        for request_type in {unit.request_type for unit in evicted}:
+            type_dir = os.path.join(root, request_type)
+            CacheManifest.open(type_dir).remove(
+                unit.name for unit in evicted if unit.request_type == request_type
+            )
+            if CacheArchive.exists(type_dir):
+                CacheArchive.open(type_dir).compact({})
+
+        usage.forget(unit.path() for unit in evicted)
+        usage.set_budget(
+            max_bytes,
+            sum(unit.size for unit in units) - sum(unit.size for unit in evicted),
+        )
+        return evicted
+
+    @staticmethod
+    def run_script(main: Callable[[List[str]], int]) -> NoReturn:
+        """
+        Exits with what the script's main returns for the command line. On the
+        way out the cache budget is enforced, since whatever the run wrote
+        might have put the cache over it, and the stats are printed.
+        """
+        try:
+            sys.exit(main(sys.argv))
+        finally:
+            RequestBase.enforce_cache_budget()
+            print(RequestBase.stats_summary())
+
+    @staticmethod
+    def retry_stats() -> Dict[str, RetryStats]:
+        """Retries and time spent waiting for them so far, by request type"""
+        return RequestBase.__retry_queue.stats()
+
+    @staticmethod
+    def request_class(request_type: str) -> Optional[Type["RequestBase"]]:
+        """The class of a request type by its name (as its cache is named)"""
+        # Request types are defined in modules named after them, which this run
+        # might not have imported
+        try:
+            module = importlib.import_module(f"{__package__}.{request_type}")
+        except ImportError:
+            return None
+        return getattr(module, request_type, None)
+
+    @classmethod
+    def cached_response_problem(cls, contents: str) -> Optional[str]:
+        """Why a cached response couldn't be used, if it couldn't"""
+        try:
+            root = ET.fromstring(contents)
+        except ET.ParseError as e:
+            return f"Failed to parse [{e.msg}]"
+
+        expected = cls._response_root_tag()
+        if root.tag != expected:
+            return f"Expected root tag '{expected}' but got '{root.tag}'"
+        return None
 
     @classmethod
     def cached_queries(cls) -> Iterator[str]:
         dir = cls.__getRequestTypeCacheRootDir()
         for id in os.listdir(dir):
-            yield id
+            if os.path.isdir(os.path.join(dir, id)):
+                yield id
+
+    @classmethod
+    def cache_manifest(cls) -> CacheManifest:
+        """What's known about each of the cached queries (by their cache dir)"""
+        return cls._cache_index(CacheManifest)
+
+    @classmethod
+    def _cache_index(cls, index_type: Type[TIndex]) -> TIndex:
+        """An index kept under this request type's cache directory"""
+        return index_type.open(cls.__getRequestTypeCacheRootDir())
 
     @abc.abstractmethod
     def _api_version(self) -> int:
@@ -65,50 +342,247 @@ class RequestBase(Generic[TResponse]):
     def _build_response(self, root: ET.Element, **kwargs) -> TResponse:
         pass
 
+    @classmethod
+    @abc.abstractmethod
+    def _response_root_tag(cls) -> str:
+        """The root tag of the model responses are built into"""
+
     def _cache_dir(self) -> Optional[str]:
         return None
 
-    @abc.abstractmethod
-    def _cache_file_name(str, **kwargs) -> Optional[str]:
-        pass
+    def _cache_file_name(self, **kwargs) -> Optional[str]:
+        """
+        Responses are cached under a hash of everything that goes into the API
+        call, so any two requests for the same thing share the same entry.
+        Returning None disables caching.
+        """
+        params = urllib.parse.urlencode(sorted(self._api_params(**kwargs).items()))
+        return hashlib.sha1(
+            f"{self._api_version()}/{self._api_path(**kwargs)}?{params}".encode()
+        ).hexdigest()
+
+    def _legacy_cache_file_name(self, **kwargs) -> Optional[str]:
+        """
+        Where the same response was cached before cache keys were hashed, it's
+        moved to its hashed name the first time it's read
+        """
+        return None
+
+    def _cache_codec(self) -> str:
+        """The codec this request type's cache is written with by default"""
+        return DEFAULT_CODEC
+
+    @classmethod
+    def _cache_aging(cls, name: str) -> float:
+        """
+        How fast the cache dir (or entry, if there are no dirs) ages while it
+        isn't used, relative to other request types. Older entries are evicted
+        first when the cache is over its budget.
+        """
+        return 1.0
+
+    def _parser_backend(self) -> ParserBackend:
+        backends = RequestBase.__parser_backends
+        return backend_by_name(
+            backends.get(type(self).__name__)
+            or backends.get(None)
+            or DEFAULT_PARSER_BACKEND
+        )
+
+    def _request_stats(self) -> RequestStats:
+        """This request type's accounting, for anything recorded elsewhere"""
+        request_type = type(self).__name__
+        with RequestBase.__request_stats_lock:
+            if request_type not in RequestBase.__request_stats:
+                RequestBase.__request_stats[request_type] = RequestStats()
+            return RequestBase.__request_stats[request_type]
 
     def _fetch(self, **kwargs) -> TResponse:
+        """
+        Blocks until the response is loaded. It's loaded the same way as
+        _fetch_deferred does, so no thread sleeps through the backoffs, and
+        blocking callers on other threads keep getting their responses in the
+        meantime.
+        """
+        return self._fetch_deferred(RequestBase.__fetch_executor, **kwargs).result()
+
+    async def _fetch_async(self, **kwargs) -> TResponse:
+        """
+        Same as _fetch, but any blocking work (network and cache IO) is done off
+        the event loop, and backoffs don't block it either
+        """
+        return await RequestBase.__memory_cache.get_or_load_async(
+            self.__memoryCacheKey(**kwargs), lambda: self.__loadAsync(**kwargs)
+        )
+
+    def _fetch_deferred(self, executor: Executor, **kwargs) -> "Future[TResponse]":
+        """
+        Like _fetch, but the work is done on the executor. Failed attempts are
+        parked in the retry queue instead of sleeping, so the executor's
+        workers are free to work on other requests while this one waits.
+        """
+        return RequestBase.__memory_cache.get_or_load_deferred(
+            self.__memoryCacheKey(**kwargs),
+            lambda: RequestBase.__retry_queue.submit(
+                executor,
+                type(self).__name__,
+                lambda: self.__attempt(**kwargs),
+                RequestBase.__retryAfter,
+            ),
+        )
+
+    def _fetch_cached(self, **kwargs) -> Optional[TResponse]:
+        """Only returns the response if it's already cached, never hits the API"""
+        key = self.__memoryCacheKey(**kwargs)
+        memoized = RequestBase.__memory_cache.get(key)
+        if memoized is not None:
+            return memoized
+
+        cached = self.__readFromCache(**kwargs)
+        if not cached:
+            return None
+
+        try:
+            response = self.__parse(cached, **kwargs)
+        except ET.ParseError:
+            # Treat it as missing so that it would be refetched (and rewritten)
+            return None
+
+        RequestBase.__memory_cache.put(key, response, len(cached))
+        return response
+
+    def _store_cached(self, response: TResponse, **kwargs) -> None:
+        """Caches a response which was obtained some other way"""
+        contents = response.serialize()
+        self.__writeToCache(contents, **kwargs)
+        RequestBase.__memory_cache.put(
+            self.__memoryCacheKey(**kwargs), response, len(contents)
+        )
+
+    def __memoryCacheKey(self, **kwargs) -> Hashable:
+        return (
+            type(self).__name__,
+            self._api_path(**kwargs),
+            tuple(sorted(self._api_params(**kwargs).items())),
+        )
+
+    async def __loadAsync(self, **kwargs) -> Tuple[TResponse, int]:
         for retries in range(MAX_RETRIES):
             try:
-                page_contents = self.__getRawResponse(**kwargs)
-                root = ET.fromstring(page_contents)
-                return self._build_response(root, **kwargs)
-            except ServerIssue as issue:
-                InlineOutput.write(
-                    f" Encountered server issue {issue.tldr}: {issue.extra or ''}"
-                )
-            except ET.ParseError as e:
-                InlineOutput.overwrite(
-                    f"Failed to parse response [{e.msg}]. Contents:\n{page_contents}"
-                )
+                return await self.__attemptAsync(**kwargs)
+            except (ServerIssue, ET.ParseError) as e:
+                await asyncio.sleep(self.__backoff(retries, e))
+
+        raise RequestBase.__retry_queue.bail_out(type(self).__name__)
 
-            retry_secs = RETRY_BASE_INTERVAL * (2 ** retries)  # Exponential backoff
-            InlineOutput.write(f" Retrying in {retry_secs}s")
-            time.sleep(retry_secs.total_seconds())
+    def __attempt(self, **kwargs) -> Tuple[TResponse, int]:
+        page_contents = None
+        try:
+            page_contents = self.__getRawResponse(**kwargs)
+            return (self.__parse(page_contents, **kwargs), len(page_contents))
+        except ServerIssue as issue:
+            RequestBase.__reportServerIssue(issue)
+            raise
+        except ET.ParseError as e:
+            RequestBase.__reportParseError(e, page_contents)
+            raise
+
+    async def __attemptAsync(self, **kwargs) -> Tuple[TResponse, int]:
+        page_contents = None
+        try:
+            page_contents = await self.__getRawResponseAsync(**kwargs)
+            return (self.__parse(page_contents, **kwargs), len(page_contents))
+        except ServerIssue as issue:
+            RequestBase.__reportServerIssue(issue)
+            raise
+        except ET.ParseError as e:
+            RequestBase.__reportParseError(e, page_contents)
+            raise
+
+    def __parse(self, page_contents: str, **kwargs) -> TResponse:
+        start = time.perf_counter()
+        root = self._parser_backend().tree(page_contents)
+        response = self._build_response(root, **kwargs)
+        self._request_stats().record_parse(time.perf_counter() - start)
+        return response
+
+    @staticmethod
+    def __reportServerIssue(issue: ServerIssue) -> None:
+        InlineOutput.write(
+            f" Encountered server issue {issue.tldr}: {issue.extra or ''}"
+        )
 
-        raise Exception(f"Bailing out! API FETCH failed {MAX_RETRIES} retries")
+    @staticmethod
+    def __reportParseError(e: ET.ParseError, page_contents: Optional[str]) -> None:
+        InlineOutput.overwrite(
+            f"Failed to parse response [{e.msg}]. Contents:\n{page_contents}"
+        )
+
+    def __backoff(self, retries: int, failure: BaseException) -> float:
+        delay = RequestBase.__retry_queue.backoff(
+            type(self).__name__, retries, RequestBase.__retryAfter(failure)
+        )
+        InlineOutput.write(f" Retrying in {delay:.1f}s")
+        return delay
+
+    @staticmethod
+    def __retryAfter(failure: BaseException) -> Optional[float]:
+        return failure.retry_after if isinstance(failure, ServerIssue) else None
 
     def __getRawResponse(self, **kwargs) -> str:
-        cached = self.__readFromCache(**kwargs)
+        # Other threads and processes that need the same response wait for it
+        # to be cached instead of fetching it too
+        with self.__cacheLock(**kwargs):
+            cached = self.__readFromCache(**kwargs)
+            if cached:
+                return cached
+
+            time.sleep(self.__throttle())
+            response = self.__handleResponse(self.__request(**kwargs))
+            self.__writeToCache(response, **kwargs)
+            return response
+
+    async def __getRawResponseAsync(self, **kwargs) -> str:
+        # Locks are held by threads, not coroutines, so the entry isn't locked
+        # while it's fetched here. Writes are still atomic, the worst that
+        # could happen is fetching it twice.
+        cached = await asyncio.to_thread(self.__readFromCache, **kwargs)
         if cached:
             return cached
 
-        uri = f"{API_BASE_URL[self._api_version()]}/{self._api_path(**kwargs)}"
-        RequestBase.__rate_limiter.limit()
-        response = requests.get(uri, params=self._api_params(**kwargs))
+        await asyncio.sleep(self.__throttle())
+        response = self.__handleResponse(
+            await asyncio.to_thread(self.__request, **kwargs)
+        )
+        await asyncio.to_thread(self.__writeToCache, response, **kwargs)
+        return response
+
+    def __throttle(self) -> float:
+        delay = RequestBase.__rate_limiter.reserve()
+        self._request_stats().record_throttle(delay)
+        return delay
 
+    def __request(self, **kwargs) -> requests.Response:
+        api_base_url = RequestBase.__api_base_url[self._api_version()]
+        uri = f"{api_base_url}/{self._api_path(**kwargs)}"
+        try:
+            return RequestBase.__transport.get(
+                type(self).__name__, uri, self._api_params(**kwargs)
+            )
+        except requests.Timeout as e:
+            raise ServerIssue("TIMEOUT", f"{e}")
+        except requests.ConnectionError as e:
+            raise ServerIssue("CONNECTION ERROR", f"{e}")
+
+    def __handleResponse(self, response: requests.Response) -> str:
         if response.status_code == HttpStatusCode.OK:
             RequestBase.__rate_limiter.success()
-            self.__writeToCache(response.text, **kwargs)
             return response.text
 
+        retry_after = RequestBase.__parseRetryAfter(response)
+
         if response.status_code == HttpStatusCode.BAD_GATEWAY:
-            raise ServerIssue("BAD GATEWAY")
+            raise ServerIssue("BAD GATEWAY", retry_after=retry_after)
 
         if response.status_code == HttpStatusCode.TOO_MANY_REQUESTS:
             RequestBase.__rate_limiter.fail()
@@ -120,48 +594,274 @@ class RequestBase(Generic[TResponse]):
                 nonthrows(error.find("message")).text
                 if error.tag == "error"
                 else "Failed to parse error message!",
+                retry_after,
             )
 
         raise ServerIssue(
-            "UNEXPECTED STATUS CODE", f"Status code: {response.status_code}"
+            "UNEXPECTED STATUS CODE",
+            f"Status code: {response.status_code}",
+            retry_after,
         )
 
-    def __readFromCache(self, **kwargs) -> Optional[str]:
-        cache = self.__openCacheFile("r", **kwargs)
-        if not cache:
-            # Caching is disabled
+    @staticmethod
+    def __parseRetryAfter(response: requests.Response) -> Optional[float]:
+        """The header could either be in seconds or an HTTP date"""
+        retry_after = response.headers.get("Retry-After")
+        if not retry_after:
             return None
 
-        with cache:
-            return cache.read()
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
 
-    def __writeToCache(self, response: str, **kwargs) -> None:
-        cache = self.__openCacheFile("w", **kwargs)
-        if not cache:
-            # Caching is disabled
-            return
+        try:
+            retry_at = email.utils.parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return None
+        return (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
 
-        with cache:
-            cache.write(response)
+    def _read_cache_entry(self, name: str) -> Optional[str]:
+        """Reads a named entry from this request's cache directory"""
+        archived = self.__getArchive().read(name)
+        if archived:
+            codec_name, data = archived
+            self.__touchCache(name)
+            return self.__decode(codec_by_name(codec_name), data)
 
-    def __openCacheFile(self, mode: str, **kwargs) -> Optional[IO]:
+        for codec in self.__readableCodecs():
+            try:
+                with open(self.__getCacheEntryPath(name, codec), "rb") as cache:
+                    data = cache.read()
+            except FileNotFoundError:
+                continue
+            self.__touchCache(name)
+            return self.__decode(codec, data)
+        return None
+
+    def _write_cache_entry(self, name: str, contents: str) -> int:
+        """Returns the number of bytes written"""
+        codec = self.__cacheCodec()
+        encoded = codec.encode(contents)
+        self.__touchCache(name, len(encoded))
+        archive = self.__getArchive()
+        if RequestBase.__cache_packed or CacheArchive.exists(
+            self.__getInstanceCacheRootDir()
+        ):
+            archive.write(name, codec.name(), encoded)
+            self.__removeLooseCacheEntry(name)
+            return len(encoded)
+
+        write_atomically(self.__getCacheEntryPath(name, codec), encoded)
+
+        # Otherwise an older copy might be read instead if the codec changes
+        self.__removeLooseCacheEntry(name, keep=codec)
+        archive.remove(name)
+        return len(encoded)
+
+    def _cache_entries(self) -> List[str]:
+        """Names of all entries in this request's cache directory"""
+        entries = set(self.__getArchive().names())
+        try:
+            files = os.listdir(self.__getInstanceCacheRootDir())
+        except FileNotFoundError:
+            files = []
+
+        for file in files:
+            codec = codec_for_file(file)
+            if codec:
+                entries.add(file[: -len(codec.suffix())])
+        return sorted(entries)
+
+    def _cache_size(self) -> int:
+        """Bytes taken by all the entries in this request's cache directory"""
+        size = self.__getArchive().size()
+        try:
+            files = os.listdir(self.__getInstanceCacheRootDir())
+        except FileNotFoundError:
+            return size
+
+        for file in files:
+            if codec_for_file(file):
+                size += os.path.getsize(
+                    os.path.join(self.__getInstanceCacheRootDir(), file)
+                )
+        return size
+
+    def _cache_entry_modified(self, name: str) -> Optional[datetime.datetime]:
+        """When the entry was last written, if it exists"""
+        archived = self.__getArchive().modified(name)
+        if archived is not None:
+            return datetime.datetime.fromtimestamp(archived)
+
+        for codec in self.__readableCodecs():
+            try:
+                return datetime.datetime.fromtimestamp(
+                    os.path.getmtime(self.__getCacheEntryPath(name, codec))
+                )
+            except FileNotFoundError:
+                continue
+        return None
+
+    def _fetch_cache_entry(self, name: str) -> Optional[TResponse]:
+        """Same as _read_cache_entry, but parsed (and memoized)"""
+        key = self.__cacheEntryKey(name)
+        memoized = RequestBase.__memory_cache.get(key)
+        if memoized is not None:
+            return memoized
+
+        contents = self._read_cache_entry(name)
+        if not contents:
+            return None
+
+        response = self.__parse(contents)
+        RequestBase.__memory_cache.put(key, response, len(contents))
+        return response
+
+    def _store_cache_entry(self, name: str, response: TResponse) -> int:
+        """Returns the number of bytes written"""
+        contents = response.serialize()
+        written = self._write_cache_entry(name, contents)
+        RequestBase.__memory_cache.put(
+            self.__cacheEntryKey(name), response, len(contents)
+        )
+        return written
+
+    def _read_cache_metadata(self, name: str) -> Optional[Dict[str, Any]]:
+        """Small bits of bookkeeping are kept as plain json next to the entries"""
+        try:
+            with open(self.__getCacheMetadataPath(name), "rt") as f:
+                metadata = json.load(f)
+        except FileNotFoundError:
+            return None
+        self.__touchCache(name)
+        return metadata
+
+    def _write_cache_metadata(self, name: str, metadata: Dict[str, Any]) -> None:
+        encoded = json.dumps(metadata).encode()
+        self.__touchCache(name, len(encoded))
+        write_atomically(self.__getCacheMetadataPath(name), encoded)
+
+    def _read_cache_blob(self, file_name: str) -> Optional[bytes]:
+        """Raw files (named with their extension) in the cache directory"""
+        try:
+            with open(self.__getCacheBlobPath(file_name), "rb") as f:
+                contents = f.read()
+        except FileNotFoundError:
+            return None
+        self.__touchCache(file_name)
+        self._request_stats().record_hit(len(contents))
+        return contents
+
+    def _write_cache_blob(self, file_name: str, contents: bytes) -> None:
+        self.__touchCache(file_name, len(contents))
+        write_atomically(self.__getCacheBlobPath(file_name), contents)
+
+    def _cache_entry_lock(self, name: str) -> CacheLock:
+        """Held while an entry is read and (re)written, see CacheLock"""
+        return CacheLock(
+            os.path.join(self.__getInstanceCacheRootDir(), ENTRIES_LOCK_FILE), name
+        )
+
+    def __decode(self, codec: CacheCodec, data: bytes) -> str:
+        stats = self._request_stats()
+        stats.record_hit(len(data))
+        start = time.perf_counter()
+        contents = codec.decode(data)
+        stats.record_decode(time.perf_counter() - start)
+        return contents
+
+    def __cacheEntryKey(self, name: str) -> Hashable:
+        return (type(self).__name__, self._cache_dir(), name)
+
+    def __cacheLock(self, **kwargs) -> ContextManager[Any]:
+        cache_file_name = self._cache_file_name(**kwargs)
+        if not cache_file_name:
+            # Caching is disabled, there's nothing to wait for
+            return contextlib.nullcontext()
+        return self._cache_entry_lock(cache_file_name)
+
+    def __readFromCache(self, **kwargs) -> Optional[str]:
         cache_file_name = self._cache_file_name(**kwargs)
         if not cache_file_name:
             # Caching is disabled
             return None
 
-        cache_dir = self.__getInstanceCacheRootDir()
-        if mode == "w":
-            # Create the directory if it doesnt exist before opening the file
-            # for writing
-            os.makedirs(cache_dir, exist_ok=True)
+        cached = self._read_cache_entry(cache_file_name)
+        if cached is not None:
+            return cached
 
-        try:
-            cache_file = os.path.join(cache_dir, f"{cache_file_name}.xml.bz2")
-            return bz2.open(cache_file, f"{mode}t")
-        except FileNotFoundError:
+        legacy_file_name = self._legacy_cache_file_name(**kwargs)
+        if not legacy_file_name or legacy_file_name == cache_file_name:
+            self._request_stats().record_miss()
+            return None
+
+        cached = self._read_cache_entry(legacy_file_name)
+        if cached is None:
+            self._request_stats().record_miss()
             return None
 
+        self._write_cache_entry(cache_file_name, cached)
+        self.__removeCacheEntry(legacy_file_name)
+        return cached
+
+    def __writeToCache(self, response: str, **kwargs) -> None:
+        cache_file_name = self._cache_file_name(**kwargs)
+        if not cache_file_name:
+            # Caching is disabled
+            return
+
+        self._write_cache_entry(cache_file_name, response)
+
+    def __touchCache(self, name: str, written: int = 0) -> None:
+        # Directories are used (and evicted) as a whole
+        unit = self._cache_dir() or name
+        RequestBase.__cache_usage.touch(f"{type(self).__name__}/{unit}")
+        if written:
+            RequestBase.__cache_usage.written(written)
+
+    @staticmethod
+    def __cacheAging(unit: CacheUnit) -> float:
+        request_class = RequestBase.request_class(unit.request_type)
+        return request_class._cache_aging(unit.name) if request_class else 1.0
+
+    def __cacheCodec(self) -> CacheCodec:
+        codecs = RequestBase.__cache_codecs
+        return codec_by_name(
+            codecs.get(type(self).__name__) or codecs.get(None) or self._cache_codec()
+        )
+
+    def __readableCodecs(self) -> List[CacheCodec]:
+        """The codec entries are written with goes first, it's the likeliest"""
+        codec = self.__cacheCodec()
+        return [codec] + [other for other in CODECS.values() if other is not codec]
+
+    def __removeLooseCacheEntry(
+        self, name: str, keep: Optional[CacheCodec] = None
+    ) -> None:
+        for codec in CODECS.values():
+            if codec is not keep:
+                try:
+                    os.remove(self.__getCacheEntryPath(name, codec))
+                except FileNotFoundError:
+                    pass
+
+    def __removeCacheEntry(self, name: str) -> None:
+        self.__removeLooseCacheEntry(name)
+        self.__getArchive().remove(name)
+
+    def __getArchive(self) -> CacheArchive:
+        return CacheArchive.open(self.__getInstanceCacheRootDir())
+
+    def __getCacheEntryPath(self, name: str, codec: CacheCodec) -> str:
+        return os.path.join(self.__getInstanceCacheRootDir(), f"{name}{codec.suffix()}")
+
+    def __getCacheMetadataPath(self, name: str) -> str:
+        return os.path.join(self.__getInstanceCacheRootDir(), f"{name}.json")
+
+    def __getCacheBlobPath(self, file_name: str) -> str:
+        return os.path.join(self.__getInstanceCacheRootDir(), file_name)
+
     def __getInstanceCacheRootDir(self) -> str:
         request_root_dir = self.__getRequestTypeCacheRootDir()
         cache_dir = self._cache_dir()
@@ -180,14 +880,72 @@ class RequestItemsBase(RequestBase[Items[TResponse]]):
     def _build_item(self, item_elem: ET.Element) -> TResponse:
         pass
 
+    # Set on the requests query_all batches missing items in, the items are
+    # cached one by one instead
+    __is_batch = False
+
     def __init__(self, *args: int) -> None:
         self.__ids: Sequence[int] = args
 
+    def query_all(self, **kwargs) -> List[TResponse]:
+        """
+        Fetches all the requested items. Items which are already cached are
+        read from there, and the rest are fetched in as few API calls as
+        possible and then cached one by one, so that later single-item
+        requests would find them. Items are returned in the requested order,
+        ids which the API doesn't know are skipped.
+        """
+        items: Dict[int, TResponse] = {}
+
+        missing: List[int] = []
+        for id in self.__ids:
+            cached = self.__forIds(id)._fetch_cached(**kwargs)
+            if cached is None:
+                missing.append(id)
+            else:
+                items[id] = RequestItemsBase.__onlyItem(cached)
+
+        for batch in chunked(missing, MAX_IDS_PER_REQUEST):
+            InlineOutput.overwrite(f"Fetching {len(batch)} items in one request")
+            request = self.__forIds(*batch)
+            request.__is_batch = True
+            for id, single in request._fetch(**kwargs).split().items():
+                self.__forIds(id)._store_cached(single, **kwargs)
+                items[id] = RequestItemsBase.__onlyItem(single)
+            InlineOutput.write(" DONE!\n")
+
+        return [items[id] for id in self.__ids if id in items]
+
     def query_first(self, **kwargs) -> TResponse:
+        self.__assertSingleItem()
+        return RequestItemsBase.__onlyItem(self._fetch(**kwargs))
+
+    async def query_first_async(self, **kwargs) -> TResponse:
+        self.__assertSingleItem()
+        return RequestItemsBase.__onlyItem(await self._fetch_async(**kwargs))
+
+    def query_first_cached(self, **kwargs) -> Optional[TResponse]:
+        """Only returns the item if it's already cached, never hits the API"""
+        self.__assertSingleItem()
+        cached = self._fetch_cached(**kwargs)
+        return RequestItemsBase.__onlyItem(cached) if cached is not None else None
+
+    def _ids(self) -> Sequence[int]:
+        return self.__ids
+
+    def __forIds(self, *ids: int) -> "RequestItemsBase[TResponse]":
+        """The same request (types, flags, etc...) but for different ids"""
+        other = copy.copy(self)
+        other.__ids = ids
+        return other
+
+    def __assertSingleItem(self) -> None:
         if len(self.__ids) > 1:
-            raise Exception(f"Requested more than 1 item, use 'query' instead")
+            raise Exception(f"Requested more than 1 item, use 'query_all' instead")
 
-        items_iter = iter(self._fetch(**kwargs))
+    @staticmethod
+    def __onlyItem(items: Items[TResponse]) -> TResponse:
+        items_iter = iter(items)
         item = next(items_iter)
 
         try:
@@ -204,15 +962,18 @@ class RequestItemsBase(RequestBase[Items[TResponse]]):
     def _build_response(self, root: ET.Element, **kwargs) -> Items[TResponse]:
         return Items(root, self._build_item)
 
+    @classmethod
+    def _response_root_tag(cls) -> str:
+        return Items._rootTagName()
+
     def _cache_file_name(self, **kwargs) -> Optional[str]:
-        if len(self.__ids) > 1:
-            # Disable cache for multiple-point queries
+        if self.__is_batch:
             return None
+        return super()._cache_file_name(**kwargs)
 
-        return f"{firstx(self.__ids)}"
-
+    def _legacy_cache_file_name(self, **kwargs) -> Optional[str]:
+        if len(self.__ids) != 1:
+            # Multiple-point queries weren't cached
+            return None
 
-class ServerIssue(Exception):
-    def __init__(self, tldr: str, extra: Optional[str] = None) -> None:
-        self.tldr = tldr
-        self.extra = extra
+        return f"{firstx(self.__ids)}"
@@ -36,11 +36,9 @@ class RequestFamily(RequestItemsBase[family.Item]):
     def _build_item(self, item_elem: ET.Element) -> family.Item:
         return family.Item(item_elem)
 
-    def _cache_file_name(self, **kwargs) -> Optional[str]:
-        cache_file_name = super()._cache_file_name(**kwargs)
-
+    def _legacy_cache_file_name(self, **kwargs) -> Optional[str]:
         if len(self.__types) > 0:
-            # Disable cache for type filtering
+            # Type filtering wasn't cached
             return None
 
-        return cache_file_name
+        return super()._legacy_cache_file_name(**kwargs)
@@ -1,5 +1,5 @@
 import xml.etree.ElementTree as ET
-from typing import Dict
+from typing import Dict, Optional
 
 from ..model import GeekList
 from .RequestBase import RequestBase
@@ -17,6 +17,11 @@ class RequestList(RequestBase[GeekList.List]):
     def fetch(self, with_comments: bool = False) -> GeekList.List:
         return self._fetch(listid=self.__listID, with_comments=with_comments)
 
+    async def fetch_async(self, with_comments: bool = False) -> GeekList.List:
+        return await self._fetch_async(
+            listid=self.__listID, with_comments=with_comments
+        )
+
     def _api_version(self) -> int:
         return 1
 
@@ -34,5 +39,9 @@ class RequestList(RequestBase[GeekList.List]):
     def _build_response(self, root: ET.Element, **kwargs) -> GeekList.List:
         return GeekList.List(root)
 
-    def _cache_file_name(str, **kwargs) -> str:
-        return kwargs["listid"]
+    @classmethod
+    def _response_root_tag(cls) -> str:
+        return GeekList.List._rootTagName()
+
+    def _legacy_cache_file_name(self, **kwargs) -> Optional[str]:
+        return f"{kwargs['listid']}"
@@ -1,15 +1,67 @@
+import asyncio
 import datetime
 import itertools
+import time
 import xml.etree.ElementTree as ET
-from typing import Dict, Generator, Iterable, Iterator, Optional, Sized, Tuple
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Sized,
+    Tuple,
+    TypeVar,
+)
 
 from ..model import play
-from ..utils import InlineOutput
+from ..model.PlayColumns import PlayColumns
+from ..utils import InlineOutput, nonthrows
+from .CacheManifest import ManifestEntry
+from .PlaysCoverage import ONE_DAY, OPEN_END, OPEN_START, DateRange, PlaysCoverage
 from .RequestBase import RequestBase
+from .RequestThing import RequestThing
 
 # Each page in the API responses contains up to 100 entries.
 ENTRIES_IN_FULL_PAGE = 100
 
+# How many page requests are kept in flight when fetching concurrently. All of
+# them still go through the same rate limiter so this mostly hides latency.
+DEFAULT_MAX_IN_FLIGHT = 4
+
+# Plays are often logged a while after they were played, so syncing also
+# refetches plays this far back from the last sync to pick those up
+SYNC_OVERLAP = datetime.timedelta(days=7)
+
+# Pages shift every time a play is logged, so instead of caching them by their
+# number they are stored as chunks, in the order they were fetched, together
+# with the date ranges the chunks fully cover. Chunks could overlap, so plays
+# are deduplicated by their id when read back.
+PLAYS_STATE = "plays"
+CHUNK_PREFIX = "chunk_"
+
+# All the stored plays compiled into columns, rebuilt whenever chunks are added
+COMPILED_FILE = "plays.columns"
+
+# Older caches stored the pages by their number, and deltas from syncs next to
+# them. Those are still read, and are imported the first time they are found.
+LEGACY_SYNC_STATE = "sync"
+LEGACY_DELTA_PREFIX = "delta_"
+
+# Plays of a game are cached under its id, plays of a user under this prefix
+USER_CACHE_DIR_PREFIX = "user_"
+
+TPlay = TypeVar("TPlay", bound=play.PlayLike)
+
 
 class RequestPlays(RequestBase[play.Page], Sized, Iterable[play.Page]):
     """
@@ -29,6 +81,10 @@ class RequestPlays(RequestBase[play.Page], Sized, Iterable[play.Page]):
             None,
             None,
         )
+        self.__max_in_flight = 1
+        self.__is_synced = False
+        # Ranges of the plays being fetched to be stored as chunks
+        self.__is_gap = False
 
     def filter_on(
         self,
@@ -39,14 +95,375 @@ class RequestPlays(RequestBase[play.Page], Sized, Iterable[play.Page]):
         self.__date = date
         return self
 
+    def concurrently(
+        self, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT
+    ) -> "RequestPlays":
+        """
+        Once the first page is fetched we know how many pages there are, so the
+        rest of them could be requested in parallel. Pages are still yielded in
+        order.
+        """
+        if max_in_flight < 1:
+            raise Exception(f"Bad number of requests in flight {max_in_flight}")
+        self.__max_in_flight = max_in_flight
+        return self
+
+    def synced(self) -> "RequestPlays":
+        """
+        Instead of relying on the plays cached on the first crawl forever, pick
+        up plays logged since the last sync (at most once a day) and merge them
+        with the ones we already have. Only the new plays are fetched, the full
+        history is then read from the cache.
+        """
+        self.__is_synced = True
+        return self
+
+    def missing(self) -> List[DateRange]:
+        """
+        The date ranges (newest first) which aren't cached yet, and would be
+        fetched when iterating over the plays
+        """
+        if self.__isFiltered():
+            # Filtered queries aren't cached
+            return [(OPEN_START, OPEN_END)]
+        return self.__gaps(self.__readState())
+
+    def warm(self) -> None:
+        """
+        Fetches the first page of the newest missing range, so that iterating
+        over the plays later would find it memoized
+        """
+        gaps = self.missing()
+        if gaps:
+            self.__forRange(*gaps[0]).page(1)
+
+    def describe(self) -> ManifestEntry:
+        """The manifest entry for these plays, as it would be written now"""
+        return self.__describe(self.__readState(), bytes=self._cache_size())
+
+    def compiled(self) -> PlayColumns:
+        """
+        All the plays (the same ones iterating would return) compiled into
+        columns. The columns are cached too, so as long as nothing new was
+        fetched, reading them doesn't decompress or parse any page.
+        """
+        if self.__isFiltered():
+            # Filtered queries aren't cached
+            return PlayColumns().extend(self.queryAllRecords())
+
+        state = self.__readState()
+        if not self.__gaps(state) and state.get("compiled") == state["chunks"]:
+            compiled = self._read_cache_blob(COMPILED_FILE)
+            start = time.perf_counter()
+            columns = PlayColumns.deserialize(compiled) if compiled else None
+            self._request_stats().record_decode(time.perf_counter() - start)
+            if columns is not None:
+                return columns
+
+        # Whatever is missing is fetched without holding the lock, like when
+        # iterating, the lock only keeps chunks from being stored while the
+        # stored ones are compiled
+        for _ in self.__iter_missing(set(), set()):
+            pass
+        with self._cache_entry_lock(PLAYS_STATE):
+            columns = PlayColumns().extend(self.queryAllRecords())
+            self._write_cache_blob(COMPILED_FILE, columns.serialize())
+            state = self.__readState()
+            state["compiled"] = state["chunks"]
+            self._write_cache_metadata(PLAYS_STATE, state)
+        return columns
+
     def queryAll(self) -> Generator[play.Play, None, None]:
-        for plays in self:
+        if self.__isFiltered():
+            for plays in self:
+                for p in plays:
+                    yield p
+            return
+
+        # Stored chunks are parsed as they are consumed instead of a whole
+        # page at a time, see play.PageStream
+        yield from self.__queryAllStored(lambda p: p, play.PageStream)
+
+    def queryAllRecords(self) -> Generator[play.PlayRecord, None, None]:
+        """
+        Same plays as queryAll, decoded once into records for observers.
+        Stored chunks are decoded straight into records by the request type's
+        parser backend.
+        """
+        if self.__isFiltered():
+            for p in self.queryAll():
+                yield p.record()
+            return
+
+        yield from self.__queryAllStored(lambda p: p.record(), self.__decodeRecords)
+
+    async def queryAll_async(self) -> AsyncGenerator[play.Play, None]:
+        async for plays in self:
             for p in plays:
                 yield p
 
     def __iter__(self) -> Iterator[play.Page]:
+        if self.__isFiltered():
+            if self.__is_synced:
+                raise Exception("Synced plays can't be filtered")
+            return self.__iter_paged()
+        return self.__iter_stored()
+
+    def __iter_paged(self) -> Iterator[play.Page]:
+        if self.__max_in_flight > 1:
+            return self.__iter_concurrently()
+        return self.__iter_serially()
+
+    def __iter_stored(self) -> Iterator[play.Page]:
+        seen: Set[int] = set()
+        fetched: Set[str] = set()
+        yield from self.__iter_missing(seen, fetched)
+
+        for name in self.__storedChunks():
+            if name in fetched:
+                continue
+            cached = self._fetch_cache_entry(name)
+            if cached:
+                yield self.__unseen(cached, seen)
+
+    def __iter_missing(self, seen: Set[int], fetched: Set[str]) -> Iterator[play.Page]:
+        """
+        Fetches (and stores) whatever isn't covered by the stored chunks. The
+        state is only locked while it's updated, so anyone else crawling the
+        same plays at the same time fetches them too, but only one of them
+        stores each page.
+        """
+        # Missing ranges are fetched newest first, so fetched plays are always
+        # at least as new as the cached ones, and the newest version of a play
+        # is the one returned
+        for start, end in self.__gaps(self.__readState()):
+            InlineOutput.overwrite(f"Fetching plays {PlaysCoverage([(start, end)])}\n")
+            for page in self.__forRange(start, end).__iter_paged():
+                name = self.__storeChunk(start, end, page)
+                if name:
+                    fetched.add(name)
+                yield self.__unseen(page, seen)
+            self.__storeCovered(start, end)
+
+    def __queryAllStored(
+        self,
+        convert: Callable[[play.Play], TPlay],
+        decode: Callable[[str], Iterable[TPlay]],
+    ) -> Iterator[TPlay]:
+        """
+        Fetched pages are converted (they were parsed to be stored anyway),
+        and stored chunks are decoded
+        """
+        seen: Set[int] = set()
+        fetched: Set[str] = set()
+        for plays in self.__iter_missing(seen, fetched):
+            for p in plays:
+                yield convert(p)
+
+        for name in self.__storedChunks():
+            if name in fetched:
+                continue
+            contents = self._read_cache_entry(name)
+            if not contents:
+                continue
+            for decoded in decode(contents):
+                if decoded.id() not in seen:
+                    seen.add(decoded.id())
+                    yield decoded
+
+    def __decodeRecords(self, contents: str) -> List[play.PlayRecord]:
+        start = time.perf_counter()
+        records = self._parser_backend().play_records(contents)
+        self._request_stats().record_parse(time.perf_counter() - start)
+        return records
+
+    def __isFiltered(self) -> bool:
+        return self.__type != (None, None) or self.__date != (None, None)
+
+    def __forRange(self, start: datetime.date, end: datetime.date) -> "RequestPlays":
+        """The same plays, but only within the range (inclusive)"""
+        request = RequestPlays(self.__user_name, self.__id).filter_on(
+            date=(
+                start if start != OPEN_START else None,
+                end if end != OPEN_END else None,
+            )
+        )
+        request.__max_in_flight = self.__max_in_flight
+        request.__is_gap = True
+        return request
+
+    def __gaps(self, state: Dict[str, Any]) -> List[DateRange]:
+        coverage = PlaysCoverage.from_json(state["coverage"])
+        if not self.__is_synced or not state["synced_to"]:
+            return coverage.missing()
+
+        synced_to = datetime.date.fromisoformat(state["synced_to"])
+        if synced_to >= datetime.date.today():
+            return coverage.missing()
+
+        # Everything since a bit before the last sync is refetched to pick up
+        # plays which were logged late
+        stale = synced_to - SYNC_OVERLAP
+        return [(stale, OPEN_END)] + coverage.missing(end=stale - ONE_DAY)
+
+    def __storeChunk(
+        self, start: datetime.date, end: datetime.date, page: play.Page
+    ) -> Optional[str]:
+        """The name of the chunk the page was stored as, if it was stored"""
+        with self._cache_entry_lock(PLAYS_STATE):
+            # Chunks are named by their number, the state is read again to
+            # take the next one
+            state = self.__readState()
+            oldest = RequestPlays.__oldestDate(page)
+            covered = PlaysCoverage.from_json(state["coverage"])
+            if oldest and not covered.missing(oldest + ONE_DAY, end):
+                # Someone else crawling the same plays already stored this
+                # page, see below
+                return None
+
+            name = f"{CHUNK_PREFIX}{state['chunks']:06d}"
+            state["bytes"] += self._store_cache_entry(name, page)
+            state["chunks"] += 1
+            state["fetched"] = datetime.datetime.now().timestamp()
+            if (start, end) == (OPEN_START, OPEN_END):
+                # Only the total of an unbounded query is the total of all plays
+                state["total"] = page.total()
+
+            # Pages are fetched newest first, so once a page is stored we have
+            # all the plays newer than its oldest one. Plays on the same date as
+            # the oldest one could still be on the next page.
+            if oldest:
+                RequestPlays.__addCovered(state, oldest + ONE_DAY, end)
+            self.__storeState(state)
+        return name
+
+    def __storeCovered(self, start: datetime.date, end: datetime.date) -> None:
+        with self._cache_entry_lock(PLAYS_STATE):
+            state = self.__readState()
+            RequestPlays.__addCovered(state, start, end)
+            self.__storeState(state)
+
+    @staticmethod
+    def __addCovered(
+        state: Dict[str, Any], start: datetime.date, end: datetime.date
+    ) -> None:
+        coverage = PlaysCoverage.from_json(state["coverage"])
+        coverage.add(start, end)
+        state["coverage"] = coverage.to_json()
+        if end == OPEN_END:
+            state["synced_to"] = f"{datetime.date.today()}"
+
+    def __storeState(self, state: Dict[str, Any]) -> None:
+        self._write_cache_metadata(PLAYS_STATE, state)
+        self.__storeManifestEntry(state)
+
+    def __storeManifestEntry(self, state: Dict[str, Any]) -> None:
+        self.cache_manifest().put(
+            nonthrows(self._cache_dir()), self.__describe(state, state["bytes"])
+        )
+
+    @staticmethod
+    def __oldestDate(page: play.Page) -> Optional[datetime.date]:
+        """
+        Undated plays are listed after all the dated ones, they don't tell how
+        far back the page goes
+        """
+        dates = [date for date in (p.date() for p in page) if date]
+        return min(dates) if dates else None
+
+    @staticmethod
+    def __describe(state: Dict[str, Any], bytes: int) -> ManifestEntry:
+        fetched = state["fetched"]
+        if fetched is None and state["synced_to"]:
+            # Imported from a legacy cache, that's as close as we could get
+            fetched = datetime.datetime.fromisoformat(state["synced_to"]).timestamp()
+        return ManifestEntry(
+            pages=state["chunks"] + state["legacy_pages"],
+            total=state["total"],
+            fetched=datetime.datetime.fromtimestamp(fetched) if fetched else None,
+            bytes=bytes,
+            complete=PlaysCoverage.from_json(state["coverage"]).is_complete(),
+        )
+
+    def __storedChunks(self) -> List[str]:
+        """All cached entries with plays in them, newest first"""
+        entries = self._cache_entries()
+        chunks = [name for name in entries if name.startswith(CHUNK_PREFIX)]
+        deltas = [name for name in entries if name.startswith(LEGACY_DELTA_PREFIX)]
+        return (
+            list(reversed(chunks))
+            + list(reversed(deltas))
+            + RequestPlays.__legacyPages(entries)
+        )
+
+    def __readState(self) -> Dict[str, Any]:
+        state: Dict[str, Any] = {
+            "coverage": [],
+            "synced_to": None,
+            "chunks": 0,
+            # Only kept for the manifest
+            "total": None,
+            "fetched": None,
+            "bytes": 0,
+            "legacy_pages": 0,
+        }
+        stored = self._read_cache_metadata(PLAYS_STATE)
+        if stored:
+            # States written before the manifest are missing some of the keys
+            state.update(stored)
+            return state
+
+        entries = self._cache_entries()
+        pages = RequestPlays.__legacyPages(entries)
+        if not pages:
+            return state
+
+        # The legacy pages were fetched one after the other from the first
+        # one, so only the consecutive run from the first page says anything
+        # about what's covered. Pages might have shifted between fetches,
+        # there's nothing to do about that except refetching everything.
+        last = next(
+            (i for i, name in enumerate(pages) if int(name) != i + 1), len(pages)
+        )
+        last_page = self._fetch_cache_entry(pages[last - 1]) if last > 0 else None
+        if last_page is not None:
+            oldest = RequestPlays.__oldestDate(last_page)
+            if len(last_page) < ENTRIES_IN_FULL_PAGE:
+                state["coverage"] = PlaysCoverage([(OPEN_START, OPEN_END)]).to_json()
+            elif oldest:
+                state["coverage"] = PlaysCoverage(
+                    [(oldest + ONE_DAY, OPEN_END)]
+                ).to_json()
+            state["total"] = last_page.total()
+
+        legacy_sync = self._read_cache_metadata(LEGACY_SYNC_STATE)
+        if legacy_sync:
+            state["synced_to"] = legacy_sync["synced_to"]
+        else:
+            modified = self._cache_entry_modified(pages[0])
+            state["synced_to"] = f"{modified.date()}" if modified else None
+
+        state["legacy_pages"] = len(pages) + len(
+            [name for name in entries if name.startswith(LEGACY_DELTA_PREFIX)]
+        )
+        state["bytes"] = self._cache_size()
+        self._write_cache_metadata(PLAYS_STATE, state)
+        self.__storeManifestEntry(state)
+        return state
+
+    @staticmethod
+    def __legacyPages(entries: List[str]) -> List[str]:
+        return sorted((name for name in entries if name.isdigit()), key=int)
+
+    @staticmethod
+    def __unseen(page: play.Page, seen: Set[int]) -> play.Page:
+        unseen = page.exclude(seen)
+        seen.update(p.id() for p in unseen)
+        return unseen
+
+    def __iter_serially(self, start: int = 1) -> Iterator[play.Page]:
         total = None
-        for page in itertools.count(start=1):
+        for page in itertools.count(start=start):
             InlineOutput.overwrite(f"Fetching page {page}")
             if total:
                 InlineOutput.write(f" of {total} ({100*(page/total):.2f}%)")
@@ -64,10 +481,145 @@ class RequestPlays(RequestBase[play.Page], Sized, Iterable[play.Page]):
                 # We can guess when the generation is done if the number of
                 # plays we got is lower than the usual number in a full page
                 InlineOutput.write(" DONE!\n")
-                return "Last page received"
+                return
+
+    def __iter_concurrently(self) -> Iterator[play.Page]:
+        InlineOutput.overwrite("Fetching page 1")
+        plays = self._fetch(page=1)
+        total = (plays.total() // ENTRIES_IN_FULL_PAGE) + 1
+
+        if plays:
+            yield plays
+
+        if len(plays) < ENTRIES_IN_FULL_PAGE:
+            InlineOutput.write(" DONE!\n")
+            return
+
+        planned_pages = iter(range(2, total + 1))
+        with ThreadPoolExecutor(max_workers=self.__max_in_flight) as executor:
+            in_flight: Deque[Tuple[int, Future[play.Page]]] = deque(
+                (page, self._fetch_deferred(executor, page=page))
+                for page in itertools.islice(planned_pages, self.__max_in_flight)
+            )
+            while in_flight:
+                page, future = in_flight.popleft()
+                InlineOutput.overwrite(
+                    f"Fetching page {page} of {total} ({100*(page/total):.2f}%) [{len(in_flight) + 1} in flight]"
+                )
+                plays = future.result()
+
+                next_page = next(planned_pages, None)
+                if next_page:
+                    in_flight.append(
+                        (next_page, self._fetch_deferred(executor, page=next_page))
+                    )
+
+                if plays:
+                    yield plays
+                else:
+                    InlineOutput.write(" Empty page fetched!")
+
+                if len(plays) < ENTRIES_IN_FULL_PAGE:
+                    # Plays are only ever added, so the planned number of
+                    # pages could only be an overestimate. Anything still in
+                    # flight would just end up in the caches.
+                    InlineOutput.write(" DONE!\n")
+                    return
+
+        # The last planned page was full, which means plays were logged since
+        # we fetched the first page; pick up the stragglers one by one
+        yield from self.__iter_serially(start=total + 1)
+
+    async def __aiter__(self) -> AsyncIterator[play.Page]:
+        if self.__isFiltered():
+            if self.__is_synced:
+                raise Exception("Synced plays can't be filtered")
+            async for page in self.__aiter_paged():
+                yield page
+            return
+
+        # Same as iterating synchronously, the state is only locked (in a
+        # thread, locks are held by threads rather than coroutines) while it's
+        # updated
+        state = await asyncio.to_thread(self.__readState)
+
+        seen: Set[int] = set()
+        fetched: Set[str] = set()
+        for start, end in self.__gaps(state):
+            InlineOutput.overwrite(f"Fetching plays {PlaysCoverage([(start, end)])}\n")
+            async for page in self.__forRange(start, end).__aiter_paged():
+                name = await asyncio.to_thread(self.__storeChunk, start, end, page)
+                if name:
+                    fetched.add(name)
+                yield self.__unseen(page, seen)
+            await asyncio.to_thread(self.__storeCovered, start, end)
+
+        for name in await asyncio.to_thread(self.__storedChunks):
+            if name in fetched:
+                continue
+            cached = await asyncio.to_thread(self._fetch_cache_entry, name)
+            if cached:
+                yield self.__unseen(cached, seen)
+
+    async def __aiter_paged(self) -> AsyncIterator[play.Page]:
+        InlineOutput.overwrite("Fetching page 1")
+        plays = await self._fetch_async(page=1)
+        total = (plays.total() // ENTRIES_IN_FULL_PAGE) + 1
+
+        if plays:
+            yield plays
+
+        if len(plays) < ENTRIES_IN_FULL_PAGE:
+            InlineOutput.write(" DONE!\n")
+            return
+
+        # Without concurrency the window is just 1 page wide, which is the same
+        # as fetching the pages serially
+        in_flight: Deque[Tuple[int, asyncio.Task]] = deque()
+        next_page = 2
+        while next_page <= total and len(in_flight) < self.__max_in_flight:
+            in_flight.append(
+                (next_page, asyncio.ensure_future(self._fetch_async(page=next_page)))
+            )
+            next_page += 1
+
+        try:
+            while in_flight:
+                page, task = in_flight.popleft()
+                InlineOutput.overwrite(
+                    f"Fetching page {page} of {total} ({100*(page/total):.2f}%) [{len(in_flight) + 1} in flight]"
+                )
+                plays = await task
+
+                # Past the planned pages we only go one page at a time
+                if len(plays) >= ENTRIES_IN_FULL_PAGE and (
+                    next_page <= total or not in_flight
+                ):
+                    in_flight.append(
+                        (
+                            next_page,
+                            asyncio.ensure_future(self._fetch_async(page=next_page)),
+                        )
+                    )
+                    next_page += 1
+
+                if plays:
+                    yield plays
+                else:
+                    InlineOutput.write(" Empty page fetched!")
+
+                if len(plays) < ENTRIES_IN_FULL_PAGE:
+                    InlineOutput.write(" DONE!\n")
+                    return
+        finally:
+            for _, pending in in_flight:
+                pending.cancel()
+
+    def page(self, page: int) -> play.Page:
+        return self._fetch(page=page)
 
     def __len__(self) -> int:
-        return self._fetch().total()
+        return self.page(1).total()
 
     def _api_version(self) -> int:
         return 2
@@ -107,12 +659,44 @@ class RequestPlays(RequestBase[play.Page], Sized, Iterable[play.Page]):
     def _build_response(self, root: ET.Element, **kwargs) -> play.Page:
         return play.Page(root)
 
+    @classmethod
+    def _response_root_tag(cls) -> str:
+        return play.Page._rootTagName()
+
     def _cache_dir(self) -> Optional[str]:
-        return f"{self.__id}" if self.__id else f"user_{self.__user_name}"
+        return (
+            f"{self.__id}"
+            if self.__id
+            else f"{USER_CACHE_DIR_PREFIX}{self.__user_name}"
+        )
 
     def _cache_file_name(self, **kwargs) -> Optional[str]:
-        if self.__type[0] or self.__type[1] or self.__date[0] or self.__date[1]:
-            # Dont cache filtered queries atm
+        if not self.__isFiltered() or self.__is_gap:
+            # Pages aren't cached by their number, unfiltered plays are cached
+            # as chunks when iterated
             return None
 
-        return f"{kwargs['page']:04d}"
+        max_date = self.__date[1]
+        if not max_date or max_date >= datetime.date.today():
+            # Pages shift whenever plays are logged, so they could only be
+            # cached if no more plays could be logged within the range
+            return None
+
+        return super()._cache_file_name(**kwargs)
+
+    @classmethod
+    def _cache_aging(cls, name: str) -> float:
+        if not name.isdigit():
+            return 1.0
+        # Ranked games are the ones the analyses are about, and their plays are
+        # the slowest to fetch again. Only the games the analyses summarized
+        # are known, without parsing every cached thing.
+        game = RequestThing.thing_summaries().get(name)
+        if game and game.type() == "boardgame" and game.overall_rank() is not None:
+            return 0.25
+        return 1.0
+
+    def _cache_codec(self) -> str:
+        # Plays make up most of the cache and are all read back whenever they
+        # are compiled, decompression speed matters more than size for them
+        return "zlib"
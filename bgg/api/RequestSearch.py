@@ -1,3 +1,4 @@
+import os
 import xml.etree.ElementTree as ET
 from typing import Dict, Optional
 
@@ -12,6 +13,7 @@ class RequestSearch(RequestItemsBase[search.Item]):
     """
 
     def __init__(self) -> None:
+        super().__init__()
         self.__type: Optional[str] = None
 
     def ofType(self, type: str) -> "RequestSearch":
@@ -21,6 +23,11 @@ class RequestSearch(RequestItemsBase[search.Item]):
     def query(self, query: str, is_exact: bool = True) -> Items[search.Item]:
         return self._fetch(query=query, is_exact=is_exact)
 
+    async def query_async(
+        self, query: str, is_exact: bool = True
+    ) -> Items[search.Item]:
+        return await self._fetch_async(query=query, is_exact=is_exact)
+
     def _api_version(self) -> int:
         return 2
 
@@ -42,5 +49,20 @@ class RequestSearch(RequestItemsBase[search.Item]):
     def _build_item(self, item_elem: ET.Element) -> search.Item:
         return search.Item(item_elem)
 
-    def _cache_file_name(str, **kwargs) -> str:
-        return kwargs["query"]
+    @classmethod
+    def _cache_aging(cls, name: str) -> float:
+        # Searches are cheap to make again, and are rarely repeated
+        return 8.0
+
+    def _legacy_cache_file_name(self, **kwargs) -> Optional[str]:
+        # The type and exactness were left out, so just hope they match
+        query = kwargs["query"]
+        if (
+            query in ("", os.curdir, os.pardir)
+            or "\0" in query
+            or os.path.basename(query) != query
+        ):
+            # The query was used as the file name as is, these would point
+            # outside of the searches' cache dir (or nowhere)
+            return None
+        return query
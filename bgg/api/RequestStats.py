@@ -0,0 +1,82 @@
+import threading
+
+
+class RequestStats:
+    """
+    Where a request type's time went, other than the network itself. It's
+    recorded to from every thread making requests of that type.
+    """
+
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+        self.__bytes_read = 0
+        self.__decode_time = 0.0
+        self.__parse_time = 0.0
+        self.__throttled = 0.0
+
+    def record_hit(self, size: int) -> None:
+        with self.__lock:
+            self.__hits += 1
+            self.__bytes_read += size
+
+    def record_miss(self) -> None:
+        with self.__lock:
+            self.__misses += 1
+
+    def record_decode(self, seconds: float) -> None:
+        with self.__lock:
+            self.__decode_time += seconds
+
+    def record_parse(self, seconds: float) -> None:
+        with self.__lock:
+            self.__parse_time += seconds
+
+    def record_throttle(self, seconds: float) -> None:
+        with self.__lock:
+            self.__throttled += seconds
+
+    def snapshot(self) -> "RequestStats":
+        """A copy of what was recorded so far, which isn't recorded to"""
+        snapshot = RequestStats()
+        with self.__lock:
+            snapshot.__hits = self.__hits
+            snapshot.__misses = self.__misses
+            snapshot.__bytes_read = self.__bytes_read
+            snapshot.__decode_time = self.__decode_time
+            snapshot.__parse_time = self.__parse_time
+            snapshot.__throttled = self.__throttled
+        return snapshot
+
+    def hits(self) -> int:
+        """Entries read from the cache"""
+        return self.__hits
+
+    def misses(self) -> int:
+        """Responses which weren't cached, and had to be fetched"""
+        return self.__misses
+
+    def bytes_read(self) -> int:
+        """Size of the entries read from the cache, before they were decoded"""
+        return self.__bytes_read
+
+    def decode_time(self) -> float:
+        """Seconds spent decompressing what was read from the cache"""
+        return self.__decode_time
+
+    def parse_time(self) -> float:
+        """Seconds spent parsing responses, cached or fetched"""
+        return self.__parse_time
+
+    def throttled(self) -> float:
+        """Seconds spent waiting for the rate limiter"""
+        return self.__throttled
+
+    def __str__(self) -> str:
+        return (
+            f"{self.__hits} cache hits, {self.__misses} misses, "
+            f"{self.__bytes_read / 1024:.1f}KiB read, "
+            f"{self.__decode_time:.2f}s decoding, {self.__parse_time:.2f}s parsing, "
+            f"{self.__throttled:.1f}s throttled"
+        )
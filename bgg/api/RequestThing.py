@@ -1,9 +1,11 @@
+import time
 import xml.etree.ElementTree as ET
-from typing import Dict, Optional, Sequence, Set
+from typing import Dict, List, Optional, Sequence, Set
 
 from ..model import thing
 from ..utils import firstx
 from .RequestBase import RequestItemsBase
+from .ThingSummaries import ThingSummaries
 
 KNOWN_FLAGS = {
     "stats",
@@ -56,6 +58,52 @@ class RequestThing(RequestItemsBase[thing.Item]):
         self.__flags = flags
         return self
 
+    @classmethod
+    def thing_summaries(cls) -> ThingSummaries:
+        return cls._cache_index(ThingSummaries)
+
+    def query_summaries(self, **kwargs) -> List[thing.ThingSummary]:
+        """
+        Same as query_all, but only the summaries of the things, which are read
+        back without parsing the things. Things which weren't summarized yet
+        are summarized here, from the cache if they are cached and otherwise
+        by querying them as usual. Summaries are as fresh as the things were
+        when they were summarized.
+        """
+        if "stats" not in self.__flags:
+            raise Exception("Summaries need stats data! Add 'stats' to query flags")
+
+        summaries = {
+            int(id): summary
+            for id, summary in self.thing_summaries()
+            .get_many(f"{id}" for id in self._ids())
+            .items()
+        }
+
+        # Things which are already cached are decoded straight into their
+        # summaries, only the rest have to be queried
+        summarized = self.__decodeCached(
+            [id for id in self._ids() if id not in summaries], **kwargs
+        )
+        missing = [
+            id for id in self._ids() if id not in summaries and id not in summarized
+        ]
+        if missing:
+            for item in self.__withIds(*missing).query_all(**kwargs):
+                summarized[item.id()] = item.summary()
+
+        self.thing_summaries().update(
+            {f"{id}": summary for id, summary in summarized.items()}
+        )
+        summaries.update(summarized)
+
+        return [
+            summaries[id]
+            for id in self._ids()
+            if id in summaries
+            and (not self.__types or summaries[id].type() in self.__types)
+        ]
+
     def _api_version(self) -> int:
         return 2
 
@@ -76,20 +124,48 @@ class RequestThing(RequestItemsBase[thing.Item]):
     def _build_item(self, item_elem: ET.Element) -> thing.Item:
         return thing.Item(item_elem).with_flags(self.__flags)
 
-    def _cache_file_name(self, **kwargs) -> Optional[str]:
-        cache_file_name = super()._cache_file_name(**kwargs)
-
-        if len(self.__types) > 0:
-            # Disable cache for type filtering
-            return None
+    def _legacy_cache_file_name(self, **kwargs) -> Optional[str]:
+        cache_file_name = super()._legacy_cache_file_name(**kwargs)
 
-        if len(self.__flags) > 1:
-            # Flags might be mixed together and create too many different
-            # combinations which basically return the same thing, so just
-            # disabling caching for flags atm
+        if len(self.__types) > 0 or len(self.__flags) > 1:
+            # Weren't cached
             return None
 
         if len(self.__flags) == 1 and cache_file_name:
             return f"{cache_file_name}_{firstx(self.__flags)}"
 
         return cache_file_name
+
+    def _cache_codec(self) -> str:
+        # Things are read back on every run, decompression speed matters more
+        # than size for them
+        return "zlib"
+
+    @classmethod
+    def _cache_aging(cls, name: str) -> float:
+        # Things are tiny, and they are what tells which plays are worth
+        # keeping (see RequestPlays._cache_aging)
+        return 0.1
+
+    def __withIds(self, *ids: int) -> "RequestThing":
+        return RequestThing(*ids).of_types(*self.__types).with_flags(*self.__flags)
+
+    def __decodeCached(self, ids: List[int], **kwargs) -> Dict[int, thing.ThingSummary]:
+        backend = self._parser_backend()
+        decoded: Dict[int, thing.ThingSummary] = {}
+        for id in ids:
+            request = self.__withIds(id)
+            name = request._cache_file_name(**kwargs)
+            contents = request._read_cache_entry(name) if name else None
+            if not contents:
+                continue
+
+            start = time.perf_counter()
+            try:
+                summaries = backend.thing_summaries(contents, self.__flags)
+            except ET.ParseError:
+                # Left for querying, which would refetch (and rewrite) it
+                continue
+            self._request_stats().record_parse(time.perf_counter() - start)
+            decoded.update({summary.id(): summary for summary in summaries})
+        return decoded
@@ -0,0 +1,188 @@
+import datetime
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import Executor, Future, InvalidStateError
+from typing import Callable, Dict, List, Optional, Tuple, Type, TypeVar
+
+MAX_RETRIES = 5
+RETRY_BASE_INTERVAL = datetime.timedelta(seconds=1)
+
+T = TypeVar("T")
+
+
+class RetryStats:
+    def __init__(self) -> None:
+        self.__retries = 0
+        self.__waited = 0.0
+        self.__bailouts = 0
+
+    def record_retry(self, delay: float) -> None:
+        self.__retries += 1
+        self.__waited += delay
+
+    def record_bailout(self) -> None:
+        self.__bailouts += 1
+
+    def retries(self) -> int:
+        return self.__retries
+
+    def waited(self) -> float:
+        """Total seconds requests spent parked waiting for their retry"""
+        return self.__waited
+
+    def bailouts(self) -> int:
+        return self.__bailouts
+
+    def __str__(self) -> str:
+        return f"{self.__retries} retries, {self.__waited:.1f}s waited, {self.__bailouts} bailouts"
+
+
+class RetryQueue:
+    """
+    Failed attempts are parked here until their backoff passes. Waiting
+    doesn't hold on to a worker thread, so the executor keeps working on other
+    requests in the meantime.
+    """
+
+    def __init__(self, retryable: Tuple[Type[BaseException], ...]) -> None:
+        self.__retryable = retryable
+        self.__parked: List[Tuple[float, int, Callable[[], None]]] = []
+        self.__sequence = itertools.count()
+        self.__condition = threading.Condition()
+        self.__timer: Optional[threading.Thread] = None
+        self.__stats: Dict[str, RetryStats] = {}
+        self.__stats_lock = threading.Lock()
+
+    def backoff(
+        self, request_type: str, retries: int, retry_after: Optional[float] = None
+    ) -> float:
+        """
+        Exponential backoff with jitter (so that requests failing together
+        don't all retry together), but never sooner than the server asked for.
+        The delay is recorded as time spent waiting for the request type.
+        """
+        delay = RETRY_BASE_INTERVAL.total_seconds() * (2**retries)
+        delay = random.uniform(delay / 2, delay)
+        if retry_after:
+            delay = max(delay, retry_after)
+
+        self.__getStats(request_type).record_retry(delay)
+        return delay
+
+    def bail_out(self, request_type: str) -> Exception:
+        self.__getStats(request_type).record_bailout()
+        return Exception(f"Bailing out! API FETCH failed {MAX_RETRIES} retries")
+
+    def submit(
+        self,
+        executor: Executor,
+        request_type: str,
+        attempt: Callable[[], T],
+        retry_after: Callable[[BaseException], Optional[float]],
+    ) -> "Future[T]":
+        """
+        Runs the attempt on the executor until it succeeds, parking it between
+        failed attempts. retry_after extracts any delay the server asked for
+        from the failure.
+        """
+        future: "Future[T]" = Future()
+        self.__schedule(executor, request_type, attempt, retry_after, future, 0)
+        return future
+
+    def stats(self) -> Dict[str, RetryStats]:
+        with self.__stats_lock:
+            return dict(self.__stats)
+
+    def __schedule(
+        self,
+        executor: Executor,
+        request_type: str,
+        attempt: Callable[[], T],
+        retry_after: Callable[[BaseException], Optional[float]],
+        future: "Future[T]",
+        retries: int,
+    ) -> None:
+        def run() -> None:
+            if future.cancelled():
+                return
+
+            try:
+                result = attempt()
+            except self.__retryable as e:
+                if retries + 1 >= MAX_RETRIES:
+                    RetryQueue.__settle(future, exception=self.bail_out(request_type))
+                    return
+
+                delay = self.backoff(request_type, retries, retry_after(e))
+                self.__park(
+                    delay,
+                    lambda: self.__schedule(
+                        executor,
+                        request_type,
+                        attempt,
+                        retry_after,
+                        future,
+                        retries + 1,
+                    ),
+                )
+                return
+            except BaseException as e:
+                RetryQueue.__settle(future, exception=e)
+                return
+
+            RetryQueue.__settle(future, result=result)
+
+        try:
+            executor.submit(run)
+        except RuntimeError as e:
+            # The executor was shut down while we were parked, nobody is
+            # waiting for this anymore
+            RetryQueue.__settle(future, exception=e)
+
+    @staticmethod
+    def __settle(
+        future: Future, result: object = None, exception: Optional[BaseException] = None
+    ) -> None:
+        try:
+            if exception:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            # The caller cancelled the future while we were working on it
+            pass
+
+    def __park(self, delay: float, job: Callable[[], None]) -> None:
+        with self.__condition:
+            heapq.heappush(
+                self.__parked, (time.monotonic() + delay, next(self.__sequence), job)
+            )
+            if not self.__timer:
+                self.__timer = threading.Thread(
+                    target=self.__release, name="RetryQueue", daemon=True
+                )
+                self.__timer.start()
+            self.__condition.notify()
+
+    def __release(self) -> None:
+        while True:
+            with self.__condition:
+                while not self.__parked or self.__parked[0][0] > time.monotonic():
+                    timeout = (
+                        self.__parked[0][0] - time.monotonic()
+                        if self.__parked
+                        else None
+                    )
+                    self.__condition.wait(timeout)
+                _, _, job = heapq.heappop(self.__parked)
+            # Jobs only hand the attempt back to its executor, so they are quick
+            job()
+
+    def __getStats(self, request_type: str) -> RetryStats:
+        with self.__stats_lock:
+            if request_type not in self.__stats:
+                self.__stats[request_type] = RetryStats()
+            return self.__stats[request_type]
@@ -0,0 +1,33 @@
+from typing import Any, Dict
+
+from ..model.thing import ThingSummary
+from .CacheIndex import CacheIndex
+
+SUMMARIES_FILE = "summaries.jsonl"
+SUMMARIES_LOCK_FILE = "summaries.lock"
+
+
+class ThingSummaries(CacheIndex[ThingSummary]):
+    """
+    A summary of each thing cached with its stats, keyed by the thing's id.
+    They outlive the things themselves (if those are evicted), and are updated
+    whenever a thing is parsed into something different from its summary.
+    """
+
+    @classmethod
+    def _file_name(cls) -> str:
+        return SUMMARIES_FILE
+
+    @classmethod
+    def _lock_file_name(cls) -> str:
+        return SUMMARIES_LOCK_FILE
+
+    @classmethod
+    def _key_field(cls) -> str:
+        return "id"
+
+    def _entry_from_json(self, raw: Dict[str, Any]) -> ThingSummary:
+        return ThingSummary(int(raw.pop("id")), raw)
+
+    def _entry_to_json(self, entry: ThingSummary) -> Dict[str, Any]:
+        return entry.to_json()
@@ -0,0 +1,132 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# (connect, read) in seconds, as expected by requests
+DEFAULT_TIMEOUT: Tuple[float, float] = (10, 60)
+
+# Should be at least as big as the number of requests we might have in flight
+# at the same time, otherwise connections would be discarded instead of reused
+DEFAULT_POOL_SIZE = 8
+
+# The API happily serves gzipped responses, which are considerably smaller
+DEFAULT_HEADERS = {
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+
+class TransferStats:
+    def __init__(self) -> None:
+        self.__requests = 0
+        self.__bytes = 0
+        self.__wire_bytes = 0
+        self.__latency = 0.0
+        self.__max_latency = 0.0
+
+    def record(self, latency: float, size: int, wire_size: int) -> None:
+        self.__requests += 1
+        self.__bytes += size
+        self.__wire_bytes += wire_size
+        self.__latency += latency
+        self.__max_latency = max(self.__max_latency, latency)
+
+    def requests(self) -> int:
+        return self.__requests
+
+    def bytes(self) -> int:
+        """Size of the response bodies after they were decompressed"""
+        return self.__bytes
+
+    def wire_bytes(self) -> int:
+        """Size of the response bodies as they were transferred"""
+        return self.__wire_bytes
+
+    def total_latency(self) -> float:
+        return self.__latency
+
+    def average_latency(self) -> float:
+        return self.__latency / self.__requests if self.__requests else 0.0
+
+    def max_latency(self) -> float:
+        return self.__max_latency
+
+    def __str__(self) -> str:
+        return (
+            f"{self.__requests} requests, {self.__wire_bytes / 1024:.1f}KiB on the wire "
+            f"({self.__bytes / 1024:.1f}KiB decoded), latency avg "
+            f"{self.average_latency():.3f}s max {self.__max_latency:.3f}s"
+        )
+
+
+class Transport:
+    """
+    A single pooled HTTP session shared by all requests so that connections
+    (and their TLS handshakes) are reused between calls
+    """
+
+    def __init__(self) -> None:
+        self.__session: Optional[requests.Session] = None
+        self.__timeout = DEFAULT_TIMEOUT
+        self.__pool_size = DEFAULT_POOL_SIZE
+        self.__stats: Dict[str, TransferStats] = {}
+        self.__lock = threading.Lock()
+
+    def configure(
+        self,
+        timeout: Optional[Tuple[float, float]] = None,
+        pool_size: Optional[int] = None,
+    ) -> None:
+        with self.__lock:
+            if timeout:
+                self.__timeout = timeout
+            if pool_size:
+                self.__pool_size = pool_size
+                # The pool size is baked into the session adapters, so the
+                # session would be rebuilt the next time it's needed
+                self.__close()
+
+    def get(
+        self, request_type: str, uri: str, params: Dict[str, str]
+    ) -> requests.Response:
+        start = time.perf_counter()
+        response = self.__getSession().get(uri, params=params, timeout=self.__timeout)
+        latency = time.perf_counter() - start
+
+        size = len(response.content)
+        wire_size = int(response.headers.get("Content-Length", size))
+        with self.__lock:
+            if request_type not in self.__stats:
+                self.__stats[request_type] = TransferStats()
+            self.__stats[request_type].record(latency, size, wire_size)
+
+        return response
+
+    def stats(self) -> Dict[str, TransferStats]:
+        with self.__lock:
+            return dict(self.__stats)
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__close()
+
+    def __getSession(self) -> requests.Session:
+        with self.__lock:
+            if not self.__session:
+                session = requests.Session()
+                session.headers.update(DEFAULT_HEADERS)
+                adapter = HTTPAdapter(
+                    pool_connections=self.__pool_size, pool_maxsize=self.__pool_size
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self.__session = session
+            return self.__session
+
+    def __close(self) -> None:
+        if self.__session:
+            self.__session.close()
+            self.__session = None
@@ -2,8 +2,6 @@ import abc
 import xml.etree.ElementTree as ET
 from typing import Optional
 
-from ..utils import nonthrows
-
 
 class ModelBase:
     @abc.abstractclassmethod
@@ -18,29 +16,39 @@ class ModelBase:
 
         self._root = root
 
+    def serialize(self) -> str:
+        return ET.tostring(self._root, encoding="unicode")
+
+    # The error messages are only built when they are needed, fields are read
+    # far too often to format a message for each read
+
     def _field(self, name: str) -> str:
-        return nonthrows(
-            self._root.get(name),
-            f"Attribute '{name}' missing in '{self._rootTagName()}'",
-        )
+        value = self._root.get(name)
+        if value is None:
+            raise TypeError(f"Attribute '{name}' missing in '{self._rootTagName()}'")
+        return value
 
     def _child(self, tag_name: str) -> ET.Element:
-        return nonthrows(
-            self._root.find(tag_name),
-            f"Child '{tag_name}' missing in '{self._rootTagName()}'",
-        )
+        child = self._root.find(tag_name)
+        if child is None:
+            raise TypeError(f"Child '{tag_name}' missing in '{self._rootTagName()}'")
+        return child
 
     def _child_value(self, tag_name: str) -> str:
-        return nonthrows(
-            self._child(tag_name).get("value"),
-            f"Value attribute missing for '{tag_name}' in '{self._rootTagName()}'",
-        )
+        value = self._child(tag_name).get("value")
+        if value is None:
+            raise TypeError(
+                f"Value attribute missing for '{tag_name}' in '{self._rootTagName()}'"
+            )
+        return value
 
     def _child_text(self, tag_name: str) -> str:
-        return nonthrows(
-            self._child(tag_name).text,
-            f"'{tag_name}' has no inner text in '{self._rootTagName()}'",
-        )
+        text = self._child(tag_name).text
+        if text is None:
+            raise TypeError(
+                f"'{tag_name}' has no inner text in '{self._rootTagName()}'"
+            )
+        return text
 
     @staticmethod
     def _stringToBool(str) -> bool:
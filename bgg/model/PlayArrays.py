@@ -0,0 +1,146 @@
+import datetime
+import re
+from typing import Dict, Iterable, List, Optional, Sized
+
+# numpy is only needed by whoever uses this module, nothing else imports it
+import numpy as np
+
+from . import play
+from .PlayColumns import FLAG_INCOMPLETE, FLAG_NOWINSTATS, NO_LOCATION, PlayColumns
+
+# Plain YYYY-MM-DD dates, one per line, which numpy parses the same as
+# datetime.date.fromisoformat. numpy also takes partial dates, times, year 0
+# and a few words which fromisoformat doesn't, so anything else is parsed one
+# by one.
+ISO_DATES = re.compile(r"(?:(?!0000)[0-9]{4}-[0-9]{2}-[0-9]{2}\n)*")
+
+# Days from the first ordinal (0001-01-01) to numpy's epoch (1970-01-01)
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+class PlayArrays(Sized):
+    """
+    Plays decoded straight into numpy arrays, without a Python object per
+    play: ids, user ids, dates (datetime64[D], NaT where Play.date() would be
+    None), quantities, player counts, flags (see PlayColumns) and locations,
+    as codes into a string table where 0 is the missing location.
+    """
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        user_ids: np.ndarray,
+        dates: np.ndarray,
+        quantities: np.ndarray,
+        player_counts: np.ndarray,
+        flags: np.ndarray,
+        locations: np.ndarray,
+        location_names: List[str],
+    ) -> None:
+        self.ids = ids
+        self.user_ids = user_ids
+        self.dates = dates
+        self.quantities = quantities
+        self.player_counts = player_counts
+        self.flags = flags
+        self.locations = locations
+        self.location_names = location_names
+
+    @staticmethod
+    def from_pages(pages: Iterable[play.Page]) -> "PlayArrays":
+        """
+        All the plays of the pages (a RequestPlays could be passed as is) in
+        a single pass over their elements. Numbers are kept as strings until
+        the end, so that they are converted a whole column at a time.
+        """
+        ids: List[str] = []
+        user_ids: List[str] = []
+        dates: List[str] = []
+        quantities: List[str] = []
+        player_counts: List[int] = []
+        flags: List[int] = []
+        locations: List[int] = []
+        location_names = [""]
+        location_codes: Dict[str, int] = {}
+
+        for page in pages:
+            for elem in page.elements():
+                attrib = elem.attrib
+                ids.append(attrib["id"])
+                user_ids.append(attrib["userid"])
+                date = attrib["date"]
+                dates.append("NaT" if date == play.MISSING_DATE_VALUE else date)
+                quantities.append(attrib["quantity"])
+                players = elem.find("players")
+                player_counts.append(len(players) if players is not None else 0)
+                flags.append(
+                    (FLAG_INCOMPLETE if attrib["incomplete"] == "1" else 0)
+                    | (FLAG_NOWINSTATS if attrib["nowinstats"] == "1" else 0)
+                )
+                location = attrib["location"]
+                if not location:
+                    locations.append(NO_LOCATION)
+                    continue
+                code = location_codes.get(location)
+                if code is None:
+                    code = len(location_names)
+                    location_names.append(location)
+                    location_codes[location] = code
+                locations.append(code)
+
+        return PlayArrays(
+            np.array(ids, dtype=np.int64),
+            np.array(user_ids, dtype=np.int32),
+            PlayArrays.__parseDates(dates),
+            np.array(quantities, dtype=np.int32),
+            np.array(player_counts, dtype=np.uint16),
+            np.array(flags, dtype=np.uint8),
+            np.array(locations, dtype=np.uint32),
+            location_names,
+        )
+
+    @staticmethod
+    def from_columns(columns: PlayColumns) -> "PlayArrays":
+        """
+        Compiled plays are already laid out as arrays, so apart from the dates
+        the arrays share the columns' memory
+        """
+        ordinals = np.frombuffer(columns.column("date"), dtype=np.int32)
+        dates = (ordinals.astype(np.int64) - EPOCH_ORDINAL).astype("datetime64[D]")
+        # Missing dates are compiled as 0, which isn't a valid ordinal
+        dates[ordinals == 0] = np.datetime64("NaT")
+        return PlayArrays(
+            np.frombuffer(columns.column("id"), dtype=np.int64),
+            np.frombuffer(columns.column("user_id"), dtype=np.int32),
+            dates,
+            np.frombuffer(columns.column("quantity"), dtype=np.int32),
+            np.frombuffer(columns.column("player_count"), dtype=np.uint16),
+            np.frombuffer(columns.column("flags"), dtype=np.uint8),
+            np.frombuffer(columns.column("location"), dtype=np.uint32),
+            columns.locations(),
+        )
+
+    def location_name(self, code: int) -> Optional[str]:
+        return self.location_names[code] if code != NO_LOCATION else None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @staticmethod
+    def __parseDates(dates: List[str]) -> np.ndarray:
+        if ISO_DATES.fullmatch("".join(date + "\n" for date in dates)):
+            try:
+                return np.array(dates, dtype="datetime64[D]")
+            except ValueError:
+                # Days out of range, like 2020-02-30
+                pass
+        return np.array(
+            [PlayArrays.__parseDate(date) for date in dates], dtype="datetime64[D]"
+        )
+
+    @staticmethod
+    def __parseDate(date: str) -> np.datetime64:
+        try:
+            return np.datetime64(datetime.date.fromisoformat(date), "D")
+        except ValueError:
+            return np.datetime64("NaT")
@@ -0,0 +1,220 @@
+import array
+import datetime
+import json
+import struct
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, Sized, Tuple
+
+from .play import PlayLike
+
+# Bump whenever the layout changes, older files would just be recompiled
+FORMAT_VERSION = 1
+MAGIC = b"BGGPLAYS"
+HEADER_SIZE = struct.Struct("<I")
+
+# Column name -> array typecode. Play ids are already well past 2^24 so they
+# get a full 64 bits to be on the safe side.
+COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("id", "q"),
+    ("user_id", "i"),
+    ("date", "i"),
+    ("quantity", "i"),
+    ("player_count", "H"),
+    ("flags", "B"),
+    ("location", "I"),
+)
+
+FLAG_INCOMPLETE = 1 << 0
+FLAG_NOWINSTATS = 1 << 1
+
+# Ordinals start at 1, so 0 is free to mark plays with a missing date
+MISSING_DATE_ORDINAL = 0
+
+# Location 0 is always the missing location
+NO_LOCATION = 0
+
+
+class PlayRow:
+    """
+    A single play read back from the columns. Has the same accessors as
+    play.Play (for the fields that are compiled) so observers could visit
+    either one.
+    """
+
+    __slots__ = (
+        "__id",
+        "__user_id",
+        "__date",
+        "__quantity",
+        "__player_count",
+        "__flags",
+        "__location",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        user_id: int,
+        date: int,
+        quantity: int,
+        player_count: int,
+        flags: int,
+        location: Optional[str],
+    ) -> None:
+        self.__id = id
+        self.__user_id = user_id
+        self.__date = date
+        self.__quantity = quantity
+        self.__player_count = player_count
+        self.__flags = flags
+        self.__location = location
+
+    def id(self) -> int:
+        return self.__id
+
+    def user_id(self) -> int:
+        return self.__user_id
+
+    def date(self) -> Optional[datetime.date]:
+        if self.__date == MISSING_DATE_ORDINAL:
+            return None
+        return datetime.date.fromordinal(self.__date)
+
+    def quantity(self) -> int:
+        return self.__quantity
+
+    def player_count(self) -> int:
+        return self.__player_count
+
+    def is_incomplete(self) -> bool:
+        return bool(self.__flags & FLAG_INCOMPLETE)
+
+    def is_nowinstats(self) -> bool:
+        return bool(self.__flags & FLAG_NOWINSTATS)
+
+    def location(self) -> Optional[str]:
+        return self.__location
+
+
+class PlayColumns(Sized, Iterable[PlayRow]):
+    """
+    Plays compiled into flat columns of numbers, with locations interned
+    into a string table. Reading them back is just slicing a buffer, with no
+    decompression or XML parsing.
+    """
+
+    def __init__(self) -> None:
+        self.__columns: Dict[str, array.array] = {
+            name: array.array(typecode) for name, typecode in COLUMNS
+        }
+        self.__locations: List[str] = [""]
+        self.__location_ids: Dict[str, int] = {}
+
+    def append(self, play: PlayLike) -> None:
+        date = play.date()
+        location = play.location()
+        self.__columns["id"].append(play.id())
+        self.__columns["user_id"].append(play.user_id())
+        self.__columns["date"].append(
+            date.toordinal() if date else MISSING_DATE_ORDINAL
+        )
+        self.__columns["quantity"].append(play.quantity())
+        self.__columns["player_count"].append(play.player_count())
+        self.__columns["flags"].append(
+            (FLAG_INCOMPLETE if play.is_incomplete() else 0)
+            | (FLAG_NOWINSTATS if play.is_nowinstats() else 0)
+        )
+        self.__columns["location"].append(
+            self.__internLocation(location) if location else NO_LOCATION
+        )
+
+    def extend(self, plays: Iterable[PlayLike]) -> "PlayColumns":
+        for play in plays:
+            self.append(play)
+        return self
+
+    def column(self, name: str) -> array.array:
+        """Direct access to a column, for when rows aren't needed at all"""
+        return self.__columns[name]
+
+    def locations(self) -> List[str]:
+        """The string table the location column indexes into"""
+        return self.__locations
+
+    def serialize(self) -> bytes:
+        header = json.dumps(
+            {
+                "version": FORMAT_VERSION,
+                "byteorder": sys.byteorder,
+                "rows": len(self),
+                "columns": [
+                    [name, typecode, self.__columns[name].itemsize]
+                    for name, typecode in COLUMNS
+                ],
+                "locations": self.__locations,
+            }
+        ).encode()
+        return b"".join(
+            [MAGIC, HEADER_SIZE.pack(len(header)), header]
+            + [self.__columns[name].tobytes() for name, _ in COLUMNS]
+        )
+
+    @staticmethod
+    def deserialize(data: bytes) -> Optional["PlayColumns"]:
+        """Returns None if the data was written in a different format"""
+        if not data.startswith(MAGIC):
+            return None
+        offset = len(MAGIC)
+        (header_size,) = HEADER_SIZE.unpack_from(data, offset)
+        offset += HEADER_SIZE.size
+        end = offset + header_size
+        header = json.loads(data[offset:end])
+        offset = end
+
+        if header["version"] != FORMAT_VERSION:
+            return None
+
+        columns = PlayColumns()
+        view = memoryview(data)
+        for name, typecode, itemsize in header["columns"]:
+            column = columns.__columns[name]
+            if column.typecode != typecode or column.itemsize != itemsize:
+                # Written on a platform with different sizes
+                return None
+            end = offset + header["rows"] * itemsize
+            column.frombytes(view[offset:end])
+            if header["byteorder"] != sys.byteorder:
+                column.byteswap()
+            offset = end
+
+        columns.__locations = header["locations"]
+        columns.__location_ids = {
+            location: i for i, location in enumerate(columns.__locations) if i
+        }
+        return columns
+
+    def __len__(self) -> int:
+        return len(self.__columns["id"])
+
+    def __iter__(self) -> Iterator[PlayRow]:
+        locations = [None] + self.__locations[1:]
+        for id, user_id, date, quantity, player_count, flags, location in zip(
+            *(self.__columns[name] for name, _ in COLUMNS)
+        ):
+            yield PlayRow(
+                id,
+                user_id,
+                date,
+                quantity,
+                player_count,
+                flags,
+                locations[location],
+            )
+
+    def __internLocation(self, location: str) -> int:
+        id = self.__location_ids.get(location)
+        if id is None:
+            id = len(self.__locations)
+            self.__locations.append(location)
+            self.__location_ids[location] = id
+        return id
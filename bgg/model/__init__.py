@@ -1,6 +1,7 @@
-from typing import Callable, Generic, Iterable, Iterator, Sized, TypeVar
+from typing import Callable, Dict, Generic, Iterable, Iterator, Sized, TypeVar
 from xml.etree import ElementTree as ET
 
+from ..utils import nonthrows
 from .ModelBase import ModelBase
 
 TModel = TypeVar("TModel", bound=ModelBase)
@@ -20,6 +21,15 @@ class Items(ModelBase, Generic[TModel], Sized, Iterable[TModel]):
     def total(self) -> int:
         return int(self._field("total"))
 
+    def split(self) -> Dict[int, "Items[TModel]"]:
+        """Breaks a response with several items into single-item responses"""
+        out: Dict[int, Items[TModel]] = {}
+        for child in self._root:
+            root = ET.Element(self._root.tag, self._root.attrib)
+            root.append(child)
+            out[int(nonthrows(child.get("id")))] = Items(root, self.__factory)
+        return out
+
     def __len__(self) -> int:
         return len(self._root)
 
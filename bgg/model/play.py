@@ -1,5 +1,7 @@
 import datetime
-from typing import Iterable, Iterator, List, Optional, Sequence, Sized
+import io
+import xml.etree.ElementTree as ET
+from typing import Iterable, Iterator, List, Optional, Protocol, Sequence, Set, Sized
 
 from ..utils import LazySequence, nonthrows
 from .ModelBase import ModelBase
@@ -107,6 +109,115 @@ class Play(ModelBase):
             return None
         return LazySequence(players, lambda player: Player(player))
 
+    def player_count(self) -> int:
+        """Plays without any players listed count as 0"""
+        players = self._root.find("players")
+        return len(players) if players else 0
+
+    def record(self) -> "PlayRecord":
+        """The fields observers read, decoded once"""
+        return PlayRecord(
+            self.id(),
+            self.user_id(),
+            self.date(),
+            self.quantity(),
+            self.player_count(),
+            self.is_incomplete(),
+            self.is_nowinstats(),
+            self.location(),
+        )
+
+
+class PlayLike(Protocol):
+    """What observers read from a play, so that other types could stand in for it"""
+
+    def id(self) -> int:
+        pass
+
+    def user_id(self) -> int:
+        pass
+
+    def date(self) -> Optional[datetime.date]:
+        pass
+
+    def quantity(self) -> int:
+        pass
+
+    def player_count(self) -> int:
+        pass
+
+    def is_incomplete(self) -> bool:
+        pass
+
+    def is_nowinstats(self) -> bool:
+        pass
+
+    def location(self) -> Optional[str]:
+        pass
+
+
+class PlayRecord:
+    """
+    A play with the fields observers read decoded up front, so reading them
+    again (as observers do) costs nothing. Doesn't keep the play's element
+    around either. Satisfies PlayLike, so observers could visit it instead.
+    """
+
+    __slots__ = (
+        "__id",
+        "__user_id",
+        "__date",
+        "__quantity",
+        "__player_count",
+        "__incomplete",
+        "__nowinstats",
+        "__location",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        user_id: int,
+        date: Optional[datetime.date],
+        quantity: int,
+        player_count: int,
+        incomplete: bool,
+        nowinstats: bool,
+        location: Optional[str],
+    ) -> None:
+        self.__id = id
+        self.__user_id = user_id
+        self.__date = date
+        self.__quantity = quantity
+        self.__player_count = player_count
+        self.__incomplete = incomplete
+        self.__nowinstats = nowinstats
+        self.__location = location
+
+    def id(self) -> int:
+        return self.__id
+
+    def user_id(self) -> int:
+        return self.__user_id
+
+    def date(self) -> Optional[datetime.date]:
+        return self.__date
+
+    def quantity(self) -> int:
+        return self.__quantity
+
+    def player_count(self) -> int:
+        return self.__player_count
+
+    def is_incomplete(self) -> bool:
+        return self.__incomplete
+
+    def is_nowinstats(self) -> bool:
+        return self.__nowinstats
+
+    def location(self) -> Optional[str]:
+        return self.__location
+
 
 class Page(ModelBase, Sized, Iterable[Play]):
     @classmethod
@@ -119,6 +230,18 @@ class Page(ModelBase, Sized, Iterable[Play]):
     def page(self) -> int:
         return int(self._field("page"))
 
+    def elements(self) -> Iterable[ET.Element]:
+        """The plays as raw elements, for decoding them in bulk"""
+        return self._root
+
+    def exclude(self, ids: Set[int]) -> "Page":
+        """A page with the same attributes, but without the given plays"""
+        root = ET.Element(self._root.tag, self._root.attrib)
+        root.extend(
+            child for child in self._root if int(nonthrows(child.get("id"))) not in ids
+        )
+        return Page(root)
+
     def __len__(self) -> int:
         return len(self._root)
 
@@ -132,3 +255,33 @@ class Page(ModelBase, Sized, Iterable[Play]):
                 # TODO: Temporarily don't allow failed parsing so we can find
                 # all the quirks of the API
                 raise
+
+
+class PageStream(Iterable[Play]):
+    """
+    The plays of a page, parsed as they are iterated instead of all at once.
+    Plays are dropped from the page's tree once the next one is parsed, so
+    only the plays the caller holds on to are kept in memory.
+    """
+
+    def __init__(self, contents: str) -> None:
+        self.__contents = contents
+
+    def __iter__(self) -> Iterator[Play]:
+        root: Optional[ET.Element] = None
+        for event, elem in ET.iterparse(
+            io.StringIO(self.__contents), events=("start", "end")
+        ):
+            if root is None:
+                root = elem
+                if root.tag != Page._rootTagName():
+                    raise Exception(
+                        f"Expected root tag '{Page._rootTagName()}' but got '{root.tag}'"
+                    )
+                continue
+
+            if event == "end" and elem.tag == Play._rootTagName():
+                yield Play(elem)
+                # Plays are direct children of the root, so it never has more
+                # than this one in it to look through
+                root.remove(elem)
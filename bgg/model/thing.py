@@ -1,11 +1,29 @@
 import collections
 import datetime
-from typing import Dict, Iterable, Iterator, List, Optional, Set, Sized, Tuple
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Sized,
+    Tuple,
+    TypeVar,
+)
 
 from ..utils import firstx, nonthrows
 from . import Link, Name
 from .ModelBase import ModelBase
 
+# Summaries only keep the links the analyses follow, there could be hundreds of
+# the others (artists, mechanics, etc...)
+SUMMARY_LINK_TYPES = ("boardgamefamily", "boardgameexpansion")
+
+T = TypeVar("T")
+
 
 class PollResult(ModelBase):
     @classmethod
@@ -283,6 +301,52 @@ class Item(ModelBase):
         categories = self.categories()
         return categories[0] if categories else None
 
+    def summary(self) -> "ThingSummary":
+        self.__assert_flag("stats")
+        is_boardgame = self.type() == "boardgame"
+        links = self.links()
+        # Things are sometimes missing some of these, which only fails reading
+        # them from the summary (the same as it would from the item) and not
+        # summarizing the whole thing
+        ratings = Item.__or_none(self.ratings)
+        ranks = Item.__or_none(ratings.ranks) if ratings else None
+        players = Item.__or_none(self.player_count) if is_boardgame else None
+        categories = Item.__or_none(self.categories) if is_boardgame else None
+        # Laid out the way it's stored, so it compares equal to what's read back
+        return ThingSummary(
+            self.id(),
+            {
+                "type": self.type(),
+                "name": Item.__or_none(self.primary_name),
+                "year": Item.__or_none(self.year_published),
+                "thumbnail": self.thumbnail(),
+                "players": list(players) if players else None,
+                "ranks": {name: rank.value() for name, rank in (ranks or {}).items()},
+                "categories": categories or [],
+                "ratings": (
+                    Item.__or_none(lambda: Item.__ratings_raw(ratings))
+                    if ratings
+                    else None
+                ),
+                "links": {
+                    type: [list(link) for link in links[type]]
+                    for type in SUMMARY_LINK_TYPES
+                    if type in links
+                },
+            },
+        )
+
+    @staticmethod
+    def __ratings_raw(ratings: Ratings) -> List[Any]:
+        return [ratings.users_rated(), list(ratings.stats()), list(ratings.market())]
+
+    @staticmethod
+    def __or_none(getter: Callable[[], T]) -> Optional[T]:
+        try:
+            return getter()
+        except (TypeError, ValueError, StopIteration):
+            return None
+
     def __assert_flag(self, flag: str) -> None:
         if flag not in self.__flags:
             raise Exception(f"{flag} data not requested! Add '{flag}' to query flags")
@@ -307,3 +371,95 @@ class Item(ModelBase):
         """Raw data, prefer calling links instead"""
         for link in nonthrows(self._root.findall("link")):
             yield Link(link)
+
+
+class RatingsSummary:
+    __slots__ = ("__raw",)
+
+    def __init__(self, raw: List[Any]) -> None:
+        self.__raw = raw
+
+    def users_rated(self) -> int:
+        return self.__raw[0]
+
+    def stats(self) -> Tuple[float, float, float, float]:
+        average, bayesaverage, stddev, median = self.__raw[1]
+        return (average, bayesaverage, stddev, median)
+
+    def market(self) -> Tuple[int, int, int, int]:
+        owned, trading, wanting, wishing = self.__raw[2]
+        return (owned, trading, wanting, wishing)
+
+
+class ThingSummary:
+    """
+    What the analyses read from a thing (with stats), picked out of it up
+    front into plain json so it could be cached compactly and read back
+    without parsing the thing. Only the accessors decode it, and they are the
+    same as Item's so it could stand in for it.
+    """
+
+    __slots__ = ("__id", "__raw")
+
+    def __init__(self, id: int, raw: Dict[str, Any]) -> None:
+        self.__id = id
+        self.__raw = raw
+
+    def to_json(self) -> Dict[str, Any]:
+        """Everything but the id, which summaries are keyed by"""
+        return self.__raw
+
+    def type(self) -> str:
+        return self.__raw["type"]
+
+    def id(self) -> int:
+        return self.__id
+
+    def thumbnail(self) -> Optional[str]:
+        return self.__raw["thumbnail"]
+
+    def primary_name(self) -> str:
+        return self.__present("name")
+
+    def year_published(self) -> Optional[int]:
+        return self.__raw["year"]
+
+    def player_count(self) -> Tuple[int, int]:
+        """The official (published) player count limits for the game"""
+        if self.type() != "boardgame":
+            raise Exception(
+                f"This data is only available for boardgame, not for {self.type()}"
+            )
+        min, max = self.__present("players")
+        return (min, max)
+
+    def links(self) -> Dict[str, List[Tuple[int, str]]]:
+        """Only the SUMMARY_LINK_TYPES ones"""
+        out: Dict[str, List[Tuple[int, str]]] = collections.defaultdict(list)
+        for type, links in self.__raw["links"].items():
+            out[type] = [(id, value) for id, value in links]
+        return out
+
+    def ratings(self) -> RatingsSummary:
+        return RatingsSummary(self.__present("ratings"))
+
+    def overall_rank(self) -> Optional[int]:
+        if self.type() != "boardgame":
+            raise Exception(
+                f"This data is only available for boardgame, not for {self.type()}"
+            )
+        return self.__raw["ranks"].get(self.type())
+
+    def categories(self) -> List[str]:
+        return self.__raw["categories"]
+
+    def primary_category(self) -> Optional[str]:
+        categories = self.categories()
+        return categories[0] if categories else None
+
+    def __present(self, field: str) -> Any:
+        value = self.__raw[field]
+        if value is None:
+            # The thing it was summarized from was missing it
+            raise TypeError(f"Field '{field}' missing in summary of {self.__id}")
+        return value
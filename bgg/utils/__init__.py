@@ -1,4 +1,4 @@
-from typing import Callable, Iterable, Optional, Sequence, TypeVar
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, TypeVar
 
 T = TypeVar("T")
 Traw = TypeVar("Traw")
@@ -15,6 +15,17 @@ def firstx(collection: Iterable[T]) -> T:
     return nonthrows(next(iter(collection)))
 
 
+def chunked(collection: Iterable[T], size: int) -> Iterator[List[T]]:
+    chunk: List[T] = []
+    for x in collection:
+        chunk.append(x)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
 class LazySequence(Sequence[Tout]):
     def __init__(
         self, raw_collection: Sequence[Traw], fn: Callable[[Traw], Tout]
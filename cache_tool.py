@@ -0,0 +1,494 @@
+#!/usr/local/bin/python3
+
+import os
+import random
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from bgg.api.CacheArchive import CacheArchive
+from bgg.api.CacheCodec import CODECS, CacheCodec, codec_by_name, codec_for_file
+from bgg.api.CacheLock import CacheLock, write_atomically
+from bgg.api.CacheManifest import CacheManifest, ManifestEntry
+from bgg.api.RequestBase import (
+    CACHE_ROOT_DIR,
+    ENTRIES_LOCK_FILE,
+    TEMP_ROOT_DIR,
+    RequestBase,
+)
+from bgg.api.RequestPlays import USER_CACHE_DIR_PREFIX, RequestPlays
+from bgg.utils import InlineOutput, nonthrows
+
+USAGE = f"""Usage:
+    {sys.argv[0]} recode <{"|".join(CODECS)}> [RequestType...]
+        Re-encodes the cache (or just the given request types) in parallel
+    {sys.argv[0]} bench [sample size]
+        Compares the codecs on a sample of entries of each request type
+    {sys.argv[0]} pack [RequestType...]
+        Packs each cache directory into a single archive, and compacts the
+        ones which are already packed
+    {sys.argv[0]} manifest
+        Rebuilds the manifest of cached plays from their cache directories
+    {sys.argv[0]} evict [max size, e.g. 500M or 20G|none]
+        Sets the budget for the size of the cache (if given), and evicts the
+        least recently used parts of the cache until it's within it
+    {sys.argv[0]} verify [--requeue] [RequestType...]
+        Checks every cache entry in parallel (decodes it, parses it and checks
+        its root tag), and moves the bad ones into quarantine. Plays are
+        quarantined with their whole directory, and with --requeue they are
+        fetched again right away. Other entries are fetched again whenever
+        they are next requested.
+"""
+
+SEPARATOR = "\t"
+SIZE_UNITS = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+BENCH_SAMPLE_SIZE = 200
+BENCH_REPEATS = 3
+# Files are small, so hand them over to the workers in bigger batches
+RECODE_BATCH_SIZE = 64
+VERIFY_BATCH_SIZE = 256
+# Bad entries are moved here, under the same path they had in the cache
+QUARANTINE_ROOT_DIR = "bggquarantine"
+
+
+def main(argv: List[str] = []) -> int:
+    if len(argv) >= 3 and argv[1] == "recode":
+        return recode(codec_by_name(argv[2]), argv[3:])
+
+    if len(argv) >= 2 and argv[1] == "bench":
+        return bench(int(argv[2]) if len(argv) >= 3 else BENCH_SAMPLE_SIZE)
+
+    if len(argv) >= 2 and argv[1] == "pack":
+        return pack(argv[2:])
+
+    if len(argv) >= 2 and argv[1] == "manifest":
+        return manifest()
+
+    if len(argv) >= 2 and argv[1] == "verify":
+        return verify(
+            "--requeue" in argv[2:], [arg for arg in argv[2:] if arg != "--requeue"]
+        )
+
+    if len(argv) >= 2 and argv[1] == "evict":
+        return evict(argv[2] if len(argv) >= 3 else None)
+
+    print(USAGE)
+    return 1
+
+
+def recode(codec: CacheCodec, request_types: List[str]) -> int:
+    files = [
+        file for file in cache_files(request_types) if codec_for_file(file) is not codec
+    ]
+    before = 0
+    after = 0
+    with ProcessPoolExecutor() as executor:
+        for index, (old_size, new_size) in enumerate(
+            executor.map(
+                recode_file,
+                files,
+                [codec.name()] * len(files),
+                chunksize=RECODE_BATCH_SIZE,
+            )
+        ):
+            before += old_size
+            after += new_size
+            InlineOutput.overwrite(f"Recoded {index + 1} of {len(files)} files")
+
+    archives = [dir for dir in cache_dirs(request_types) if CacheArchive.exists(dir)]
+    with ProcessPoolExecutor() as executor:
+        for index, (old_size, new_size) in enumerate(
+            executor.map(recode_archive, archives, [codec.name()] * len(archives))
+        ):
+            before += old_size
+            after += new_size
+            InlineOutput.overwrite(f"Recoded {index + 1} of {len(archives)} archives")
+
+    print(
+        f"\nRecoded {len(files)} files and {len(archives)} archives to {codec.name()}: "
+        f"{before / 1024 / 1024:.1f}MiB -> {after / 1024 / 1024:.1f}MiB"
+    )
+    return 0
+
+
+def recode_file(path: str, codec_name: str) -> Tuple[int, int]:
+    old = codec_for_file(path)
+    if not old:
+        raise Exception(f"Not a cache file: {path}")
+    new = codec_by_name(codec_name)
+
+    dir, file = os.path.split(path)
+    name = file[: -len(old.suffix())]
+    with entry_lock(dir, name):
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            # Rewritten or evicted since the files were listed
+            return (0, 0)
+        encoded = new.encode(old.decode(data))
+
+        write_atomically(os.path.join(dir, f"{name}{new.suffix()}"), encoded)
+        os.remove(path)
+
+    return (len(data), len(encoded))
+
+
+def recode_archive(dir: str, codec_name: str) -> Tuple[int, int]:
+    new = codec_by_name(codec_name)
+    archive = CacheArchive.open(dir)
+    before = 0
+    after = 0
+    for name in archive.names():
+        old_name, data = nonthrows(archive.read(name))
+        if old_name == new.name():
+            continue
+        encoded = new.encode(codec_by_name(old_name).decode(data))
+        archive.write(name, new.name(), encoded)
+        before += len(data)
+        after += len(encoded)
+
+    if before:
+        # Drop the old versions of the entries
+        archive.compact({})
+    return (before, after)
+
+
+def pack(request_types: List[str]) -> int:
+    dirs = list(cache_dirs(request_types))
+    packed = 0
+    reclaimed = 0
+    with ProcessPoolExecutor() as executor:
+        for index, (files, garbage) in enumerate(executor.map(pack_dir, dirs)):
+            packed += files
+            reclaimed += garbage
+            InlineOutput.overwrite(f"Packed {index + 1} of {len(dirs)} directories")
+
+    print(
+        f"\nPacked {packed} files, reclaimed {reclaimed / 1024 / 1024:.1f}MiB "
+        f"from archives"
+    )
+    return 0
+
+
+def pack_dir(dir: str) -> Tuple[int, int]:
+    """Returns the number of loose files packed, and garbage bytes dropped"""
+    loose: Dict[str, Tuple[str, bytes, float]] = {}
+    loose_files: Dict[str, Tuple[str, float]] = {}
+    for file in sorted(os.listdir(dir)):
+        codec = codec_for_file(file)
+        path = os.path.join(dir, file)
+        if not codec or not os.path.isfile(path):
+            continue
+        name = file[: -len(codec.suffix())]
+        with entry_lock(dir, name):
+            try:
+                with open(path, "rb") as f:
+                    modified = os.path.getmtime(path)
+                    loose[name] = (codec.name(), f.read(), modified)
+            except FileNotFoundError:
+                # Rewritten or evicted since the directory was listed
+                continue
+            loose_files[path] = (name, modified)
+
+    archive = CacheArchive.open(dir)
+    garbage = archive.garbage() if CacheArchive.exists(dir) else 0
+    if not loose and not garbage:
+        return (0, 0)
+
+    archive.compact(loose)
+    packed = 0
+    for path, (name, modified) in loose_files.items():
+        with entry_lock(dir, name):
+            # Entries rewritten since they were packed are newer than the
+            # archived version, they are packed the next time
+            if os.path.exists(path) and os.path.getmtime(path) == modified:
+                os.remove(path)
+                packed += 1
+    return (packed, garbage)
+
+
+def manifest() -> int:
+    queries = list(RequestPlays.cached_queries())
+    entries: Dict[str, ManifestEntry] = {}
+    with ProcessPoolExecutor() as executor:
+        for index, (query, entry) in enumerate(
+            zip(queries, executor.map(describe_plays, queries))
+        ):
+            entries[query] = entry
+            InlineOutput.overwrite(f"Described {index + 1} of {len(queries)} queries")
+    RequestPlays.cache_manifest().rebuild(entries)
+
+    print(
+        f"\nManifest rebuilt with {len(entries)} queries, "
+        f"{len([entry for entry in entries.values() if entry.complete])} complete"
+    )
+    return 0
+
+
+def describe_plays(query: str) -> ManifestEntry:
+    return plays_request(query).describe()
+
+
+def plays_request(query: str) -> RequestPlays:
+    if query.isdigit():
+        return RequestPlays(thingid=int(query))
+    prefix_length = len(USER_CACHE_DIR_PREFIX)
+    return RequestPlays(username=query[prefix_length:])
+
+
+def verify(requeue: bool, request_types: List[str]) -> int:
+    entries = [
+        entry
+        for request_type in request_types or sorted(os.listdir(cache_root()))
+        for entry in cache_entries(request_type)
+    ]
+    problems: List[Tuple[str, str, str]] = []
+    with ProcessPoolExecutor() as executor:
+        for index, ((dir, name), problem) in enumerate(
+            zip(
+                entries,
+                executor.map(
+                    verify_entry,
+                    [dir for dir, _ in entries],
+                    [name for _, name in entries],
+                    chunksize=VERIFY_BATCH_SIZE,
+                ),
+            )
+        ):
+            if problem:
+                problems.append((dir, name, problem))
+            InlineOutput.overwrite(
+                f"Verified {index + 1} of {len(entries)} entries, "
+                f"{len(problems)} bad"
+            )
+    print()
+
+    quarantined_dirs = quarantine(problems)
+    print(
+        f"Quarantined {len(problems)} entries "
+        f"({len(quarantined_dirs)} whole directories) into {quarantine_root()}"
+    )
+
+    if requeue:
+        plays_dirs = [
+            dir
+            for dir in sorted(quarantined_dirs)
+            if os.path.dirname(dir) == os.path.join(cache_root(), "RequestPlays")
+        ]
+        for index, dir in enumerate(plays_dirs):
+            print(f"Refetching plays {index + 1} of {len(plays_dirs)}")
+            plays_request(os.path.basename(dir)).compiled()
+
+    return 0 if not problems else 1
+
+
+def quarantine(problems: List[Tuple[str, str, str]]) -> Set[str]:
+    """Quarantines the bad entries, returns the directories quarantined whole"""
+    quarantined_dirs: Set[str] = set()
+    for dir, name, problem in problems:
+        print(f"{os.path.join(dir, name)}: {problem}")
+        if os.path.dirname(dir) == cache_root():
+            quarantine_entry(dir, name)
+        else:
+            # Entries of a cache directory are only meaningful together (the
+            # plays chunks and the ranges they cover), it's refetched whole
+            quarantined_dirs.add(dir)
+    for dir in sorted(quarantined_dirs):
+        quarantine_dir(dir)
+
+    for type_dir in {os.path.dirname(dir) for dir in quarantined_dirs}:
+        CacheManifest.open(type_dir).remove(
+            os.path.basename(dir)
+            for dir in quarantined_dirs
+            if os.path.dirname(dir) == type_dir
+        )
+    for type_dir in {dir for dir, _, _ in problems}:
+        if CacheArchive.exists(type_dir):
+            CacheArchive.open(type_dir).compact({})
+    return quarantined_dirs
+
+
+def verify_entry(dir: str, name: str) -> Optional[str]:
+    """What's wrong with the entry, if anything"""
+    try:
+        contents = read_raw(dir, name)
+    except Exception as e:
+        return f"Failed to decode [{e}]"
+
+    request_type = os.path.relpath(dir, cache_root()).split(os.sep)[0]
+    request_class = RequestBase.request_class(request_type)
+    if not request_class:
+        return None
+    return request_class.cached_response_problem(contents)
+
+
+def quarantine_entry(dir: str, name: str) -> None:
+    quarantine_dir = os.path.join(quarantine_root(), os.path.relpath(dir, cache_root()))
+    with entry_lock(dir, name):
+        archive = CacheArchive.open(dir)
+        archived = archive.read(name)
+        if archived:
+            codec_name, data = archived
+            write_atomically(
+                os.path.join(
+                    quarantine_dir, f"{name}{codec_by_name(codec_name).suffix()}"
+                ),
+                data,
+            )
+            archive.remove(name)
+
+        for codec in CODECS.values():
+            file = f"{name}{codec.suffix()}"
+            if os.path.exists(os.path.join(dir, file)):
+                os.makedirs(quarantine_dir, exist_ok=True)
+                os.replace(os.path.join(dir, file), os.path.join(quarantine_dir, file))
+
+
+def quarantine_dir(dir: str) -> None:
+    quarantined = os.path.join(quarantine_root(), os.path.relpath(dir, cache_root()))
+    # Anything quarantined there before is superseded
+    shutil.rmtree(quarantined, ignore_errors=True)
+    os.makedirs(os.path.dirname(quarantined), exist_ok=True)
+    CacheArchive.open(dir).close()
+    os.replace(dir, quarantined)
+
+
+def evict(max_size: Optional[str]) -> int:
+    if max_size is not None:
+        RequestBase.configure_cache_budget(parse_size(max_size))
+
+    evicted = RequestBase.enforce_cache_budget(force=True)
+    print(
+        f"Evicted {len(evicted)} cache units: "
+        f"{sum(unit.size for unit in evicted) / 1024 / 1024:.1f}MiB"
+    )
+    return 0
+
+
+def parse_size(size: str) -> Optional[int]:
+    if size.lower() == "none":
+        return None
+    unit = size[-1:].upper()
+    if unit in SIZE_UNITS:
+        return int(float(size[:-1]) * SIZE_UNITS[unit])
+    return int(size)
+
+
+def bench(sample_size: int) -> int:
+    print(
+        SEPARATOR.join(
+            [
+                "Type",
+                "Codec",
+                "Entries",
+                "Raw (MiB)",
+                "Encoded (MiB)",
+                "Ratio",
+                "Encode (MiB/s)",
+                "Decode (MiB/s)",
+            ]
+        )
+    )
+
+    # Sampling is seeded so that consecutive runs compare the same entries
+    sampler = random.Random(0)
+    for request_type in sorted(os.listdir(cache_root())):
+        entries = list(cache_entries(request_type))
+        if not entries:
+            continue
+
+        sample = sampler.sample(entries, min(sample_size, len(entries)))
+        raw = [read_raw(dir, name) for dir, name in sample]
+        raw_size = sum(len(contents.encode()) for contents in raw)
+
+        for codec in CODECS.values():
+            start = time.perf_counter()
+            encoded = [codec.encode(contents) for contents in raw]
+            encode_time = time.perf_counter() - start
+
+            decode_time = min(time_decode(codec, encoded) for _ in range(BENCH_REPEATS))
+
+            encoded_size = sum(len(data) for data in encoded)
+            print(
+                SEPARATOR.join(
+                    [
+                        request_type,
+                        codec.name(),
+                        f"{len(sample)}",
+                        f"{raw_size / 1024 / 1024:.2f}",
+                        f"{encoded_size / 1024 / 1024:.2f}",
+                        f"{encoded_size / raw_size:.3f}",
+                        f"{raw_size / 1024 / 1024 / encode_time:.1f}",
+                        f"{raw_size / 1024 / 1024 / decode_time:.1f}",
+                    ]
+                )
+            )
+
+    return 0
+
+
+def time_decode(codec: CacheCodec, encoded: List[bytes]) -> float:
+    start = time.perf_counter()
+    for data in encoded:
+        codec.decode(data)
+    return time.perf_counter() - start
+
+
+def read_raw(dir: str, name: str) -> str:
+    archived = CacheArchive.open(dir).read(name)
+    if archived:
+        codec_name, data = archived
+        return codec_by_name(codec_name).decode(data)
+
+    for codec in CODECS.values():
+        path = os.path.join(dir, f"{name}{codec.suffix()}")
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return codec.decode(f.read())
+    raise Exception(f"Entry {name} missing in {dir}")
+
+
+def entry_lock(dir: str, name: str) -> CacheLock:
+    """The same lock requests hold while they read and write the entry"""
+    return CacheLock(os.path.join(dir, ENTRIES_LOCK_FILE), name)
+
+
+def cache_root() -> str:
+    return os.path.join(TEMP_ROOT_DIR, CACHE_ROOT_DIR)
+
+
+def quarantine_root() -> str:
+    return os.path.join(TEMP_ROOT_DIR, QUARANTINE_ROOT_DIR)
+
+
+def cache_dirs(request_types: List[str]) -> Iterator[str]:
+    for request_type in request_types or sorted(os.listdir(cache_root())):
+        for dir, _, _ in os.walk(os.path.join(cache_root(), request_type)):
+            yield dir
+
+
+def cache_entries(request_type: str) -> Iterator[Tuple[str, str]]:
+    """Directory and name of all entries, loose or archived"""
+    for dir in cache_dirs([request_type]):
+        names = set(CacheArchive.open(dir).names())
+        for file in os.listdir(dir):
+            codec = codec_for_file(file)
+            if codec:
+                names.add(file[: -len(codec.suffix())])
+        for name in sorted(names):
+            yield (dir, name)
+
+
+def cache_files(request_types: List[str]) -> Iterator[str]:
+    for request_type in request_types or sorted(os.listdir(cache_root())):
+        for dir, _, files in os.walk(os.path.join(cache_root(), request_type)):
+            for file in sorted(files):
+                if codec_for_file(file):
+                    yield os.path.join(dir, file)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -1,9 +1,9 @@
 #!/usr/local/bin/python3
 
-import sys
 from collections import defaultdict
 from typing import Dict, Iterable, Iterator, List, Set
 
+from bgg.api.RequestBase import RequestBase
 from bgg.api.RequestFamily import RequestFamily
 from bgg.api.RequestPlays import RequestPlays
 from bgg.api.RequestThing import RequestThing
@@ -32,15 +32,15 @@ def main(argv: List[str] = []) -> int:
     )
     with open(argv[1], "wt") as output:
         output.write(f"{SEPARATOR.join(fields)}\n")
-        output.writelines(process_games(CLIGamesParser(argv[2:])))
+        output.writelines(process_games(CLIGamesParser(argv[2:]).prefetch()))
         output.writelines(process_families())
 
     return 0
 
 
-def process_games(games: Iterable[int]) -> Iterator[str]:
-    for index, game_id in enumerate(games):
-        game = RequestThing(game_id).with_flags("stats").query_first()
+def process_games(games: CLIGamesParser) -> Iterator[str]:
+    for index, game in enumerate(games.summaries()):
+        game_id = game.id()
 
         collected_families = [
             family_id
@@ -65,7 +65,9 @@ def process_games(games: Iterable[int]) -> Iterator[str]:
 
         player_count_logic = pca.Logic(game.player_count())
         session_count_logic = sc.Logic()
-        for plays, play in enumerate(RequestPlays(thingid=game_id).queryAll()):
+        for plays, play in enumerate(
+            RequestPlays(thingid=game_id).concurrently().compiled()
+        ):
             player_count_logic.visit(play)
             session_count_logic.visit(play)
 
@@ -117,8 +119,10 @@ def process_family(id: int, family_games: Iterable[int]) -> str:
     popular_users_rated = 0
     total_users_rated = 0
     total_owned = 0
-    for index, game_id in enumerate(family_games):
-        game = RequestThing(game_id).with_flags("stats").query_first()
+    for index, game in enumerate(
+        RequestThing(*family_games).with_flags("stats").query_summaries()
+    ):
+        game_id = game.id()
 
         print(
             f"Adding {index:03d} {game.primary_name()} ({game.id()}) to family {family.primary_name()}"
@@ -144,7 +148,7 @@ def process_family(id: int, family_games: Iterable[int]) -> str:
         total_owned += game.ratings().market()[0]
         total_users_rated += game.ratings().users_rated()
 
-        for play in RequestPlays(thingid=game_id).queryAll():
+        for play in RequestPlays(thingid=game_id).concurrently().compiled():
             player_count_logic.visit(play)
             session_count_logic.visit(play)
 
@@ -176,4 +180,4 @@ def process_family(id: int, family_games: Iterable[int]) -> str:
 
 
 if __name__ == "__main__":
-    sys.exit(main(sys.argv))
+    RequestBase.run_script(main)
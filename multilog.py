@@ -1,10 +1,9 @@
 #!/usr/local/bin/python3
 
-import sys
-from typing import Iterable, Iterator, List
+from typing import Iterator, List
 
+from bgg.api.RequestBase import RequestBase
 from bgg.api.RequestPlays import RequestPlays
-from bgg.api.RequestThing import RequestThing
 from CLIGamesParser import CLIGamesParser
 from observers import MultiLog as ml
 
@@ -15,21 +14,23 @@ def main(argv: List[str] = []) -> int:
     fields = ["Name", "ID"] + ml.Presenter.column_names()
     with open(argv[1], "wt") as output:
         output.write(f"{SEPARATOR.join(fields)}\n")
-        output.writelines(process_games(CLIGamesParser(argv[2:])))
+        output.writelines(process_games(CLIGamesParser(argv[2:]).prefetch()))
 
     return 0
 
 
-def process_games(games: Iterable[int]) -> Iterator[str]:
-    for index, game_id in enumerate(games):
-        game = RequestThing(game_id).with_flags("stats").query_first()
+def process_games(games: CLIGamesParser) -> Iterator[str]:
+    for index, game in enumerate(games.summaries()):
+        game_id = game.id()
 
         print(
             f"Processing plays for game {index:03d}: {game.primary_name()} ({game.id()})"
         )
 
         logic = ml.Logic()
-        for plays, play in enumerate(RequestPlays(thingid=game_id).queryAll()):
+        for plays, play in enumerate(
+            RequestPlays(thingid=game_id).concurrently().compiled()
+        ):
             logic.visit(play)
 
         try:
@@ -42,4 +43,4 @@ def process_games(games: Iterable[int]) -> Iterator[str]:
 
 
 if __name__ == "__main__":
-    sys.exit(main(sys.argv))
+    RequestBase.run_script(main)
@@ -70,14 +70,14 @@ T = TypeVar("T")
 
 class MonthlyLogic(Generic[T]):
     @abc.abstractclassmethod
-    def _countable_item(cls, play: play.Play) -> T:
+    def _countable_item(cls, play: play.PlayLike) -> T:
         pass
 
     def __init__(self, aggr_by: int = 1) -> None:
         self._results: Dict[Month, Set[T]] = defaultdict(set)
         self._aggr_by = aggr_by
 
-    def visit(self, play: play.Play) -> None:
+    def visit(self, play: play.PlayLike) -> None:
         date = play.date()
         if not date:
             return
@@ -91,13 +91,15 @@ class MonthlyLogic(Generic[T]):
 
 class UniquePlaysLogic(MonthlyLogic[Tuple[int, Optional[datetime.date]]]):
     @classmethod
-    def _countable_item(cls, play: play.Play) -> Tuple[int, Optional[datetime.date]]:
+    def _countable_item(
+        cls, play: play.PlayLike
+    ) -> Tuple[int, Optional[datetime.date]]:
         return (play.user_id(), play.date())
 
 
 class UniqueUsersLogic(MonthlyLogic[int]):
     @classmethod
-    def _countable_item(cls, play: play.Play) -> int:
+    def _countable_item(cls, play: play.PlayLike) -> int:
         return play.user_id()
 
 
@@ -109,7 +111,7 @@ class TotalUsersLogic(MonthlyLogic[int]):
         self._results = TotalUsersLogic.__total
 
     @classmethod
-    def _countable_item(cls, play: play.Play) -> int:
+    def _countable_item(cls, play: play.PlayLike) -> int:
         return play.user_id()
 
 
@@ -15,7 +15,7 @@ class Logic:
         self.__locations[Logic.__getLabel(True)] = {}
         self.__locations[Logic.__getLabel(False)] = {}
 
-    def visit(self, play: play.Play) -> None:
+    def visit(self, play: play.PlayLike) -> None:
         location = play.location()
         if not location:
             return
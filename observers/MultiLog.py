@@ -9,7 +9,7 @@ class Logic:
     def __init__(self) -> None:
         self.__results: Dict[Tuple[int, datetime.date], int] = defaultdict(int)
 
-    def visit(self, play: play.Play) -> None:
+    def visit(self, play: play.PlayLike) -> None:
         date = play.date()
         if not date:
             return
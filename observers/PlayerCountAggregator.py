@@ -77,9 +77,8 @@ class Logic:
         for cat in ResultsCategory:
             self.__results[cat] = {}
 
-    def visit(self, play: play.Play) -> None:
-        players = play.players()
-        num_players = len(players) if players else 0
+    def visit(self, play: play.PlayLike) -> None:
+        num_players = play.player_count()
         num_players = num_players if num_players >= self.__player_count[0] and num_players <= self.__player_count[1] else 0
         self.__bump(
             Logic.__categorize(play),
@@ -97,7 +96,7 @@ class Logic:
             self.__results[category][bucket] = quantity
 
     @staticmethod
-    def __categorize(play: play.Play) -> ResultsCategory:
+    def __categorize(play: play.PlayLike) -> ResultsCategory:
         if play.is_incomplete():
             return ResultsCategory.INCOMPLETE
 
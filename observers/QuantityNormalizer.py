@@ -7,7 +7,7 @@ class Logic:
     def __init__(self) -> None:
         self.__results: Dict[int, int] = {}
 
-    def visit(self, play: play.Play) -> None:
+    def visit(self, play: play.PlayLike) -> None:
         quantity = play.quantity()
         try:
             self.__results[quantity] += 1
@@ -7,7 +7,7 @@ class Logic:
     def __init__(self) -> None:
         self.__results: int = 0
 
-    def visit(self, play: play.Play) -> None:
+    def visit(self, play: play.PlayLike) -> None:
         self.__results += 1
 
     def getResults(self) -> int:
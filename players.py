@@ -1,8 +1,8 @@
 #!/usr/local/bin/python3
 
-import sys
 from typing import List
 
+from bgg.api.RequestBase import RequestBase
 from bgg.api.RequestPlays import RequestPlays
 from bgg.api.RequestThing import RequestThing
 from CLIGamesParser import CLIGamesParser
@@ -22,7 +22,7 @@ def main(argv: List[str] = []) -> int:
                 f"Processing plays for game {index:03d}: {game.primary_name()} ({game_id})"
             )
             player_count_logic = pca.Logic(game.player_count())
-            for play in RequestPlays(thingid=game_id).queryAll():
+            for play in RequestPlays(thingid=game_id).concurrently().compiled():
                 player_count_logic.visit(play)
                 locations_logic.visit(play)
                 quantity_logic.visit(play)
@@ -41,4 +41,4 @@ def main(argv: List[str] = []) -> int:
 
 
 if __name__ == "__main__":
-    sys.exit(main(sys.argv))
+    RequestBase.run_script(main)
@@ -0,0 +1,296 @@
+#!/usr/local/bin/python3
+
+import asyncio
+import datetime
+import os
+import sys
+import tempfile
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from bgg.api.RequestBase import RequestBase
+from bgg.api.RequestFamily import RequestFamily
+from bgg.api.RequestList import RequestList
+from bgg.api.RequestPlays import RequestPlays
+from bgg.api.RequestSearch import RequestSearch
+from bgg.api.RequestThing import RequestThing
+
+USAGE = f"""Usage:
+    {sys.argv[0]} serve [port] [fail-every]
+        Serves made up responses for the parts of the API the requests use
+        (things, families, geeklists, searches and plays) on localhost, so
+        they could be tried out without hitting BGG. Every fail-every-th
+        request is rate limited, to try out retrying too.
+    {sys.argv[0]} check
+        Starts the server and runs the async requests against it (with some
+        of them rate limited), checking what they return. Runs in a temp dir,
+        so that the made up responses don't end up in the real cache.
+"""
+
+DEFAULT_PORT = 8089
+PLAYS_PER_GAME = 250
+PLAYS_PER_PAGE = 100
+FIRST_PLAY_DATE = datetime.date(2020, 1, 1)
+FAMILY_SIZE = 5
+LIST_ITEMS = [3, 4, 5]
+CHECK_FAIL_EVERY = 5
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Set on the class by the server, requests are counted across handlers
+    fail_every = 0
+    requests = 0
+    requests_lock = threading.Lock()
+
+    def do_GET(self) -> None:
+        url = urllib.parse.urlparse(self.path)
+        params = {
+            key: values[0] for key, values in urllib.parse.parse_qs(url.query).items()
+        }
+        # Both API versions are served the same, only the path matters
+        path = url.path.split("/", 2)[-1]
+
+        with StandInHandler.requests_lock:
+            StandInHandler.requests += 1
+            is_failed = (
+                self.fail_every > 0 and StandInHandler.requests % self.fail_every == 0
+            )
+        if is_failed:
+            self.__respond(
+                429, "<error><message>Rate limit exceeded.</message></error>"
+            )
+            return
+
+        body = StandInHandler.__body(path, params)
+        if body is None:
+            self.__respond(404, "")
+        else:
+            self.__respond(200, body)
+
+    def log_message(self, format: str, *args) -> None:
+        # Quiet, the requests report what they fetch themselves
+        pass
+
+    def __respond(self, status: int, body: str) -> None:
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/xml; charset=utf-8")
+        self.send_header("Content-Length", f"{len(data)}")
+        self.end_headers()
+        self.wfile.write(data)
+
+    @staticmethod
+    def __body(path: str, params: Dict[str, str]) -> Optional[str]:
+        if path == "thing":
+            return StandInHandler.__items(
+                [
+                    thing_xml(int(id), "stats" in params)
+                    for id in params["id"].split(",")
+                ]
+            )
+        elif path == "family":
+            return StandInHandler.__items([family_xml(int(params["id"]))])
+        elif path == "search":
+            return StandInHandler.__items([search_xml(params["query"])])
+        elif path.startswith("geeklist/"):
+            return geeklist_xml(int(path.split("/")[1]))
+        elif path == "plays":
+            return plays_xml(
+                int(params.get("id", "0")),
+                int(params.get("page", "1")),
+                params.get("mindate"),
+                params.get("maxdate"),
+            )
+        return None
+
+    @staticmethod
+    def __items(items: List[str]) -> str:
+        return f'<items termsofuse="">{"".join(items)}</items>'
+
+
+def thing_xml(id: int, with_stats: bool) -> str:
+    stats = (
+        (
+            f'<statistics page="1"><ratings><usersrated value="{id * 10}"/>'
+            f'<average value="7.1"/><bayesaverage value="6.9"/><ranks>'
+            f'<rank type="subtype" id="1" name="boardgame" friendlyname="Board Game Rank" value="{id}" bayesaverage="6.9"/>'
+            f'<rank type="family" id="5497" name="strategygames" friendlyname="Strategy Game Rank" value="{id}" bayesaverage="6.9"/>'
+            f'</ranks><stddev value="1.2"/><median value="0"/><owned value="{id * 20}"/>'
+            f'<trading value="1"/><wanting value="2"/><wishing value="3"/>'
+            f'<numcomments value="4"/><numweights value="5"/><averageweight value="2.5"/>'
+            f"</ratings></statistics>"
+        )
+        if with_stats
+        else ""
+    )
+    return (
+        f'<item type="boardgame" id="{id}"><thumbnail>thumbnail-{id}</thumbnail>'
+        f'<image>image-{id}</image><name type="primary" sortindex="1" value="Game {id}"/>'
+        f"<description>Made up game {id}</description>"
+        f'<yearpublished value="{2000 + id % 20}"/><minplayers value="2"/>'
+        f'<maxplayers value="5"/><minplaytime value="30"/><maxplaytime value="60"/>'
+        f'<minage value="10"/><link type="boardgamefamily" id="{id % FAMILY_SIZE}" value="Family {id % FAMILY_SIZE}"/>'
+        f"{stats}</item>"
+    )
+
+
+def family_xml(id: int) -> str:
+    games = "".join(
+        f'<link type="boardgamefamily" id="{game_id}" value="Game {game_id}" inbound="true"/>'
+        for game_id in range(id * FAMILY_SIZE, (id + 1) * FAMILY_SIZE)
+    )
+    return (
+        f'<item type="boardgamefamily" id="{id}"><thumbnail>thumbnail-{id}</thumbnail>'
+        f'<image>image-{id}</image><name type="primary" sortindex="1" value="Family {id}"/>'
+        f"<description>Made up family {id}</description>{games}</item>"
+    )
+
+
+def search_xml(query: str) -> str:
+    # The same query always finds the same made up game
+    id = sum(query.encode()) % 1000 + 1
+    return (
+        f'<item type="boardgame" id="{id}"><name type="primary" value="{query}"/>'
+        f'<yearpublished value="2000"/></item>'
+    )
+
+
+def geeklist_xml(id: int) -> str:
+    items = "".join(
+        f'<item id="{game_id}" objecttype="thing" subtype="boardgame" objectid="{game_id}" '
+        f'objectname="Game {game_id}" username="stand-in" postdate="Wed, 01 Jan 2020 00:00:00 +0000" '
+        f'editdate="Wed, 01 Jan 2020 00:00:00 +0000" thumbs="0" imageid="0"><body></body></item>'
+        for game_id in LIST_ITEMS
+    )
+    return (
+        f'<geeklist id="{id}" termsofuse=""><postdate>Wed, 01 Jan 2020 00:00:00 +0000</postdate>'
+        f"<postdate_timestamp>1577836800</postdate_timestamp>"
+        f"<editdate>Wed, 01 Jan 2020 00:00:00 +0000</editdate>"
+        f"<editdate_timestamp>1577836800</editdate_timestamp><thumbs>0</thumbs>"
+        f"<numitems>{len(LIST_ITEMS)}</numitems><username>stand-in</username>"
+        f"<title>List {id}</title><description>Made up list {id}</description>"
+        f"{items}</geeklist>"
+    )
+
+
+def plays_xml(
+    thing_id: int, page: int, min_date: Optional[str], max_date: Optional[str]
+) -> str:
+    # Newest first, a few plays a day, like the API returns them
+    plays = [
+        (id, FIRST_PLAY_DATE + datetime.timedelta(days=id // 3))
+        for id in range(PLAYS_PER_GAME, 0, -1)
+    ]
+    if min_date:
+        plays = [p for p in plays if p[1] >= datetime.date.fromisoformat(min_date)]
+    if max_date:
+        plays = [p for p in plays if p[1] <= datetime.date.fromisoformat(max_date)]
+
+    start = (page - 1) * PLAYS_PER_PAGE
+    end = start + PLAYS_PER_PAGE
+    return (
+        f'<plays termsofuse="" total="{len(plays)}" page="{page}">'
+        + "".join(
+            f'<play id="{id}" userid="{id % 50}" date="{date}" quantity="1" length="0" '
+            f'incomplete="0" nowinstats="0" location="">'
+            f'<item name="Game {thing_id}" objecttype="thing" objectid="{thing_id}">'
+            f'<subtypes><subtype value="boardgame"/></subtypes></item>'
+            f'<players><player username="" userid="0" name="p1" startposition="" color="" '
+            f'score="" new="0" rating="0" win="0"/></players></play>'
+            for id, date in plays[start:end]
+        )
+        + "</plays>"
+    )
+
+
+def start(port: int = 0, fail_every: int = 0) -> ThreadingHTTPServer:
+    """Serves in the background, port 0 picks a free one"""
+    StandInHandler.fail_every = fail_every
+    server = ThreadingHTTPServer(("127.0.0.1", port), StandInHandler)
+    threading.Thread(
+        target=server.serve_forever, name="StandInServer", daemon=True
+    ).start()
+    return server
+
+
+def use(server: ThreadingHTTPServer) -> None:
+    """Points all the requests at the server"""
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    RequestBase.configure_transport(
+        api_base_url={1: f"{base_url}/xmlapi", 2: f"{base_url}/xmlapi2"}
+    )
+
+
+def main(argv: List[str] = []) -> int:
+    if len(argv) < 2:
+        print(USAGE)
+        return 1
+
+    if argv[1] == "serve":
+        server = start(
+            int(argv[2]) if len(argv) > 2 else DEFAULT_PORT,
+            int(argv[3]) if len(argv) > 3 else 0,
+        )
+        print(f"Serving on http://127.0.0.1:{server.server_address[1]}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+        return 0
+
+    if argv[1] == "check":
+        os.chdir(tempfile.mkdtemp())
+        use(start(fail_every=CHECK_FAIL_EVERY))
+        RequestBase.configure_rate_limit(1000)
+        problems = asyncio.run(check())
+        for problem in problems:
+            print(f"FAILED: {problem}")
+        if not problems:
+            print("All checks passed")
+        return 1 if problems else 0
+
+    print(USAGE)
+    return 1
+
+
+async def check() -> List[str]:
+    """Whatever the async requests got wrong"""
+    game, family, geeklist, results, plays = await asyncio.gather(
+        RequestThing(7).with_flags("stats").query_first_async(),
+        RequestFamily(2).query_first_async(),
+        RequestList(11).fetch_async(),
+        RequestSearch().ofType("boardgame").query_async("stand-in"),
+        collect_plays(RequestPlays(thingid=7).concurrently(3)),
+    )
+
+    problems = []
+    if game.primary_name() != "Game 7" or game.overall_rank() != 7:
+        problems.append(f"thing: {game.primary_name()} ranked {game.overall_rank()}")
+    if [id for id, _ in family] != list(range(2 * FAMILY_SIZE, 3 * FAMILY_SIZE)):
+        problems.append(f"family: {[id for id, _ in family]}")
+    list_ids = [item.object_id() for item in geeklist.filter(("thing", "boardgame"))]
+    if list_ids != LIST_ITEMS:
+        problems.append(f"geeklist: {list_ids}")
+    if len(results) != 1:
+        problems.append(f"search: {len(results)} results")
+    if plays != list(range(PLAYS_PER_GAME, 0, -1)):
+        problems.append(f"plays: {len(plays)} plays, out of order or repeated")
+
+    # What was fetched is cached, so the same requests don't hit the server
+    fetched = StandInHandler.requests
+    await RequestThing(7).with_flags("stats").query_first_async()
+    await collect_plays(RequestPlays(thingid=7))
+    if StandInHandler.requests != fetched:
+        problems.append(f"cache: {StandInHandler.requests - fetched} requests made")
+    return problems
+
+
+async def collect_plays(plays: RequestPlays) -> List[int]:
+    return [p.id() async for p in plays.queryAll_async()]
+
+
+if __name__ == "__main__":
+    RequestBase.run_script(main)
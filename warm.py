@@ -0,0 +1,93 @@
+#!/usr/local/bin/python3
+
+import hashlib
+import json
+import os
+import sys
+from typing import Any, Dict, List
+
+from bgg.api.CacheLock import write_atomically
+from bgg.api.RequestBase import MAX_IDS_PER_REQUEST, TEMP_ROOT_DIR, RequestBase
+from bgg.api.RequestPlays import RequestPlays
+from bgg.api.RequestThing import RequestThing
+from CLIGamesParser import CLIGamesParser
+
+USAGE = f"""Usage:
+    {sys.argv[0]} <requests per hour> <games...>
+        Fills the caches the analyses read (things and plays, and the lists and
+        families the games come from) for the games, given the same way as to
+        the analyses (ids, list-<id>, family-<id>, names or --all-cached)
+        without going over the budget. Progress is saved as it goes, so running
+        the same command again resumes where it stopped.
+"""
+
+CHECKPOINTS_DIR = "warm"
+
+
+def main(argv: List[str] = []) -> int:
+    if len(argv) < 3:
+        print(USAGE)
+        return 1
+
+    RequestBase.configure_max_rate(float(argv[1]) / 60 / 60)
+    inputs = argv[2:]
+
+    checkpoint_file = os.path.join(
+        TEMP_ROOT_DIR,
+        CHECKPOINTS_DIR,
+        f"{hashlib.sha1(json.dumps(inputs).encode()).hexdigest()}.json",
+    )
+    checkpoint = read_checkpoint(checkpoint_file)
+    if checkpoint:
+        print(f"Resuming after {checkpoint['done']} of {len(checkpoint['ids'])} games")
+    else:
+        # Resolving the inputs might take requests of its own (lists, families,
+        # searches), those are cached like anything else. Games given more than
+        # once are only warmed once.
+        ids = list(dict.fromkeys(CLIGamesParser(inputs)))
+        checkpoint = {"inputs": inputs, "ids": ids, "done": 0}
+        write_checkpoint(checkpoint_file, checkpoint)
+
+    ids = checkpoint["ids"]
+    try:
+        while checkpoint["done"] < len(ids):
+            # Metadata is warmed in batches, items which are already cached
+            # aren't requested again
+            start = checkpoint["done"]
+            end = start + MAX_IDS_PER_REQUEST
+            batch = ids[start:end]
+            RequestThing(*batch).with_flags("stats").query_all()
+
+            for id in batch:
+                print(
+                    f"Warming plays for game {checkpoint['done'] + 1} of {len(ids)} ({id})"
+                )
+                # Plays are stored as they are fetched, an interrupted crawl
+                # picks up just the ranges which are still missing
+                RequestPlays(thingid=id).compiled()
+                checkpoint["done"] += 1
+                write_checkpoint(checkpoint_file, checkpoint)
+    except KeyboardInterrupt:
+        print(f"\nStopped after {checkpoint['done']} games, run again to resume")
+        return 1
+
+    # The next run would start over, finding everything cached
+    os.remove(checkpoint_file)
+    print(f"Finished warming {len(ids)} games")
+    return 0
+
+
+def read_checkpoint(checkpoint_file: str) -> Dict[str, Any]:
+    try:
+        with open(checkpoint_file, "rt") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def write_checkpoint(checkpoint_file: str, checkpoint: Dict[str, Any]) -> None:
+    write_atomically(checkpoint_file, json.dumps(checkpoint).encode())
+
+
+if __name__ == "__main__":
+    RequestBase.run_script(main)